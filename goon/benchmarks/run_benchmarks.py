@@ -0,0 +1,271 @@
+"""性能基准测试
+
+在仅有CPU、无网络的环境下运行，数据全部来自确定性的合成行情生成器。
+
+用法：
+    python goon/benchmarks/run_benchmarks.py --symbols 500 --output results.json
+    python goon/benchmarks/run_benchmarks.py --only indicators --compare baseline.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import tracemalloc
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), 'src'))
+
+from synthetic import generate_ohlcv  # noqa: E402
+
+FEATURES = ['open', 'high', 'low', 'close', 'vol', 'MA5', 'MA10', 'MA20', 'MACD', 'Signal_Line', 'RSI']
+TARGET = 'close'
+
+# 名称 -> (依赖的模块, 构建函数)；构建函数完成准备工作并返回 (被计时的函数, 处理的行数)
+BENCHMARKS: Dict[str, Tuple[Tuple[str, ...], Callable]] = {}
+
+
+def benchmark(name: str, requires: Tuple[str, ...] = ()):
+    """注册一个基准测试"""
+    def decorator(setup: Callable):
+        BENCHMARKS[name] = (requires, setup)
+        return setup
+    return decorator
+
+
+def _processor():
+    from data.data_processor import DataProcessor
+    return DataProcessor()
+
+
+def _single_symbol(panel: pd.DataFrame) -> pd.DataFrame:
+    first = panel['ts_code'].iloc[0]
+    return panel[panel['ts_code'] == first].reset_index(drop=True)
+
+
+def _windows(args, panel: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    processor = _processor()
+    df = processor.calculate_technical_indicators(_single_symbol(panel)).dropna()
+    df = processor.normalize_features(df, FEATURES)
+    X, y = processor.prepare_time_series_data(df, FEATURES, TARGET, args.sequence_length)
+    return np.ascontiguousarray(X, dtype=np.float32), np.asarray(y, dtype=np.float32)
+
+
+@benchmark('clean_data')
+def bench_clean_data(args, panel):
+    processor = _processor()
+    return lambda: processor.clean_data(panel.copy()), len(panel)
+
+
+@benchmark('indicators_single_symbol')
+def bench_indicators_single(args, panel):
+    processor = _processor()
+    df = _single_symbol(panel)
+    return lambda: processor.calculate_technical_indicators(df.copy()), len(df)
+
+
+@benchmark('indicators_panel')
+def bench_indicators_panel(args, panel):
+    processor = _processor()
+    return lambda: processor.calculate_technical_indicators(panel), len(panel)
+
+
+@benchmark('indicators_per_symbol_loop')
+def bench_indicators_loop(args, panel):
+    processor = _processor()
+    frames = [df for _, df in panel.groupby('ts_code')]
+    return lambda: [processor.calculate_technical_indicators(df.copy()) for df in frames], len(panel)
+
+
+@benchmark('prepare_time_series_data')
+def bench_prepare_time_series(args, panel):
+    processor = _processor()
+    df = processor.calculate_technical_indicators(panel).dropna()
+    frames = [g for _, g in df.groupby('ts_code')]
+
+    def run():
+        # 窗口是视图，求和强制读取全部数据，与训练时的实际访问量一致
+        return [processor.prepare_time_series_data(g, FEATURES, TARGET, args.sequence_length)[0].sum()
+                for g in frames]
+    return run, len(df)
+
+
+@benchmark('train_lstm', requires=('tensorflow',))
+def bench_train_lstm(args, panel):
+    from models.model_trainer import ModelTrainer
+    X, y = _windows(args, panel)
+
+    # 经过 train_lstm，类型转换和验证集划分也计入耗时
+    return lambda: ModelTrainer().train_lstm(X, y, epochs=args.epochs), len(X)
+
+
+@benchmark('train_xgboost', requires=('tensorflow', 'xgboost'))
+def bench_train_xgboost(args, panel):
+    from models.model_trainer import ModelTrainer
+    X, y = _windows(args, panel)
+    X_last = np.ascontiguousarray(X[:, -1, :])
+    return lambda: ModelTrainer().train_xgboost(X_last, y), len(X_last)
+
+
+def _trained_predictor(args, panel):
+    from models.model_trainer import ModelTrainer
+    from models.predict import StockPredictor
+    X, y = _windows(args, panel)
+    trainer = ModelTrainer()
+    trainer.train_lstm(X, y, epochs=1, batch_size=64)
+    trainer.train_xgboost(np.ascontiguousarray(X[:, -1, :]), y)
+
+    predictor = StockPredictor()
+    predictor.lstm_model = trainer.lstm_model
+    predictor.xgb_model = trainer.xgb_model
+    frame = pd.DataFrame(X[-1], columns=FEATURES)
+    return predictor, frame
+
+
+@benchmark('predict_next_day', requires=('tensorflow', 'xgboost'))
+def bench_predict_next_day(args, panel):
+    predictor, frame = _trained_predictor(args, panel)
+    return lambda: predictor.predict_next_day(frame, args.sequence_length, FEATURES), 1
+
+
+@benchmark('predict_batch', requires=('tensorflow', 'xgboost'))
+def bench_predict_batch(args, panel):
+    predictor, frame = _trained_predictor(args, panel)
+    data = {code: frame for code in panel['ts_code'].unique()}
+    return lambda: predictor.predict_batch(data, args.sequence_length, FEATURES), len(data)
+
+
+def _missing_modules(modules: Tuple[str, ...]) -> List[str]:
+    missing = []
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            missing.append(module)
+    return missing
+
+
+def run_benchmark(name: str, args, panel: pd.DataFrame) -> Dict[str, Any]:
+    """运行一个基准测试：先预热一次并记录内存峰值，再重复计时"""
+    requires, setup = BENCHMARKS[name]
+    missing = _missing_modules(requires)
+    if missing:
+        return {'status': 'skipped', 'reason': f"缺少依赖：{', '.join(missing)}"}
+
+    func, rows = setup(args, panel)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall, cpu = [], []
+    for _ in range(args.repeat):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - wall_start)
+        cpu.append(time.process_time() - cpu_start)
+
+    return {
+        'status': 'ok',
+        'rows': int(rows),
+        'repeat': args.repeat,
+        'wall_median': float(np.median(wall)),
+        'wall_min': float(np.min(wall)),
+        'wall_max': float(np.max(wall)),
+        'cpu_median': float(np.median(cpu)),
+        'rows_per_second': float(rows / np.median(wall)) if np.median(wall) > 0 else None,
+        'peak_memory_bytes': int(peak)
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """与基线比较，返回耗时或内存峰值超过阈值的回归项"""
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if current['status'] != 'ok' or not previous or previous.get('status') != 'ok':
+            continue
+        for metric in ('wall_median', 'peak_memory_bytes'):
+            old, new = previous[metric], current[metric]
+            if old > 0 and (new - old) / old > threshold:
+                regressions.append(f"{name}.{metric}: {old:.6g} -> {new:.6g} (+{(new - old) / old:.1%})")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='goon 性能基准测试')
+    parser.add_argument('--symbols', type=int, default=100, help='合成股票数量（1 ~ 5000）')
+    parser.add_argument('--days', type=int, default=750, help='每只股票的交易日数')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子')
+    parser.add_argument('--sequence-length', type=int, default=60, help='序列长度')
+    parser.add_argument('--epochs', type=int, default=1, help='LSTM训练基准的轮数')
+    parser.add_argument('--repeat', type=int, default=3, help='每个基准的计时次数')
+    parser.add_argument('--only', nargs='*', help='只运行名称包含这些关键字的基准')
+    parser.add_argument('--output', help='结果JSON输出路径，默认打印到标准输出')
+    parser.add_argument('--compare', help='基线结果JSON路径')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定为回归的相对变化阈值')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    panel = generate_ohlcv(args.symbols, args.days, args.seed)
+
+    names = [
+        name for name in BENCHMARKS
+        if not args.only or any(keyword in name for keyword in args.only)
+    ]
+
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__
+        },
+        'params': {
+            'symbols': args.symbols,
+            'days': args.days,
+            'seed': args.seed,
+            'sequence_length': args.sequence_length,
+            'epochs': args.epochs,
+            'repeat': args.repeat
+        },
+        'benchmarks': {}
+    }
+
+    for name in names:
+        print(f"运行基准：{name}", file=sys.stderr)
+        results['benchmarks'][name] = run_benchmark(name, args, panel)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != results['params']:
+            print("警告：基线的运行参数与本次不同，比较结果可能没有意义", file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"性能回归：{line}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+
+def generate_ohlcv(
+    n_symbols: int = 1,
+    n_days: int = 750,
+    seed: int = 42,
+    start_date: str = '20150105',
+    annual_volatility: float = 0.35
+) -> pd.DataFrame:
+    """生成确定性的合成日线行情数据，列与Tushare daily接口一致
+
+    收盘价服从几何布朗运动，开高低价和成交量在收盘价基础上加入随机扰动。
+    相同的参数总是生成完全相同的数据。
+
+    Args:
+        n_symbols (int): 股票数量（1 ~ 5000）
+        n_days (int): 每只股票的交易日数
+        seed (int): 随机种子
+        start_date (str): 起始日期，格式：YYYYMMDD
+        annual_volatility (float): 年化波动率
+
+    Returns:
+        pd.DataFrame: 包含ts_code、trade_date、open、high、low、close、pre_close、
+            change、pct_chg、vol、amount列的长表，按ts_code、trade_date排序
+    """
+    if not 1 <= n_symbols <= 5000:
+        raise ValueError("股票数量必须在1到5000之间")
+
+    rng = np.random.default_rng(seed)
+    daily_vol = annual_volatility / np.sqrt(252)
+
+    shape = (n_days, n_symbols)
+    start_price = rng.uniform(3, 100, size=n_symbols)
+    returns = rng.normal(0.0002, daily_vol, size=shape)
+    close = np.round(start_price * np.exp(np.cumsum(returns, axis=0)), 2)
+    pre_close = np.vstack([start_price.round(2), close[:-1]])
+
+    open_ = np.round(pre_close * (1 + rng.normal(0, daily_vol / 3, size=shape)), 2)
+    high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, daily_vol / 2, size=shape))), 2)
+    low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, daily_vol / 2, size=shape))), 2)
+    vol = np.round(rng.lognormal(11, 0.6, size=shape), 2)
+    amount = np.round(vol * close / 10, 3)
+
+    dates = pd.bdate_range(start_date, periods=n_days).strftime('%Y%m%d')
+    codes = [f"{i:06d}.SZ" for i in range(n_symbols)]
+
+    # 转为 (股票, 日期) 顺序展开成长表
+    def flat(values: np.ndarray) -> np.ndarray:
+        return values.T.reshape(-1)
+
+    return pd.DataFrame({
+        'ts_code': np.repeat(codes, n_days),
+        'trade_date': np.tile(dates, n_symbols),
+        'open': flat(open_),
+        'high': flat(high),
+        'low': flat(low),
+        'close': flat(close),
+        'pre_close': flat(pre_close),
+        'change': flat(np.round(close - pre_close, 2)),
+        'pct_chg': flat(np.round((close / pre_close - 1) * 100, 4)),
+        'vol': flat(vol),
+        'amount': flat(amount)
+    })
+
+
+def generate_symbol(n_days: int = 750, seed: int = 42, ts_code: Optional[str] = None) -> pd.DataFrame:
+    """生成单只股票的合成日线，按Tushare的习惯以trade_date降序返回
+
+    Args:
+        n_days (int): 交易日数
+        seed (int): 随机种子
+        ts_code (Optional[str]): 股票代码，默认使用生成器的编号
+
+    Returns:
+        pd.DataFrame: 单只股票的日线数据
+    """
+    df = generate_ohlcv(1, n_days, seed)
+    if ts_code is not None:
+        df['ts_code'] = ts_code
+    return df.iloc[::-1].reset_index(drop=True)
@@ -0,0 +1,274 @@
+"""全市场批量预测
+
+按股票代码把股票池划分为若干分片，每个工作进程只加载一次模型包，从特征库读取各股票最近
+sequence_length 行特征并分批预测，结果按交易日分区写入Parquet：
+
+    <output>/trade_date=YYYYMMDD/shard-00000.parquet
+
+每个分片完成后更新同一目录下的检查点文件 _checkpoint.json，中断后重新运行同样的命令会跳过已完成的分片。
+
+用法：
+    python goon/src/batch_score.py --bundle models/latest --feature-store features --output predictions
+    python goon/src/batch_score.py --bundle models/latest --feature-store features --output predictions \\
+        --trade-date 20240105 --symbols-file universe.txt --workers 16 --shards 64
+"""
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from data.feature_store import FeatureStore
+from models.bundle import ModelBundle
+from models.predict import StockPredictor
+
+CHECKPOINT_FILE = '_checkpoint.json'
+
+# 工作进程内的模型和特征库，由 _init_worker 初始化一次
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(bundle_path: str, store_root: str, n_threads: int):
+    """加载模型包并限制进程内BLAS/XGBoost的线程数，避免多个进程互相抢占CPU"""
+    from threadpoolctl import threadpool_limits
+    _worker['thread_limits'] = threadpool_limits(n_threads)
+
+    predictor = StockPredictor()
+    predictor.load_bundle(bundle_path)
+    if predictor.xgb_model is not None:
+        predictor.xgb_model.set_params(n_jobs=n_threads)
+
+    _worker['predictor'] = predictor
+    _worker['store'] = FeatureStore(store_root)
+
+
+def score_shard(
+    shard_id: int,
+    symbols: List[str],
+    partition_dir: str,
+    trade_date: str,
+    sequence_length: int,
+    batch_size: int = 1024,
+    allow_stale: bool = False
+) -> Dict[str, Any]:
+    """预测一个分片内的全部股票并写入Parquet
+
+    Args:
+        shard_id (int): 分片编号
+        symbols (List[str]): 分片内的股票代码
+        partition_dir (str): 交易日分区目录
+        trade_date (str): 预测所基于的交易日
+        sequence_length (int): 序列长度
+        batch_size (int): 每批预测的股票数
+        allow_stale (bool): 是否预测特征未更新到 trade_date 的股票（如停牌股）
+
+    Returns:
+        Dict[str, Any]: 分片结果，包含输出文件、行数和被跳过的股票
+    """
+    predictor: StockPredictor = _worker['predictor']
+    store: FeatureStore = _worker['store']
+    features = predictor.bundle.features
+    start = time.perf_counter()
+
+    records, skipped = [], {}
+    for offset in range(0, len(symbols), batch_size):
+        data, last_dates = {}, {}
+        for code in symbols[offset:offset + batch_size]:
+            try:
+                # 特征库可能按另一版特征重建过，与模型包不一致时跳过该股票而不是让整个分片失败
+                store_features = store.manifest(code)['features']
+                if list(store_features) != list(features):
+                    skipped[code] = f"特征与模型包不一致：{store_features}"
+                    continue
+                tail = store.transform_tail(code, sequence_length)
+            except (KeyError, ValueError, OSError) as e:
+                skipped[code] = f"读取特征失败：{e}"
+                continue
+            last_date = str(tail['trade_date'].iloc[-1]) if len(tail) else None
+            if len(tail) < sequence_length:
+                skipped[code] = f"数据不足{sequence_length}行"
+            elif last_date != trade_date and not allow_stale:
+                skipped[code] = f"特征截至{last_date}"
+            else:
+                data[code] = tail
+                last_dates[code] = last_date
+
+        if not data:
+            continue
+        predictions = predictor.predict_batch(data, sequence_length, features)
+        for code, result in predictions.items():
+            records.append({'ts_code': code, 'feature_date': last_dates[code], **result})
+
+    table = pa.Table.from_pandas(
+        pd.DataFrame.from_records(
+            records,
+            columns=['ts_code', 'feature_date', 'lstm_prediction', 'xgb_prediction', 'ensemble_prediction']
+        ).assign(bundle_hash=predictor.bundle.bundle_hash),
+        preserve_index=False
+    )
+    path = os.path.join(partition_dir, f"shard-{shard_id:05d}.parquet")
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+    return {
+        'shard': shard_id,
+        'file': os.path.basename(path),
+        'rows': table.num_rows,
+        'skipped': skipped,
+        'elapsed': time.perf_counter() - start
+    }
+
+
+def _run_key(bundle_hash: str, symbols: List[str], n_shards: int, allow_stale: bool) -> str:
+    """同一组参数的运行才能复用检查点"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([bundle_hash, n_shards, allow_stale]).encode())
+    digest.update('\n'.join(symbols).encode())
+    return digest.hexdigest()
+
+
+def load_checkpoint(partition_dir: str, run_key: str) -> Dict[str, Any]:
+    """读取检查点；参数不一致时清除旧的分片文件重新开始"""
+    path = os.path.join(partition_dir, CHECKPOINT_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('run_key') == run_key:
+            checkpoint['completed'] = {
+                shard: result for shard, result in checkpoint['completed'].items()
+                if os.path.exists(os.path.join(partition_dir, result['file']))
+            }
+            return checkpoint
+        print("检查点与本次运行参数不一致，重新预测全部分片", file=sys.stderr)
+
+    for stale in glob.glob(os.path.join(partition_dir, 'shard-*.parquet')):
+        os.remove(stale)
+    return {'run_key': run_key, 'completed': {}}
+
+
+def save_checkpoint(partition_dir: str, checkpoint: Dict[str, Any]):
+    path = os.path.join(partition_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='goon 全市场批量预测')
+    parser.add_argument('--bundle', required=True, help='模型包目录')
+    parser.add_argument('--feature-store', required=True, help='特征库根目录')
+    parser.add_argument('--output', required=True, help='预测结果根目录')
+    parser.add_argument('--trade-date', default=datetime.now().strftime('%Y%m%d'), help='预测所基于的交易日（YYYYMMDD）')
+    parser.add_argument('--symbols-file', help='股票池文件，每行一个代码，默认为特征库中的全部股票')
+    parser.add_argument('--sequence-length', type=int, help='序列长度，默认使用模型包中记录的值')
+    parser.add_argument('--workers', type=int, default=cpu_count, help='工作进程数')
+    parser.add_argument('--shards', type=int, help='分片数，默认与工作进程数相同')
+    parser.add_argument('--threads-per-worker', type=int, help='每个进程的计算线程数，默认平分CPU核数')
+    parser.add_argument('--batch-size', type=int, default=1024, help='每批预测的股票数')
+    parser.add_argument('--allow-stale', action='store_true', help='同时预测特征未更新到交易日的股票')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，重新预测全部分片')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    bundle = ModelBundle(args.bundle)
+    sequence_length = args.sequence_length or bundle.sequence_length
+    if not sequence_length:
+        raise ValueError("模型包中没有记录序列长度，请通过 --sequence-length 指定")
+
+    if args.symbols_file:
+        with open(args.symbols_file, 'r', encoding='utf-8') as f:
+            symbols = sorted({line.strip() for line in f if line.strip()})
+    else:
+        symbols = FeatureStore(args.feature_store).symbols()
+    if not symbols:
+        print("股票池为空", file=sys.stderr)
+        return 1
+
+    workers = max(1, args.workers)
+    n_shards = max(1, min(args.shards or workers, len(symbols)))
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    shards = [list(shard) for shard in np.array_split(np.array(symbols, dtype=object), n_shards)]
+
+    partition_dir = os.path.join(args.output, f"trade_date={args.trade_date}")
+    os.makedirs(partition_dir, exist_ok=True)
+    run_key = _run_key(bundle.bundle_hash, symbols, n_shards, args.allow_stale)
+    if args.restart:
+        for stale in glob.glob(os.path.join(partition_dir, 'shard-*.parquet')):
+            os.remove(stale)
+        checkpoint = {'run_key': run_key, 'completed': {}}
+    else:
+        checkpoint = load_checkpoint(partition_dir, run_key)
+    checkpoint.update({
+        'bundle': os.path.abspath(args.bundle),
+        'bundle_hash': bundle.bundle_hash,
+        'trade_date': args.trade_date,
+        'sequence_length': sequence_length,
+        'n_symbols': len(symbols),
+        'n_shards': n_shards
+    })
+
+    pending = [i for i in range(n_shards) if str(i) not in checkpoint['completed']]
+    print(f"共{len(symbols)}只股票、{n_shards}个分片，待预测{len(pending)}个分片", file=sys.stderr)
+
+    def on_done(result: Dict[str, Any]):
+        checkpoint['completed'][str(result['shard'])] = result
+        save_checkpoint(partition_dir, checkpoint)
+        print(f"分片{result['shard']}完成：{result['rows']}行，跳过{len(result['skipped'])}只，"
+              f"耗时{result['elapsed']:.1f}秒（{len(checkpoint['completed'])}/{n_shards}）", file=sys.stderr)
+
+    task_args = (partition_dir, args.trade_date, sequence_length, args.batch_size, args.allow_stale)
+    failures = {}
+    if workers == 1 or len(pending) <= 1:
+        _init_worker(args.bundle, args.feature_store, threads)
+        for i in pending:
+            try:
+                on_done(score_shard(i, shards[i], *task_args))
+            except Exception as e:
+                failures[i] = repr(e)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(pending)),
+            mp_context=mp.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(args.bundle, args.feature_store, threads)
+        ) as executor:
+            futures = {executor.submit(score_shard, i, shards[i], *task_args): i for i in pending}
+            for future in as_completed(futures):
+                try:
+                    on_done(future.result())
+                except Exception as e:
+                    failures[futures[future]] = repr(e)
+
+    for shard, error in sorted(failures.items()):
+        print(f"分片{shard}失败：{error}", file=sys.stderr)
+
+    completed = checkpoint['completed'].values()
+    print(json.dumps({
+        'trade_date': args.trade_date,
+        'output': partition_dir,
+        'shards_completed': len(checkpoint['completed']),
+        'shards_failed': sorted(failures),
+        'rows': sum(r['rows'] for r in completed),
+        'skipped': sum(len(r['skipped']) for r in completed),
+        'elapsed': time.perf_counter() - started
+    }, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import time
+import pandas as pd
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Iterator, Optional, Tuple
+from data.data_fetcher import DataFetcher
+from data.rate_limit import TokenBucket
+from data.transport import RetryPolicy
+
+
+@dataclass
+class FetchFailure:
+    """单只股票的获取失败记录"""
+    ts_code: str
+    error_type: str
+    message: str
+    attempts: int
+
+
+@dataclass
+class BulkFetchReport:
+    """批量获取的结果报告"""
+    requested: int = 0
+    succeeded: List[str] = field(default_factory=list)
+    empty: List[str] = field(default_factory=list)
+    failures: List[FetchFailure] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def failed_codes(self) -> List[str]:
+        return [failure.ts_code for failure in self.failures]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'requested': self.requested,
+            'succeeded': len(self.succeeded),
+            'empty': len(self.empty),
+            'failed': len(self.failures),
+            'elapsed': self.elapsed
+        }
+
+
+class BulkFetcher:
+    def __init__(
+        self,
+        fetcher: DataFetcher,
+        max_workers: int = 8,
+        calls_per_minute: Optional[float] = 500,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0
+    ):
+        """初始化批量数据获取器
+
+        Args:
+            fetcher (DataFetcher): 单只股票的数据获取器
+            max_workers (int): 并发线程数
+            calls_per_minute (Optional[float]): 每分钟API调用上限（包括重试），只在fetcher未配置限流器时生效，
+                None表示不限流。限流器只用于本对象（见 DataFetcher.with_rate_limiter），不会修改传入的fetcher
+            max_retries (int): 每只股票的最大重试次数
+            backoff_base (float): 退避基准秒数，第n次重试等待约 backoff_base * 2^n 秒
+            backoff_max (float): 单次退避的最长等待秒数
+        """
+        if fetcher.rate_limiter is None and calls_per_minute:
+            fetcher = fetcher.with_rate_limiter(TokenBucket(calls_per_minute))
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.retry = RetryPolicy(max_retries, backoff_base, backoff_max)
+        self.report = BulkFetchReport()
+
+    def _fetch_with_retry(
+        self,
+        stock_code: str,
+        start_date: str,
+        end_date: str
+    ) -> Tuple[str, Optional[pd.DataFrame], Optional[FetchFailure]]:
+        """获取单只股票数据，失败时按指数退避重试
+
+        fetcher的transport已对单次API调用重试，这里的重试针对整只股票（包括缓存同步）；
+        数据源熔断或参数错误时不再重试，直接记为失败。
+        """
+        attempt = 0
+        while True:
+            try:
+                df = self.fetcher.fetch_stock_daily(
+                    stock_code, start_date, end_date, raise_on_error=True
+                )
+                return stock_code, df, None
+            except Exception as e:
+                if not self.retry.should_retry(e, attempt):
+                    return stock_code, None, FetchFailure(
+                        ts_code=stock_code,
+                        error_type=type(e).__name__,
+                        message=str(e),
+                        attempts=attempt + 1
+                    )
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+
+    def iter_stock_daily(
+        self,
+        stock_codes: List[str],
+        start_date: str,
+        end_date: str
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """并发获取多只股票的日线数据，按完成顺序逐个返回
+
+        失败的股票不会产生输出，而是记录在 self.report 中。
+
+        Args:
+            stock_codes (List[str]): 股票代码列表
+            start_date (str): 开始日期，格式：YYYYMMDD
+            end_date (str): 结束日期，格式：YYYYMMDD
+
+        Yields:
+            Tuple[str, pd.DataFrame]: (股票代码, 日线数据)
+        """
+        self.report = report = BulkFetchReport(requested=len(stock_codes))
+        started = time.monotonic()
+        pending_codes = iter(stock_codes)
+        # 限制在途任务数量，避免消费方较慢时结果在内存中堆积
+        max_in_flight = self.max_workers * 2
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            in_flight = set()
+            while True:
+                for code in pending_codes:
+                    in_flight.add(executor.submit(self._fetch_with_retry, code, start_date, end_date))
+                    if len(in_flight) >= max_in_flight:
+                        break
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    code, df, failure = future.result()
+                    report.elapsed = time.monotonic() - started
+                    if failure is not None:
+                        report.failures.append(failure)
+                        continue
+                    if df.empty:
+                        report.empty.append(code)
+                    else:
+                        report.succeeded.append(code)
+                    yield code, df
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            report.elapsed = time.monotonic() - started
+
+    def fetch_stock_daily(
+        self,
+        stock_codes: List[str],
+        start_date: str,
+        end_date: str
+    ) -> Tuple[Dict[str, pd.DataFrame], BulkFetchReport]:
+        """并发获取多只股票的日线数据并全部收集
+
+        Args:
+            stock_codes (List[str]): 股票代码列表
+            start_date (str): 开始日期，格式：YYYYMMDD
+            end_date (str): 结束日期，格式：YYYYMMDD
+
+        Returns:
+            Tuple[Dict[str, pd.DataFrame], BulkFetchReport]: 股票代码到日线数据的映射，以及结果报告
+        """
+        frames = dict(self.iter_stock_daily(stock_codes, start_date, end_date))
+        return frames, self.report
@@ -1,23 +1,78 @@
-import tushare as ts
-import akshare as ak
+import copy
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from data.ohlcv_cache import OHLCVCache
+from data.rate_limit import TokenBucket
+from data.dtypes import cast_frame
+from data.transport import CircuitBreaker, RetryPolicy, Transport, TushareBackend
+from utils.instrumentation import instrumented
 
 class DataFetcher:
-    def __init__(self, tushare_token: str):
+    def __init__(
+        self,
+        tushare_token: str,
+        cache_dir: Optional[str] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        backend=None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
         """初始化数据获取器
 
         Args:
-            tushare_token (str): Tushare API的token
+            tushare_token (str): Tushare API的token，指定backend时不使用
+            cache_dir (Optional[str]): 本地日线缓存目录，为None时不使用缓存
+            rate_limiter (Optional[TokenBucket]): API调用限流器，为None时不限流
+            backend: 数据源，默认 TushareBackend；离线测试时可传入 LocalBackend
+            retry (Optional[RetryPolicy]): 失败重试策略，默认 RetryPolicy()
+            breaker (Optional[CircuitBreaker]): 熔断器，默认 CircuitBreaker()
         """
-        self.ts_api = ts.pro_api(tushare_token)
+        if backend is None:
+            backend = TushareBackend(tushare_token)
+        self.transport = Transport(backend, retry=retry, breaker=breaker, rate_limiter=rate_limiter)
+        self.cache = OHLCVCache(cache_dir) if cache_dir else None
+
+    @property
+    def rate_limiter(self) -> Optional[TokenBucket]:
+        return self.transport.rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter: Optional[TokenBucket]):
+        self.transport.rate_limiter = rate_limiter
+
+    def with_rate_limiter(self, rate_limiter: Optional[TokenBucket]) -> 'DataFetcher':
+        """返回按另一个限流器调用API的副本，缓存和transport的其他部分（包括熔断器）与原对象共用"""
+        fetcher = copy.copy(self)
+        fetcher.transport = self.transport.with_rate_limiter(rate_limiter)
+        return fetcher
 
+    def _call_api(self, api_name: str, **params) -> pd.DataFrame:
+        """通过transport调用接口（合并相同请求、限流、重试和熔断），出错时抛出异常"""
+        return self.transport.call(api_name, **params)
+
+    def _fetch_daily(self, stock_code: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """直接从Tushare获取日线数据，出错时抛出异常"""
+        return self._call_api(
+            'daily',
+            ts_code=stock_code,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+    def _sync_cache(self, stock_code: str, start_date: str, end_date: str):
+        """只从API获取缓存中缺失的日期区间并合并到缓存"""
+        for gap_start, gap_end in self.cache.missing_ranges(stock_code, start_date, end_date):
+            df = self._fetch_daily(stock_code, gap_start, gap_end)
+            self.cache.write(stock_code, df, gap_start, gap_end)
+
+    @instrumented('fetch.stock_daily')
     def fetch_stock_daily(
         self,
         stock_code: str,
         start_date: str,
-        end_date: str
+        end_date: str,
+        raise_on_error: bool = False
     ) -> pd.DataFrame:
         """获取股票的日线数据
 
@@ -25,42 +80,90 @@ class DataFetcher:
             stock_code (str): 股票代码
             start_date (str): 开始日期，格式：YYYYMMDD
             end_date (str): 结束日期，格式：YYYYMMDD
+            raise_on_error (bool): 出错时是否抛出异常，默认打印错误并返回空DataFrame
 
         Returns:
             pd.DataFrame: 包含股票日线数据的DataFrame
         """
         try:
-            df = self.ts_api.daily(
-                ts_code=stock_code,
-                start_date=start_date,
-                end_date=end_date
-            )
-            return df
+            if self.cache is None:
+                return cast_frame(self._fetch_daily(stock_code, start_date, end_date))
+
+            self._sync_cache(stock_code, start_date, end_date)
+            return cast_frame(self.cache.read(stock_code, start_date, end_date))
         except Exception as e:
+            if raise_on_error:
+                raise
             print(f"获取股票{stock_code}数据失败：{str(e)}")
             return pd.DataFrame()
 
-    def fetch_stock_basic(self) -> pd.DataFrame:
+    @instrumented('fetch.stock_daily_batch')
+    def fetch_stock_daily_batch(
+        self,
+        stock_codes: List[str],
+        start_date: str,
+        end_date: str,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """批量获取多只股票的日线数据
+
+        Args:
+            stock_codes (List[str]): 股票代码列表
+            start_date (str): 开始日期，格式：YYYYMMDD
+            end_date (str): 结束日期，格式：YYYYMMDD
+            columns (Optional[List[str]]): 需要返回的列，默认全部
+
+        Returns:
+            pd.DataFrame: 包含ts_code列的长表，按ts_code、trade_date排序
+        """
+        if self.cache is None:
+            frames = [self.fetch_stock_daily(code, start_date, end_date) for code in stock_codes]
+            frames = [df for df in frames if not df.empty]
+            if not frames:
+                return pd.DataFrame()
+            df = pd.concat(frames, ignore_index=True).sort_values(
+                ['ts_code', 'trade_date'], ignore_index=True
+            )
+            return df[columns] if columns else df
+
+        for code in stock_codes:
+            try:
+                self._sync_cache(code, start_date, end_date)
+            except Exception as e:
+                print(f"获取股票{code}数据失败：{str(e)}")
+
+        return cast_frame(self.cache.read_many(stock_codes, start_date, end_date, columns))
+
+    @instrumented('fetch.stock_basic')
+    def fetch_stock_basic(self, raise_on_error: bool = False) -> pd.DataFrame:
         """获取股票基本信息
 
+        Args:
+            raise_on_error (bool): 出错时是否抛出异常，默认打印错误并返回空DataFrame
+
         Returns:
             pd.DataFrame: 包含股票基本信息的DataFrame
         """
         try:
-            df = self.ts_api.stock_basic(
+            df = self._call_api(
+                'stock_basic',
                 exchange='',
                 list_status='L'
             )
             return df
         except Exception as e:
+            if raise_on_error:
+                raise
             print(f"获取股票基本信息失败：{str(e)}")
             return pd.DataFrame()
 
+    @instrumented('fetch.financial_data')
     def fetch_financial_data(
         self,
         stock_code: str,
         start_date: str,
-        end_date: str
+        end_date: str,
+        raise_on_error: bool = False
     ) -> pd.DataFrame:
         """获取股票的财务数据
 
@@ -68,17 +171,21 @@ class DataFetcher:
             stock_code (str): 股票代码
             start_date (str): 开始日期，格式：YYYYMMDD
             end_date (str): 结束日期，格式：YYYYMMDD
+            raise_on_error (bool): 出错时是否抛出异常，默认打印错误并返回空DataFrame
 
         Returns:
             pd.DataFrame: 包含财务数据的DataFrame
         """
         try:
-            df = self.ts_api.fina_indicator(
+            df = self._call_api(
+                'fina_indicator',
                 ts_code=stock_code,
                 start_date=start_date,
                 end_date=end_date
             )
             return df
         except Exception as e:
+            if raise_on_error:
+                raise
             print(f"获取股票{stock_code}财务数据失败：{str(e)}")
             return pd.DataFrame()
\ No newline at end of file
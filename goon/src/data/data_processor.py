@@ -1,13 +1,17 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from sklearn.preprocessing import MinMaxScaler
+from data.windowing import build_sequences
+from data.dtypes import float_dtype, as_float, cast_frame, check_float_dtype
+from utils.instrumentation import instrumented
 
 class DataProcessor:
     def __init__(self):
         """初始化数据处理器"""
         self.scaler = MinMaxScaler()
 
+    @instrumented('process.clean_data')
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """清洗数据，处理缺失值和异常值
 
@@ -25,56 +29,127 @@ class DataProcessor:
         df[numeric_columns] = df[numeric_columns].fillna(df[numeric_columns].mean())
         
         # 处理非数值型缺失值
-        df = df.fillna(method='ffill')
+        df = df.ffill()
         
         return df
 
-    def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _compute_indicators(close: Union[pd.Series, pd.DataFrame]) -> Dict[str, Union[pd.Series, pd.DataFrame]]:
+        """按列计算技术指标，close为单只股票的Series或 (时间 × 股票) 的宽表"""
+        indicators = {}
+
+        # 计算移动平均线
+        indicators['MA5'] = close.rolling(window=5).mean()
+        indicators['MA10'] = close.rolling(window=10).mean()
+        indicators['MA20'] = close.rolling(window=20).mean()
+
+        # 计算MACD
+        exp1 = close.ewm(span=12, adjust=False).mean()
+        exp2 = close.ewm(span=26, adjust=False).mean()
+        indicators['MACD'] = exp1 - exp2
+        indicators['Signal_Line'] = indicators['MACD'].ewm(span=9, adjust=False).mean()
+
+        # 计算RSI
+        delta = close.diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        rs = gain / loss
+        indicators['RSI'] = 100 - (100 / (1 + rs))
+
+        return indicators
+
+    @instrumented('process.indicators')
+    def calculate_technical_indicators(
+        self,
+        df: Union[pd.DataFrame, np.ndarray]
+    ) -> Union[pd.DataFrame, Dict[str, np.ndarray]]:
         """计算技术指标
 
+        支持三种输入：
+        - 单只股票的DataFrame；
+        - 包含多个ts_code的长表（面板模式），所有股票在一次向量化计算中完成；
+        - (日期 × 股票) 的二维收盘价数组，返回指标名到同形状数组的映射。
+
         Args:
-            df (pd.DataFrame): 股票数据
+            df (Union[pd.DataFrame, np.ndarray]): 股票数据
 
         Returns:
-            pd.DataFrame: 添加技术指标后的数据
+            Union[pd.DataFrame, Dict[str, np.ndarray]]: 添加技术指标后的数据
         """
+        if isinstance(df, np.ndarray):
+            return self.calculate_panel_indicators(df)
+
+        if 'ts_code' in df.columns and df['ts_code'].nunique() > 1:
+            return self._calculate_long_panel_indicators(df)
+
         # 确保数据按时间排序
         df = df.sort_values('trade_date')
+        for name, values in self._compute_indicators(df['close']).items():
+            df[name] = values
 
-        # 计算移动平均线
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
+        # pandas的滚动计算总是输出float64，统一转换回流水线的浮点类型
+        return cast_frame(df)
 
-        # 计算MACD
-        exp1 = df['close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['close'].ewm(span=26, adjust=False).mean()
-        df['MACD'] = exp1 - exp2
-        df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
+    def calculate_panel_indicators(self, close: np.ndarray) -> Dict[str, np.ndarray]:
+        """对 (日期 × 股票) 收盘价矩阵按列计算技术指标
 
-        # 计算RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        每列独立计算，窗口不会跨越股票边界；NaN按pandas的滚动窗口规则处理。
 
-        return df
+        Args:
+            close (np.ndarray): 二维收盘价数组，形状为 (日期, 股票)
+
+        Returns:
+            Dict[str, np.ndarray]: 指标名到同形状数组的映射
+        """
+        if close.ndim != 2:
+            raise ValueError(f"面板数据必须是二维数组，当前维度：{close.ndim}")
+
+        indicators = self._compute_indicators(pd.DataFrame(close))
+        return {name: values.to_numpy(dtype=float_dtype()) for name, values in indicators.items()}
 
-    def normalize_features(self, df: pd.DataFrame, features: List[str]) -> pd.DataFrame:
+    def _calculate_long_panel_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
+        """面板模式：对包含多个ts_code的长表一次性计算技术指标
+
+        每只股票的K线按其自身的序号（而不是日历日期）对齐成宽表，
+        因此停牌造成的缺口与单只股票计算时的行为一致，末尾的NaN填充不会影响有效值。
+        """
+        df = df.sort_values(['ts_code', 'trade_date'], ignore_index=True)
+
+        codes = df['ts_code'].to_numpy()
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.r_[0, boundaries]
+        lengths = np.diff(np.r_[starts, len(df)])
+        column = np.repeat(np.arange(len(starts)), lengths)
+        position = np.arange(len(df)) - np.repeat(starts, lengths)
+
+        wide = np.full((lengths.max(), len(starts)), np.nan, dtype=float_dtype())
+        wide[position, column] = df['close'].to_numpy(dtype=float_dtype())
+
+        for name, values in self.calculate_panel_indicators(wide).items():
+            df[name] = values[position, column]
+
+        return cast_frame(df)
+
+    @instrumented('process.normalize')
+    def normalize_features(self, df: pd.DataFrame, features: List[str], fit: bool = True) -> pd.DataFrame:
         """对特征进行归一化
 
         Args:
             df (pd.DataFrame): 原始数据
             features (List[str]): 需要归一化的特征列表
+            fit (bool): 是否重新拟合归一化器；推理时应为False，沿用训练时的参数
 
         Returns:
             pd.DataFrame: 归一化后的数据
         """
         df_normalized = df.copy()
-        df_normalized[features] = self.scaler.fit_transform(df[features])
-        return df_normalized
+        values = as_float(df[features].to_numpy())
+        scaled = self.scaler.fit_transform(values) if fit else self.scaler.transform(values)
+        # 归一化器可能把输入提升为float64，写回数据框之前检查
+        df_normalized[features] = check_float_dtype(scaled, 'X')
+        return cast_frame(df_normalized, features)
 
+    @instrumented('process.windowing')
     def prepare_time_series_data(
         self,
         df: pd.DataFrame,
@@ -91,16 +166,11 @@ class DataProcessor:
             sequence_length (int): 序列长度
 
         Returns:
-            tuple: (X, y) 训练数据和标签
+            tuple: (X, y) 训练数据和标签，X为底层数据的只读窗口视图
         """
-        data = df[features + [target]].values
-        X, y = [], []
-
-        for i in range(len(data) - sequence_length):
-            X.append(data[i:(i + sequence_length), :-1])
-            y.append(data[i + sequence_length, -1])
-
-        return np.array(X), np.array(y)
+        # 特征按行连续存储，每个窗口在内存中是连续的一段，展平给XGBoost时无需复制
+        data = np.ascontiguousarray(as_float(df[features].to_numpy()))
+        return build_sequences(data, as_float(df[target].to_numpy()), sequence_length)
 
     def split_train_test(self, df: pd.DataFrame, test_size: float = 0.2) -> tuple:
         """将数据集分割为训练集和测试集
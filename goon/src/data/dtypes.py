@@ -0,0 +1,75 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Iterable, Optional
+from numpy.lib.stride_tricks import as_strided
+
+DTYPE_ENV_VAR = 'PIPELINE_FLOAT_DTYPE'
+SUPPORTED_DTYPES = ('float32', 'float64')
+
+_float_dtype = np.dtype(os.getenv(DTYPE_ENV_VAR, 'float32'))
+if _float_dtype.name not in SUPPORTED_DTYPES:
+    raise ValueError(f"{DTYPE_ENV_VAR} 必须是{SUPPORTED_DTYPES}之一，当前为{_float_dtype.name}")
+
+
+def float_dtype() -> np.dtype:
+    """流水线统一使用的浮点类型，默认float32，可通过环境变量 PIPELINE_FLOAT_DTYPE 修改"""
+    return _float_dtype
+
+
+def set_float_dtype(dtype) -> np.dtype:
+    """修改当前进程的浮点类型，返回修改前的类型"""
+    global _float_dtype
+    dtype = np.dtype(dtype)
+    if dtype.name not in SUPPORTED_DTYPES:
+        raise ValueError(f"浮点类型必须是{SUPPORTED_DTYPES}之一，当前为{dtype.name}")
+    previous, _float_dtype = _float_dtype, dtype
+    return previous
+
+
+def as_float(array, dtype: Optional[np.dtype] = None) -> np.ndarray:
+    """转换为统一的浮点类型，类型已一致时不复制"""
+    return np.asarray(array, dtype=dtype or _float_dtype)
+
+
+def cast_frame(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """把DataFrame中的浮点列原地转换为统一的浮点类型
+
+    Args:
+        df (pd.DataFrame): 数据
+        columns (Optional[Iterable[str]]): 需要转换的列，默认全部浮点列
+
+    Returns:
+        pd.DataFrame: 转换后的数据（与输入为同一对象）
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=[np.floating]).columns
+    for column in columns:
+        if df[column].dtype != _float_dtype:
+            df[column] = df[column].astype(_float_dtype)
+    return df
+
+
+def check_float_dtype(array: np.ndarray, name: str) -> np.ndarray:
+    """检查数组没有被隐式提升为更宽的浮点类型
+
+    Raises:
+        TypeError: 数组的浮点类型与统一类型不一致
+    """
+    if np.issubdtype(array.dtype, np.floating) and array.dtype != _float_dtype:
+        raise TypeError(f"{name}的类型为{array.dtype}，与流水线浮点类型{_float_dtype}不一致")
+    return array
+
+
+def flatten_windows(X: np.ndarray) -> np.ndarray:
+    """把 (样本, 序列, 特征) 的窗口展平为 (样本, 序列 * 特征)
+
+    对 sliding_windows 产生的视图，每个窗口在底层内存中本身就是连续的一段，
+    此时直接构造二维的只读视图而不复制数据；其他情况与 reshape 一致。
+    """
+    if X.ndim != 3:
+        raise ValueError(f"窗口数据必须是三维数组，当前维度：{X.ndim}")
+    n, length, n_features = X.shape
+    if X.strides[1] == n_features * X.strides[2]:
+        return as_strided(X, shape=(n, length * n_features), strides=(X.strides[0], X.strides[2]), writeable=False)
+    return X.reshape(n, -1)
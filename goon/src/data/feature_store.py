@@ -0,0 +1,244 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sklearn.preprocessing import MinMaxScaler
+from data.scaler_state import scaler_to_dict, scaler_from_dict
+
+FEATURE_STORE_FORMAT_VERSION = 1
+FEATURES_FILE = 'features.arrow'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+
+class FeatureStore:
+    def __init__(self, root: str, keep_versions: int = 3):
+        """初始化按股票版本化的特征库
+
+        每只股票的每个版本包含一个未压缩的Arrow IPC文件（列式存储，可内存映射）和一个manifest，
+        manifest记录特征列表、行数、日期范围和训练时拟合的归一化参数。
+        推理时只需读取最后 sequence_length 行并用保存的参数做transform，无需重新计算或拟合。
+
+        Args:
+            root (str): 特征库根目录
+            keep_versions (int): 每只股票保留的历史版本数
+        """
+        self.root = root
+        self.keep_versions = keep_versions
+        os.makedirs(root, exist_ok=True)
+
+    def _symbol_dir(self, ts_code: str) -> str:
+        return os.path.join(self.root, ts_code)
+
+    def _version_dir(self, ts_code: str, version: int) -> str:
+        return os.path.join(self._symbol_dir(ts_code), f"v{version}")
+
+    def symbols(self) -> List[str]:
+        """列出特征库中已有当前版本的全部股票代码"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, CURRENT_FILE))
+        )
+
+    def versions(self, ts_code: str) -> List[int]:
+        """列出某只股票已有的版本号"""
+        symbol_dir = self._symbol_dir(ts_code)
+        if not os.path.isdir(symbol_dir):
+            return []
+        return sorted(
+            int(name[1:]) for name in os.listdir(symbol_dir)
+            if name.startswith('v') and name[1:].isdigit()
+        )
+
+    def current_version(self, ts_code: str) -> Optional[int]:
+        """返回某只股票当前生效的版本号，不存在时返回None"""
+        path = os.path.join(self._symbol_dir(ts_code), CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+
+    def _resolve(self, ts_code: str, version: Optional[int]) -> int:
+        version = self.current_version(ts_code) if version is None else version
+        if version is None:
+            raise KeyError(f"特征库中没有股票{ts_code}")
+        return version
+
+    def manifest(self, ts_code: str, version: Optional[int] = None) -> Dict[str, Any]:
+        """读取某个版本的manifest"""
+        path = os.path.join(self._version_dir(ts_code, self._resolve(ts_code, version)), MANIFEST_FILE)
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write(
+        self,
+        ts_code: str,
+        df: pd.DataFrame,
+        features: List[str],
+        scaler: Optional[MinMaxScaler] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """写入一个新版本
+
+        Args:
+            ts_code (str): 股票代码
+            df (pd.DataFrame): 包含trade_date和指标列的数据（未归一化）
+            features (List[str]): 模型使用的特征列表，scaler按此顺序拟合
+            scaler (Optional[MinMaxScaler]): 训练时拟合的归一化器
+            metadata (Optional[Dict[str, Any]]): 其他需要记录的信息
+
+        Returns:
+            int: 新版本号
+        """
+        missing = [c for c in ['trade_date'] + features if c not in df.columns]
+        if missing:
+            raise ValueError(f"缺少列：{missing}")
+
+        df = df.sort_values('trade_date').reset_index(drop=True)
+        columns = ['trade_date'] + [
+            c for c in df.columns
+            if c != 'trade_date' and pd.api.types.is_numeric_dtype(df[c])
+        ]
+
+        versions = self.versions(ts_code)
+        version = versions[-1] + 1 if versions else 1
+        version_dir = self._version_dir(ts_code, version)
+        tmp_dir = version_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        feather.write_feather(
+            df[columns], os.path.join(tmp_dir, FEATURES_FILE), compression='uncompressed'
+        )
+        manifest = {
+            'format_version': FEATURE_STORE_FORMAT_VERSION,
+            'ts_code': ts_code,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'features': list(features),
+            'columns': columns,
+            'rows': len(df),
+            'first_trade_date': str(df['trade_date'].iloc[0]) if len(df) else None,
+            'last_trade_date': str(df['trade_date'].iloc[-1]) if len(df) else None,
+            'scaler': scaler_to_dict(scaler) if scaler is not None else None,
+            'metadata': metadata or {}
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(tmp_dir, version_dir)
+
+        current_path = os.path.join(self._symbol_dir(ts_code), CURRENT_FILE)
+        with open(current_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(str(version))
+        os.replace(current_path + '.tmp', current_path)
+
+        for old in versions[:max(0, len(versions) + 1 - self.keep_versions)]:
+            shutil.rmtree(self._version_dir(ts_code, old), ignore_errors=True)
+
+        return version
+
+    def append(self, ts_code: str, new_rows: pd.DataFrame) -> int:
+        """追加新计算的K线特征，沿用当前版本的特征列表和归一化参数（不重新拟合）
+
+        Args:
+            ts_code (str): 股票代码
+            new_rows (pd.DataFrame): 新K线的指标数据，可由 IncrementalIndicatorEngine 生成
+
+        Returns:
+            int: 新版本号
+        """
+        manifest = self.manifest(ts_code)
+        df = pd.concat([self.read(ts_code), new_rows[manifest['columns']]], ignore_index=True)
+        df = df.drop_duplicates('trade_date', keep='last')
+        scaler = scaler_from_dict(manifest['scaler']) if manifest['scaler'] else None
+        return self.write(ts_code, df, manifest['features'], scaler, manifest['metadata'])
+
+    def _open(self, ts_code: str, version: Optional[int]):
+        path = os.path.join(self._version_dir(ts_code, self._resolve(ts_code, version)), FEATURES_FILE)
+        return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+    def read(
+        self,
+        ts_code: str,
+        columns: Optional[List[str]] = None,
+        version: Optional[int] = None
+    ) -> pd.DataFrame:
+        """读取某只股票的全部特征数据"""
+        table = self._open(ts_code, version).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
+
+    def read_tail(
+        self,
+        ts_code: str,
+        n: int,
+        columns: Optional[List[str]] = None,
+        version: Optional[int] = None
+    ) -> pd.DataFrame:
+        """只读取最后n行
+
+        文件以内存映射方式打开，从最后一个记录批次向前读取，直到满足n行，
+        读取量与历史长度无关。
+
+        Args:
+            ts_code (str): 股票代码
+            n (int): 行数
+            columns (Optional[List[str]]): 需要读取的列，默认全部
+            version (Optional[int]): 版本号，默认当前版本
+
+        Returns:
+            pd.DataFrame: 最后n行数据（按trade_date升序）
+        """
+        reader = self._open(ts_code, version)
+        batches, rows = [], 0
+        for i in range(reader.num_record_batches - 1, -1, -1):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            batches.append(batch)
+            rows += batch.num_rows
+            if rows >= n:
+                break
+
+        if not batches:
+            return pd.DataFrame(columns=columns)
+        table = pa.Table.from_batches(batches[::-1])
+        return table.slice(max(0, table.num_rows - n)).to_pandas()
+
+    def load_scaler(self, ts_code: str, version: Optional[int] = None) -> MinMaxScaler:
+        """恢复训练时拟合的归一化器"""
+        state = self.manifest(ts_code, version)['scaler']
+        if state is None:
+            raise ValueError(f"股票{ts_code}的特征库版本没有保存归一化参数")
+        return scaler_from_dict(state)
+
+    def transform_tail(
+        self,
+        ts_code: str,
+        n: int,
+        version: Optional[int] = None
+    ) -> pd.DataFrame:
+        """读取最后n行特征并用保存的归一化参数做transform
+
+        Args:
+            ts_code (str): 股票代码
+            n (int): 行数，一般为 sequence_length
+            version (Optional[int]): 版本号，默认当前版本
+
+        Returns:
+            pd.DataFrame: 归一化后的特征数据，包含trade_date列
+        """
+        version = self._resolve(ts_code, version)
+        manifest = self.manifest(ts_code, version)
+        features = manifest['features']
+        tail = self.read_tail(ts_code, n, ['trade_date'] + features, version)
+        if manifest['scaler'] is not None:
+            scaled = scaler_from_dict(manifest['scaler']).transform(tail[features].to_numpy())
+            tail[features] = np.asarray(scaled, dtype=tail[features].to_numpy().dtype)
+        return tail
@@ -0,0 +1,262 @@
+import json
+import math
+import pandas as pd
+from collections import deque
+from typing import Dict, List, Optional
+
+MA_WINDOWS = (5, 10, 20)
+VOLATILITY_WINDOW = 20
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+
+INDICATOR_COLUMNS = ['MA5', 'MA10', 'MA20', 'MACD', 'Signal_Line', 'RSI', 'Volatility']
+
+_NAN = float('nan')
+
+
+def _alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+
+class _RollingWindow:
+    """固定长度窗口的滚动求和与Welford方差，支持序列化"""
+
+    def __init__(self, size: int, values: Optional[List[float]] = None):
+        self.size = size
+        self.values = deque(values or [], maxlen=size)
+        self._resync()
+
+    def _resync(self):
+        # 定期按窗口内的值重新求和，消除浮点累计误差；非零计数用于得到精确的0
+        self.total = math.fsum(self.values)
+        n = len(self.values)
+        self.avg = self.total / n if n else 0.0
+        self.m2 = math.fsum((v - self.avg) ** 2 for v in self.values)
+        self.nonzero = sum(1 for v in self.values if v != 0)
+        self._updates = 0
+
+    def push(self, value: float):
+        if len(self.values) == self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.nonzero -= old != 0
+            n = len(self.values)
+            if n:
+                delta = old - self.avg
+                self.avg -= delta / n
+                self.m2 -= delta * (old - self.avg)
+            else:
+                self.avg = self.m2 = 0.0
+        self.values.append(value)
+        self.total += value
+        self.nonzero += value != 0
+        delta = value - self.avg
+        self.avg += delta / len(self.values)
+        self.m2 += delta * (value - self.avg)
+
+        self._updates += 1
+        if self._updates >= self.size:
+            self._resync()
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def mean(self) -> float:
+        if not self.full:
+            return _NAN
+        return 0.0 if self.nonzero == 0 else self.total / self.size
+
+    def std(self) -> float:
+        if not self.full:
+            return _NAN
+        return math.sqrt(max(self.m2 / (self.size - 1), 0.0))
+
+
+class IndicatorState:
+    def __init__(self):
+        """单只股票的增量指标状态
+
+        每根新K线以常数时间更新MA5/10/20、MACD/Signal_Line、RSI和Volatility，
+        结果在浮点误差范围内与 DataProcessor.calculate_technical_indicators 的pandas批量计算一致。
+        """
+        self.count = 0
+        self.last_trade_date: Optional[str] = None
+        self.prev_close: Optional[float] = None
+        self.ma = {w: _RollingWindow(w) for w in MA_WINDOWS}
+        self.gain = _RollingWindow(RSI_WINDOW)
+        self.loss = _RollingWindow(RSI_WINDOW)
+        self.ema_fast: Optional[float] = None
+        self.ema_slow: Optional[float] = None
+        self.signal: Optional[float] = None
+
+    def update(self, close: float, trade_date: Optional[str] = None) -> Dict[str, float]:
+        """追加一根K线并返回最新指标
+
+        Args:
+            close (float): 收盘价
+            trade_date (Optional[str]): 交易日期，格式：YYYYMMDD；不晚于上次日期的K线会被忽略
+
+        Returns:
+            Dict[str, float]: 最新的指标值，历史不足时为NaN
+        """
+        if trade_date is not None and self.last_trade_date is not None \
+                and trade_date <= self.last_trade_date:
+            return self.current()
+        if close is None or math.isnan(close):
+            raise ValueError("收盘价不能为空")
+
+        close = float(close)
+        for window in self.ma.values():
+            window.push(close)
+
+        # 第一根K线没有涨跌幅，与pandas中 delta.where(...) 把NaN替换为0的行为一致
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gain.push(delta if delta > 0 else 0.0)
+        self.loss.push(-delta if delta < 0 else 0.0)
+
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = close
+            self.signal = 0.0
+        else:
+            self.ema_fast += _alpha(MACD_FAST) * (close - self.ema_fast)
+            self.ema_slow += _alpha(MACD_SLOW) * (close - self.ema_slow)
+            self.signal += _alpha(MACD_SIGNAL) * (self.ema_fast - self.ema_slow - self.signal)
+
+        self.prev_close = close
+        self.count += 1
+        if trade_date is not None:
+            self.last_trade_date = trade_date
+        return self.current()
+
+    def current(self) -> Dict[str, float]:
+        """返回当前的指标值"""
+        if self.count == 0:
+            return {column: _NAN for column in INDICATOR_COLUMNS}
+
+        gain, loss = self.gain.mean(), self.loss.mean()
+        if math.isnan(gain) or (gain == 0 and loss == 0):
+            rsi = _NAN
+        elif loss == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + gain / loss)
+
+        return {
+            'MA5': self.ma[5].mean(),
+            'MA10': self.ma[10].mean(),
+            'MA20': self.ma[20].mean(),
+            'MACD': self.ema_fast - self.ema_slow,
+            'Signal_Line': self.signal,
+            'RSI': rsi,
+            'Volatility': self.ma[VOLATILITY_WINDOW].std()
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'last_trade_date': self.last_trade_date,
+            'prev_close': self.prev_close,
+            'closes': list(self.ma[max(MA_WINDOWS)].values),
+            'gain': list(self.gain.values),
+            'loss': list(self.loss.values),
+            'ema_fast': self.ema_fast,
+            'ema_slow': self.ema_slow,
+            'signal': self.signal
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IndicatorState':
+        state = cls()
+        state.count = data['count']
+        state.last_trade_date = data['last_trade_date']
+        state.prev_close = data['prev_close']
+        state.ma = {w: _RollingWindow(w, data['closes'][-w:]) for w in MA_WINDOWS}
+        state.gain = _RollingWindow(RSI_WINDOW, data['gain'])
+        state.loss = _RollingWindow(RSI_WINDOW, data['loss'])
+        state.ema_fast = data['ema_fast']
+        state.ema_slow = data['ema_slow']
+        state.signal = data['signal']
+        return state
+
+
+class IncrementalIndicatorEngine:
+    def __init__(self):
+        """初始化多股票增量技术指标引擎"""
+        self.states: Dict[str, IndicatorState] = {}
+
+    def update(self, ts_code: str, close: float, trade_date: Optional[str] = None) -> Dict[str, float]:
+        """为指定股票追加一根K线
+
+        Args:
+            ts_code (str): 股票代码
+            close (float): 收盘价
+            trade_date (Optional[str]): 交易日期，格式：YYYYMMDD
+
+        Returns:
+            Dict[str, float]: 该股票的最新指标值
+        """
+        state = self.states.get(ts_code)
+        if state is None:
+            state = self.states[ts_code] = IndicatorState()
+        return state.update(close, trade_date)
+
+    def update_bars(self, df: pd.DataFrame) -> pd.DataFrame:
+        """按时间顺序追加一批新K线（可包含多只股票）
+
+        Args:
+            df (pd.DataFrame): 包含ts_code、trade_date、close列的新K线
+
+        Returns:
+            pd.DataFrame: 输入数据加上每根K线对应的指标列
+        """
+        df = df.sort_values('trade_date')
+        rows = [
+            self.update(ts_code, close, trade_date)
+            for ts_code, trade_date, close in zip(df['ts_code'], df['trade_date'], df['close'])
+        ]
+        indicators = pd.DataFrame(rows, index=df.index, columns=INDICATOR_COLUMNS)
+        return pd.concat([df, indicators], axis=1)
+
+    def warm_up(self, ts_code: str, df: pd.DataFrame):
+        """用历史数据初始化某只股票的状态
+
+        Args:
+            ts_code (str): 股票代码
+            df (pd.DataFrame): 包含trade_date、close列的历史日线
+        """
+        df = df.sort_values('trade_date')
+        state = self.states[ts_code] = IndicatorState()
+        for trade_date, close in zip(df['trade_date'], df['close']):
+            state.update(close, trade_date)
+
+    def to_dict(self) -> Dict:
+        return {ts_code: state.to_dict() for ts_code, state in self.states.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'IncrementalIndicatorEngine':
+        engine = cls()
+        engine.states = {ts_code: IndicatorState.from_dict(s) for ts_code, s in data.items()}
+        return engine
+
+    def save(self, path: str):
+        """将全部股票的指标状态保存为JSON文件
+
+        Args:
+            path (str): 保存路径
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'IncrementalIndicatorEngine':
+        """从JSON文件恢复指标状态
+
+        Args:
+            path (str): 状态文件路径
+
+        Returns:
+            IncrementalIndicatorEngine: 恢复后的引擎
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
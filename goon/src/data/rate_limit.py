@@ -0,0 +1,43 @@
+import time
+import threading
+from typing import Optional
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[int] = None):
+        """初始化令牌桶限流器（线程安全）
+
+        Args:
+            rate_per_minute (float): 每分钟允许的调用次数，对应Tushare接口的每分钟配额
+            capacity (Optional[int]): 桶容量，即允许的最大突发调用数，默认为每秒速率（至少为1）
+        """
+        if rate_per_minute <= 0:
+            raise ValueError("限流速率必须为正数")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, int(self.rate))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: int = 1):
+        """获取令牌，令牌不足时阻塞等待
+
+        Args:
+            tokens (int): 需要的令牌数
+        """
+        if tokens > self.capacity:
+            raise ValueError("请求的令牌数超过桶容量")
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
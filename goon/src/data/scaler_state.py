@@ -0,0 +1,41 @@
+import numpy as np
+from typing import Any, Dict
+from sklearn.preprocessing import MinMaxScaler
+
+_ARRAY_ATTRIBUTES = ['data_min_', 'data_max_', 'data_range_', 'scale_', 'min_']
+
+
+def scaler_to_dict(scaler: MinMaxScaler) -> Dict[str, Any]:
+    """将已拟合的MinMaxScaler参数转换为可JSON序列化的字典
+
+    Args:
+        scaler (MinMaxScaler): 已拟合的归一化器
+
+    Returns:
+        Dict[str, Any]: 归一化参数
+    """
+    if not hasattr(scaler, 'scale_'):
+        raise ValueError("归一化器尚未拟合")
+
+    state = {name: getattr(scaler, name).tolist() for name in _ARRAY_ATTRIBUTES}
+    state['feature_range'] = list(scaler.feature_range)
+    state['clip'] = bool(getattr(scaler, 'clip', False))
+    state['n_samples_seen_'] = int(scaler.n_samples_seen_)
+    return state
+
+
+def scaler_from_dict(state: Dict[str, Any]) -> MinMaxScaler:
+    """由参数字典恢复MinMaxScaler，无需重新拟合即可直接transform
+
+    Args:
+        state (Dict[str, Any]): scaler_to_dict 生成的参数
+
+    Returns:
+        MinMaxScaler: 恢复后的归一化器
+    """
+    scaler = MinMaxScaler(feature_range=tuple(state['feature_range']), clip=state['clip'])
+    for name in _ARRAY_ATTRIBUTES:
+        setattr(scaler, name, np.asarray(state[name], dtype=np.float64))
+    scaler.n_samples_seen_ = state['n_samples_seen_']
+    scaler.n_features_in_ = len(state['scale_'])
+    return scaler
@@ -0,0 +1,299 @@
+import os
+import copy
+import time
+import random
+import threading
+import pandas as pd
+from typing import Any, Callable, Dict, Optional, Tuple
+from data.rate_limit import TokenBucket
+from utils.instrumentation import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """数据源熔断中，请求未发出"""
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        fatal_errors: Tuple[type, ...] = (ValueError, TypeError, KeyError, PermissionError)
+    ):
+        """重试策略：对临时性错误按带抖动的指数退避重试
+
+        Args:
+            max_retries (int): 最大重试次数
+            backoff_base (float): 退避基准秒数，第n次重试等待约 backoff_base * 2^n 秒
+            backoff_max (float): 单次退避的最长等待秒数
+            fatal_errors (Tuple[type, ...]): 不重试的异常类型（参数错误等重试也不会成功的错误）
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.fatal_errors = fatal_errors
+
+    def is_fatal(self, error: Exception) -> bool:
+        """是否为重试也不会成功的错误"""
+        return isinstance(error, self.fatal_errors)
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """第attempt次（从0开始）调用失败后是否重试"""
+        if attempt >= self.max_retries:
+            return False
+        return not isinstance(error, CircuitOpenError) and not self.is_fatal(error)
+
+    def delay(self, attempt: int) -> float:
+        """第attempt次失败后的等待秒数，乘以 [0.5, 1) 的随机系数，避免多个调用方同时重试"""
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """熔断器（线程安全）
+
+        连续失败达到阈值后打开，打开期间的请求直接抛出 CircuitOpenError；
+        经过reset_timeout后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开；
+        试探请求没有记录结果就结束（如被KeyboardInterrupt中断）时，再过reset_timeout会放行下一个试探请求。
+
+        Args:
+            failure_threshold (int): 打开熔断器的连续失败次数
+            reset_timeout (float): 打开后多少秒允许试探请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """请求前检查，熔断中时抛出 CircuitOpenError"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # 半开状态下从放行试探请求时开始计时
+                self.state = HALF_OPEN
+                self._opened_at = time.monotonic()
+                return
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(f"数据源连续失败{self.failures}次，熔断中（约{remaining:.0f}秒后重试）")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    metrics.increment('api.circuit_opened')
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        """合并相同的并发请求：同一个key在执行期间，其他调用方等待并共享同一个结果"""
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Any,
+        func: Callable[[], Any],
+        copy: Optional[Callable[[Any], Any]] = None
+    ) -> Tuple[Any, bool]:
+        """执行或等待同一个key的请求
+
+        Args:
+            key (Any): 请求的key
+            func (Callable[[], Any]): 实际执行的请求
+            copy (Optional[Callable[[Any], Any]]): 结果被多个调用方共享时，每个调用方（包括发起者）
+                各自得到的副本，共享的原始结果不会交给任何调用方，避免一方原地修改时其他方正在读取
+
+        Returns:
+            Tuple[Any, bool]: (结果, 是否等待并共享了其他调用方的请求)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return (copy(call.result) if copy is not None else call.result), True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.followers > 0
+            call.done.set()
+        if shared and copy is not None:
+            return copy(call.result), False
+        return call.result, False
+
+
+class TushareBackend:
+    def __init__(self, token: str):
+        """Tushare Pro 接口"""
+        import tushare as ts
+        self.api = ts.pro_api(token)
+
+    def call(self, api_name: str, **params) -> pd.DataFrame:
+        return getattr(self.api, api_name)(**params)
+
+
+class LocalBackend:
+    # 各接口按哪一列筛选日期区间
+    DATE_COLUMNS = {'daily': 'trade_date', 'fina_indicator': 'end_date'}
+
+    def __init__(self, root: str):
+        """本地替身数据源，用于离线测试
+
+        按接口名从Parquet文件读取数据：带ts_code参数的接口读取 <root>/<接口名>/<ts_code>.parquet，
+        其他接口读取 <root>/<接口名>.parquet。start_date/end_date 按日期列筛选，
+        fields 投影列，其余与列名相同且非空的参数按相等筛选。
+
+        Args:
+            root (str): 数据目录
+        """
+        self.root = root
+
+    def _path(self, api_name: str, ts_code: Optional[str]) -> str:
+        if ts_code:
+            return os.path.join(self.root, api_name, f"{ts_code}.parquet")
+        return os.path.join(self.root, f"{api_name}.parquet")
+
+    def put(self, api_name: str, df: pd.DataFrame, ts_code: Optional[str] = None):
+        """写入替身数据"""
+        path = self._path(api_name, ts_code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, index=False)
+
+    def call(self, api_name: str, **params) -> pd.DataFrame:
+        path = self._path(api_name, params.get('ts_code'))
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = pd.read_parquet(path)
+
+        date_column = self.DATE_COLUMNS.get(api_name)
+        if date_column in df.columns:
+            if params.get('start_date'):
+                df = df[df[date_column] >= params['start_date']]
+            if params.get('end_date'):
+                df = df[df[date_column] <= params['end_date']]
+        for name, value in params.items():
+            if name not in ('ts_code', 'start_date', 'end_date', 'fields') and name in df.columns and value != '':
+                df = df[df[name] == value]
+        if params.get('fields'):
+            df = df[[c for c in params['fields'].split(',') if c in df.columns]]
+        return df.reset_index(drop=True)
+
+
+class Transport:
+    def __init__(
+        self,
+        backend,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        single_flight: bool = True
+    ):
+        """数据源调用层：合并相同的并发请求、限流、失败重试和熔断
+
+        Args:
+            backend: 提供 call(api_name, **params) 的数据源，如 TushareBackend、LocalBackend
+            retry (Optional[RetryPolicy]): 重试策略，默认 RetryPolicy()
+            breaker (Optional[CircuitBreaker]): 熔断器，默认 CircuitBreaker()
+            rate_limiter (Optional[TokenBucket]): 限流器，每次实际请求前获取令牌
+            single_flight (bool): 是否合并相同的并发请求
+        """
+        self.backend = backend
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self._single_flight = SingleFlight() if single_flight else None
+
+    def with_rate_limiter(self, rate_limiter: Optional[TokenBucket]) -> 'Transport':
+        """返回使用另一个限流器的视图，数据源、重试策略、熔断器和请求合并都与原对象共用"""
+        view = copy.copy(self)
+        view.rate_limiter = rate_limiter
+        return view
+
+    def call(self, api_name: str, **params) -> pd.DataFrame:
+        """调用接口，重试用尽或熔断中时抛出异常"""
+        if self._single_flight is None:
+            return self._call_with_retry(api_name, params)
+
+        key = (api_name, tuple(sorted(params.items())))
+        # 调用方可能原地修改结果（如 cast_frame），共享的结果各自复制一份
+        df, coalesced = self._single_flight.do(
+            key, lambda: self._call_with_retry(api_name, params), copy=pd.DataFrame.copy
+        )
+        if coalesced:
+            metrics.increment(f"api.{api_name}.coalesced")
+        return df
+
+    def _call_with_retry(self, api_name: str, params: Dict[str, Any]) -> pd.DataFrame:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                df = self._attempt(api_name, params)
+            except Exception as e:
+                if self.retry.is_fatal(e):
+                    # 参数错误等说明数据源有响应，不计入熔断器的连续失败
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if not self.retry.should_retry(e, attempt):
+                    raise
+                metrics.increment(f"api.{api_name}.retries")
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+            else:
+                self.breaker.record_success()
+                return df
+
+    def _attempt(self, api_name: str, params: Dict[str, Any]) -> pd.DataFrame:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if not metrics.enabled:
+            return self.backend.call(api_name, **params)
+
+        metrics.increment(f"api.{api_name}.calls")
+        start = time.perf_counter()
+        try:
+            return self.backend.call(api_name, **params)
+        except Exception:
+            metrics.increment(f"api.{api_name}.errors")
+            raise
+        finally:
+            metrics.observe(f"api.{api_name}", time.perf_counter() - start)
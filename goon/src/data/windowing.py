@@ -0,0 +1,131 @@
+import numpy as np
+from typing import Iterable, Optional, Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from data.dtypes import float_dtype
+
+
+def sliding_windows(data: np.ndarray, sequence_length: int) -> np.ndarray:
+    """构建滑动窗口视图（不复制数据）
+
+    Args:
+        data (np.ndarray): 二维数据，形状为 (时间步, 特征数)
+        sequence_length (int): 序列长度
+
+    Returns:
+        np.ndarray: 只读视图，形状为 (时间步 - sequence_length + 1, sequence_length, 特征数)
+    """
+    if data.ndim != 2:
+        raise ValueError(f"数据必须是二维数组，当前维度：{data.ndim}")
+    if sequence_length <= 0:
+        raise ValueError("序列长度必须为正整数")
+
+    if len(data) < sequence_length:
+        return np.empty((0, sequence_length, data.shape[1]), dtype=data.dtype)
+
+    # sliding_window_view把窗口维放在最后，转置回 (样本, 序列, 特征)，仍然是视图
+    return sliding_window_view(data, sequence_length, axis=0).transpose(0, 2, 1)
+
+
+def build_sequences(
+    features: np.ndarray,
+    target: np.ndarray,
+    sequence_length: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """构建时间序列训练样本
+
+    第i个样本为 features[i:i + sequence_length]，标签为 target[i + sequence_length]，
+    与逐个切片再 np.array 的结果一致，但X为共享底层内存的只读视图。
+
+    Args:
+        features (np.ndarray): 特征数据，形状为 (时间步, 特征数)
+        target (np.ndarray): 目标变量，形状为 (时间步,)
+        sequence_length (int): 序列长度
+
+    Returns:
+        tuple: (X, y) 训练数据和标签
+    """
+    if len(features) != len(target):
+        raise ValueError("特征与目标变量长度不一致")
+
+    n_samples = max(len(features) - sequence_length, 0)
+    X = sliding_windows(features, sequence_length)[:n_samples]
+    y = target[sequence_length:sequence_length + n_samples]
+    return X, y
+
+
+def materialize_windows(
+    windows: np.ndarray,
+    path: str,
+    dtype: Optional[np.dtype] = None,
+    chunk_size: int = 4096
+) -> np.memmap:
+    """将窗口视图分块写入内存映射的 .npy 文件
+
+    Args:
+        windows (np.ndarray): 窗口数据（可以是视图）
+        path (str): 输出文件路径
+        dtype (Optional[np.dtype]): 输出数据类型，默认与输入一致
+        chunk_size (int): 每次写入的样本数
+
+    Returns:
+        np.memmap: 以只读方式重新打开的内存映射数组
+    """
+    dtype = windows.dtype if dtype is None else np.dtype(dtype)
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=windows.shape)
+
+    # 分块写入，避免一次性在内存中物化全部窗口
+    for start in range(0, len(windows), chunk_size):
+        out[start:start + chunk_size] = windows[start:start + chunk_size]
+
+    out.flush()
+    del out
+    return np.load(path, mmap_mode='r')
+
+
+def write_sequence_files(
+    sources: Iterable[Tuple[np.ndarray, np.ndarray]],
+    x_path: str,
+    y_path: str,
+    n_samples: int,
+    sequence_length: int,
+    n_features: int,
+    dtype: Optional[np.dtype] = None
+) -> Tuple[np.memmap, np.memmap]:
+    """将多只股票的窗口依次写入同一组内存映射文件，供流式训练使用
+
+    每只股票单独构建窗口，窗口不会跨越股票边界；任意时刻内存中只有一只股票的数据。
+
+    Args:
+        sources (Iterable[Tuple[np.ndarray, np.ndarray]]): 逐只股票产出 (特征, 目标变量)
+        x_path (str): 窗口特征输出路径（.npy）
+        y_path (str): 标签输出路径（.npy）
+        n_samples (int): 样本总数，即各股票 max(行数 - sequence_length, 0) 之和
+        sequence_length (int): 序列长度
+        n_features (int): 特征数
+        dtype (Optional[np.dtype]): 输出数据类型，默认为流水线的浮点类型
+
+    Returns:
+        Tuple[np.memmap, np.memmap]: 以只读方式重新打开的 (X, y)
+    """
+    dtype = float_dtype() if dtype is None else np.dtype(dtype)
+    X_out = np.lib.format.open_memmap(
+        x_path, mode='w+', dtype=dtype, shape=(n_samples, sequence_length, n_features)
+    )
+    y_out = np.lib.format.open_memmap(y_path, mode='w+', dtype=dtype, shape=(n_samples,))
+
+    position = 0
+    for features, target in sources:
+        X, y = build_sequences(features, target, sequence_length)
+        if position + len(X) > n_samples:
+            raise ValueError("实际样本数超过n_samples")
+        X_out[position:position + len(X)] = X
+        y_out[position:position + len(y)] = y
+        position += len(X)
+
+    if position != n_samples:
+        raise ValueError(f"实际样本数{position}与n_samples={n_samples}不一致")
+
+    X_out.flush()
+    y_out.flush()
+    del X_out, y_out
+    return np.load(x_path, mmap_mode='r'), np.load(y_path, mmap_mode='r')
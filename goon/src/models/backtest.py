@@ -0,0 +1,606 @@
+import os
+import json
+import time
+import hashlib
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.preprocessing import MinMaxScaler
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from data.dtypes import as_float
+from data.windowing import sliding_windows
+from models.ensemble import EnsembleWeights, optimize_weights
+from utils.instrumentation import instrumented
+
+PANEL_DIR = 'panel'
+PREDICTIONS_FILE = 'predictions.npz'
+BUNDLE_DIR = 'bundle'
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'
+)
+
+# 工作进程内的面板样本，由 _init_worker 加载一次
+_worker: Dict[str, Any] = {}
+
+
+@dataclass
+class PanelSamples:
+    """多只股票的窗口样本索引
+
+    特征按 (ts_code, trade_date) 排序后存放在一个连续数组中，第i个样本的窗口为
+    data[window_start[i]:window_start[i] + sequence_length]，标签为其后一行的目标变量。
+    窗口只在取用时按索引物化，不会为全部样本复制数据。
+    """
+    data: np.ndarray
+    target: np.ndarray
+    window_start: np.ndarray
+    date_index: np.ndarray
+    symbol_index: np.ndarray
+    dates: np.ndarray
+    symbols: np.ndarray
+    sequence_length: int
+
+    def __len__(self) -> int:
+        return len(self.window_start)
+
+    def windows(self, sample_ids: np.ndarray) -> np.ndarray:
+        """物化指定样本的窗口，形状为 (样本, 序列, 特征)"""
+        return sliding_windows(self.data, self.sequence_length)[self.window_start[sample_ids]]
+
+    def labels(self, sample_ids: np.ndarray) -> np.ndarray:
+        return self.target[self.window_start[sample_ids] + self.sequence_length]
+
+    def previous(self, sample_ids: np.ndarray) -> np.ndarray:
+        """窗口最后一行的目标变量，用于判断涨跌方向"""
+        return self.target[self.window_start[sample_ids] + self.sequence_length - 1]
+
+    def fingerprint(self) -> str:
+        """样本内容的哈希，数据变化时回测缓存自动失效"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.sequence_length, self.data.shape, self.data.dtype.name]).encode())
+        for array in (self.data, self.target, self.window_start):
+            digest.update(np.ascontiguousarray(array).data)
+        digest.update('\n'.join(map(str, self.dates)).encode())
+        digest.update('\n'.join(map(str, self.symbols)).encode())
+        return digest.hexdigest()
+
+    def save(self, path: str):
+        """保存为 .npy 文件，工作进程以内存映射方式加载，避免每个进程各复制一份"""
+        os.makedirs(path, exist_ok=True)
+        for name in ('data', 'target', 'window_start', 'date_index', 'symbol_index'):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'dates': [str(d) for d in self.dates],
+                'symbols': [str(s) for s in self.symbols],
+                'sequence_length': self.sequence_length
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = 'r') -> 'PanelSamples':
+        with open(os.path.join(path, 'index.json'), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ('data', 'target', 'window_start', 'date_index', 'symbol_index')
+        }
+        return cls(
+            dates=np.array(index['dates'], dtype=object),
+            symbols=np.array(index['symbols'], dtype=object),
+            sequence_length=index['sequence_length'],
+            **arrays
+        )
+
+
+def build_panel_samples(
+    df: pd.DataFrame,
+    features: List[str],
+    target: str,
+    sequence_length: int
+) -> PanelSamples:
+    """从包含多个ts_code的长表构建窗口样本
+
+    窗口和标签必须属于同一只股票，且窗口内和标签行都不能有缺失值；这些条件都通过
+    对整个数组的向量化运算判断，不逐只股票循环。
+
+    Args:
+        df (pd.DataFrame): 长表，包含ts_code、trade_date、特征和目标变量列
+        features (List[str]): 特征列表
+        target (str): 目标变量
+        sequence_length (int): 序列长度
+
+    Returns:
+        PanelSamples: 样本索引
+    """
+    df = df.sort_values(['ts_code', 'trade_date'], ignore_index=True)
+    data = np.ascontiguousarray(as_float(df[features].to_numpy()))
+    values = as_float(df[target].to_numpy())
+    symbols, symbol_codes = np.unique(df['ts_code'].astype(str).to_numpy(), return_inverse=True)
+    dates, date_codes = np.unique(df['trade_date'].astype(str).to_numpy(), return_inverse=True)
+
+    start = np.arange(max(len(df) - sequence_length, 0))
+    label = start + sequence_length
+    # 窗口 [start, label] 内缺失值行数由前缀和相减得到
+    missing = np.r_[0, np.cumsum(np.isnan(data).any(axis=1) | np.isnan(values))]
+    valid = (symbol_codes[start] == symbol_codes[label]) & (missing[label + 1] == missing[start])
+    start, label = start[valid], label[valid]
+
+    return PanelSamples(
+        data=data,
+        target=values,
+        window_start=start,
+        date_index=date_codes[label],
+        symbol_index=symbol_codes[label],
+        dates=dates.astype(object),
+        symbols=symbols.astype(object),
+        sequence_length=sequence_length
+    )
+
+
+@dataclass
+class BacktestPeriod:
+    """一个回测区间：用标签日期在 [train_start, train_end) 的样本训练，
+    预测标签日期在 [test_start, test_end) 的样本（均为交易日序号）"""
+    index: int
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def walk_forward_periods(
+    n_dates: int,
+    min_train_dates: int,
+    retrain_every: int,
+    train_window: Optional[int] = None
+) -> List[BacktestPeriod]:
+    """划分滚动前进的回测区间
+
+    Args:
+        n_dates (int): 交易日数量
+        min_train_dates (int): 第一个区间的训练交易日数
+        retrain_every (int): 每隔多少个交易日重新训练，也是每个区间预测的交易日数
+        train_window (Optional[int]): 滚动窗口的训练交易日数，为None时使用扩展窗口（从第一天开始）
+
+    Returns:
+        List[BacktestPeriod]: 回测区间列表
+    """
+    if retrain_every <= 0 or min_train_dates <= 0:
+        raise ValueError("retrain_every 和 min_train_dates 必须为正整数")
+
+    periods = []
+    for test_start in range(min_train_dates, n_dates, retrain_every):
+        train_start = 0 if train_window is None else max(0, test_start - train_window)
+        periods.append(BacktestPeriod(
+            index=len(periods),
+            train_start=train_start,
+            train_end=test_start,
+            test_start=test_start,
+            test_end=min(test_start + retrain_every, n_dates)
+        ))
+    return periods
+
+
+def backtest_metrics(
+    prediction: np.ndarray,
+    actual: np.ndarray,
+    previous: np.ndarray
+) -> Tuple[Dict[str, float], pd.DataFrame, pd.DataFrame]:
+    """在 (交易日 × 股票) 的矩阵上计算回测指标，缺失值表示当天没有该股票的预测
+
+    方向命中率比较预测值和实际值相对窗口最后一天的涨跌方向；持仓按预测方向做多/做空、
+    每天等权且总敞口为1，换手率为每天持仓权重变化绝对值之和的一半；IC为每天预测涨跌幅
+    与实际涨跌幅的横截面相关系数。
+
+    Args:
+        prediction (np.ndarray): 预测值矩阵
+        actual (np.ndarray): 实际值矩阵
+        previous (np.ndarray): 窗口最后一天的目标变量矩阵
+
+    Returns:
+        Tuple[Dict[str, float], pd.DataFrame, pd.DataFrame]: (汇总指标, 按交易日的指标, 按股票的指标)，
+        后两者的行与矩阵的行、列一一对应
+    """
+    valid = ~(np.isnan(prediction) | np.isnan(actual) | np.isnan(previous))
+    predicted_change = np.where(valid, prediction - previous, 0.0)
+    actual_change = np.where(valid, actual - previous, 0.0)
+    error = np.where(valid, prediction - actual, 0.0)
+    direction = np.sign(predicted_change)
+    hit = valid & (direction == np.sign(actual_change))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n_date, n_symbol = valid.sum(axis=1), valid.sum(axis=0)
+
+        gross = np.abs(direction).sum(axis=1, keepdims=True)
+        weights = np.where(gross > 0, direction / gross, 0.0)
+        turnover = 0.5 * np.abs(np.diff(weights, axis=0, prepend=0.0)).sum(axis=1)
+
+        pred_demeaned = np.where(valid, predicted_change - predicted_change.sum(axis=1, keepdims=True) / n_date[:, None], 0.0)
+        actual_demeaned = np.where(valid, actual_change - actual_change.sum(axis=1, keepdims=True) / n_date[:, None], 0.0)
+        ic = (pred_demeaned * actual_demeaned).sum(axis=1) / np.sqrt(
+            (pred_demeaned ** 2).sum(axis=1) * (actual_demeaned ** 2).sum(axis=1)
+        )
+        ic = np.where(n_date > 1, ic, np.nan)
+
+        per_date = pd.DataFrame({
+            'count': n_date,
+            'hit_rate': hit.sum(axis=1) / n_date,
+            'mae': np.abs(error).sum(axis=1) / n_date,
+            'ic': ic,
+            'turnover': np.where(n_date > 0, turnover, np.nan)
+        })
+
+        # 预测方向相对上一个有预测的交易日发生变化的次数
+        flips = (direction[1:] != direction[:-1]) & valid[1:] & valid[:-1]
+        per_symbol = pd.DataFrame({
+            'count': n_symbol,
+            'hit_rate': hit.sum(axis=0) / n_symbol,
+            'mae': np.abs(error).sum(axis=0) / n_symbol,
+            'rmse': np.sqrt((error ** 2).sum(axis=0) / n_symbol),
+            'direction_changes': flips.sum(axis=0)
+        })
+
+    total = int(valid.sum())
+    active = n_date > 0
+    ic_values = ic[np.isfinite(ic)]
+    summary = {
+        'samples': total,
+        'hit_rate': float(hit.sum() / total) if total else float('nan'),
+        'mae': float(np.abs(error).sum() / total) if total else float('nan'),
+        'rmse': float(np.sqrt((error ** 2).sum() / total)) if total else float('nan'),
+        'mean_ic': float(ic_values.mean()) if len(ic_values) else float('nan'),
+        'ic_ir': float(ic_values.mean() / ic_values.std()) if len(ic_values) > 1 and ic_values.std() > 0 else float('nan'),
+        # 第一天的建仓不计入平均换手率
+        'mean_turnover': float(turnover[active][1:].mean()) if active.sum() > 1 else float('nan')
+    }
+    return summary, per_date, per_symbol
+
+
+@dataclass
+class BacktestResult:
+    """回测结果，预测矩阵的行对应 dates、列对应 symbols"""
+    dates: np.ndarray
+    symbols: np.ndarray
+    lstm: np.ndarray
+    xgb: np.ndarray
+    ensemble: np.ndarray
+    actual: np.ndarray
+    previous: np.ndarray
+    summary: Dict[str, float]
+    per_date: pd.DataFrame
+    per_symbol: pd.DataFrame
+    periods: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def to_long(self) -> pd.DataFrame:
+        """转换为 (trade_date, ts_code) 的长表，只包含有预测的行"""
+        date_idx, symbol_idx = np.nonzero(~np.isnan(self.ensemble))
+        return pd.DataFrame({
+            'trade_date': self.dates[date_idx],
+            'ts_code': self.symbols[symbol_idx],
+            'lstm_prediction': self.lstm[date_idx, symbol_idx],
+            'xgb_prediction': self.xgb[date_idx, symbol_idx],
+            'ensemble_prediction': self.ensemble[date_idx, symbol_idx],
+            'actual': self.actual[date_idx, symbol_idx],
+            'previous': self.previous[date_idx, symbol_idx]
+        })
+
+    def optimize_weights(self, step: float = 0.05, metric: str = 'mse') -> EnsembleWeights:
+        """在各区间的样本外预测上搜索LSTM和XGBoost的集成权重
+
+        回测中每个预测都来自未见过该交易日的模型，结果可以直接赋给 ModelTrainer.ensemble_weights 随模型包保存。
+        """
+        mask = ~np.isnan(self.lstm) & ~np.isnan(self.xgb) & ~np.isnan(self.actual)
+        return optimize_weights({'lstm': self.lstm[mask], 'xgb': self.xgb[mask]}, self.actual[mask],
+                                step=step, metric=metric)
+
+
+def _init_worker(samples, n_threads: int):
+    """加载面板样本并限制进程内TensorFlow/XGBoost/BLAS的线程数，避免多个进程互相抢占CPU"""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    from threadpoolctl import threadpool_limits
+    _worker['thread_limits'] = threadpool_limits(n_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    _worker['samples'] = PanelSamples.load(samples) if isinstance(samples, str) else samples
+
+
+def _scale_windows(scaler: MinMaxScaler, X: np.ndarray) -> np.ndarray:
+    """用已拟合的归一化器逐特征变换窗口，形状不变"""
+    return as_float(scaler.transform(X.reshape(-1, X.shape[2]))).reshape(X.shape)
+
+
+def _period_dir(cache_dir: str, period: BacktestPeriod, key: str) -> str:
+    return os.path.join(cache_dir, f"period-{period.index:04d}-{key[:16]}")
+
+
+def run_period(period: BacktestPeriod, config: Dict[str, Any], cache_key: Optional[str] = None) -> Dict[str, Any]:
+    """训练并预测一个回测区间；设置了缓存目录时优先读取缓存的预测结果
+
+    Args:
+        period (BacktestPeriod): 回测区间
+        config (Dict[str, Any]): 训练参数，见 WalkForwardBacktester.config
+        cache_key (Optional[str]): 区间缓存键，为None时不使用缓存
+
+    Returns:
+        Dict[str, Any]: 区间结果，包含测试样本序号和两个模型的预测值（与样本序号一一对应）
+    """
+    samples: PanelSamples = _worker['samples']
+    start = time.perf_counter()
+    train_ids = np.flatnonzero((samples.date_index >= period.train_start) & (samples.date_index < period.train_end))
+    test_ids = np.flatnonzero((samples.date_index >= period.test_start) & (samples.date_index < period.test_end))
+    result = {'period': period.index, 'sample_ids': test_ids, 'train_size': len(train_ids), 'cached': False}
+
+    period_dir = None
+    if config['cache_dir'] and cache_key:
+        period_dir = _period_dir(config['cache_dir'], period, cache_key)
+        cached = os.path.join(period_dir, PREDICTIONS_FILE)
+        if os.path.exists(cached):
+            with np.load(cached) as f:
+                result.update(lstm=f['lstm'], xgb=f['xgb'], cached=True)
+            result['elapsed'] = time.perf_counter() - start
+            return result
+
+    if len(train_ids) == 0 or len(test_ids) == 0:
+        result.update(sample_ids=test_ids[:0], lstm=np.empty(0), xgb=np.empty(0))
+        result['elapsed'] = time.perf_counter() - start
+        return result
+
+    # 面板样本按股票、日期排列，按日期重排后 train_full 的验证集才是时间上最后的部分
+    train_ids = train_ids[np.argsort(samples.date_index[train_ids], kind='stable')]
+
+    # 归一化器只在训练样本的窗口上拟合（这些行的日期都早于 train_end），测试区间的数据不参与
+    X_train = samples.windows(train_ids)
+    scaler = MinMaxScaler().fit(X_train.reshape(-1, X_train.shape[2]))
+    y_train = samples.labels(train_ids)
+    # 目标变量同时是特征时，与单只股票的流程一样在归一化后的尺度上训练，预测再还原为原始尺度
+    target_column = config['features'].index(config['target']) if config['target'] in config['features'] else None
+    if target_column is not None:
+        y_train = as_float(y_train * scaler.scale_[target_column] + scaler.min_[target_column])
+
+    from models.model_trainer import ModelTrainer
+    trainer = ModelTrainer()
+    trainer.train_full(
+        _scale_windows(scaler, X_train),
+        y_train,
+        validation_split=config['validation_split'],
+        epochs=config['epochs'],
+        batch_size=config['batch_size']
+    )
+    del X_train
+
+    X_test = _scale_windows(scaler, samples.windows(test_ids))
+    lstm_pred = trainer.lstm_model.predict(X_test, batch_size=config['predict_batch_size'], verbose=0).reshape(-1)
+    xgb_pred = trainer.xgb_model.predict(np.ascontiguousarray(X_test[:, -1, :])).reshape(-1)
+    if target_column is not None:
+        lstm_pred = (lstm_pred - scaler.min_[target_column]) / scaler.scale_[target_column]
+        xgb_pred = (xgb_pred - scaler.min_[target_column]) / scaler.scale_[target_column]
+
+    if period_dir is not None:
+        os.makedirs(period_dir, exist_ok=True)
+        if config['save_models']:
+            trainer.save_bundle(
+                os.path.join(period_dir, BUNDLE_DIR),
+                scaler=scaler,
+                features=config['features'],
+                sequence_length=samples.sequence_length,
+                metadata={'backtest_period': {
+                    'train_start': str(samples.dates[period.train_start]),
+                    'train_end': str(samples.dates[period.train_end - 1]),
+                    'test_start': str(samples.dates[period.test_start]),
+                    'test_end': str(samples.dates[period.test_end - 1])
+                }}
+            )
+        tmp_path = os.path.join(period_dir, PREDICTIONS_FILE + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, lstm=lstm_pred, xgb=xgb_pred)
+        os.replace(tmp_path, os.path.join(period_dir, PREDICTIONS_FILE))
+
+    result.update(lstm=lstm_pred, xgb=xgb_pred, elapsed=time.perf_counter() - start)
+    return result
+
+
+class WalkForwardBacktester:
+    def __init__(
+        self,
+        features: List[str],
+        target: str = 'close',
+        sequence_length: int = 60,
+        retrain_every: int = 20,
+        min_train_dates: int = 250,
+        train_window: Optional[int] = None,
+        epochs: int = 20,
+        batch_size: int = 256,
+        validation_split: float = 0.2,
+        ensemble_weights: Tuple[float, float] = (0.6, 0.4),
+        cache_dir: Optional[str] = None,
+        save_models: bool = True,
+        n_jobs: int = 1,
+        threads_per_worker: Optional[int] = None
+    ):
+        """滚动前进（walk-forward）回测
+
+        每个区间用 ModelTrainer.train_full 在之前的交易日上从头训练，然后预测之后
+        retrain_every 个交易日的全部股票。特征使用原始值，每个区间只在训练样本上拟合归一化器，
+        避免测试区间的数据通过归一化参数泄漏到训练中；各区间相互独立，n_jobs > 1 时在进程池中并行。
+        设置cache_dir时，每个区间的模型包和预测结果按数据哈希和训练参数缓存，重复运行或
+        追加新数据后只需训练新增的区间。
+
+        Args:
+            features (List[str]): 特征列表
+            target (str): 目标变量
+            sequence_length (int): 序列长度
+            retrain_every (int): 重新训练的间隔（交易日数）
+            min_train_dates (int): 第一个区间的训练交易日数
+            train_window (Optional[int]): 滚动窗口的训练交易日数，为None时使用扩展窗口
+            epochs (int): 每个区间LSTM的训练轮数
+            batch_size (int): 训练批次大小
+            validation_split (float): 每个区间的验证集比例
+            ensemble_weights (Tuple[float, float]): LSTM和XGBoost的集成权重
+            cache_dir (Optional[str]): 缓存目录，为None时不缓存
+            save_models (bool): 是否在缓存目录中保存每个区间的模型包
+            n_jobs (int): 并行进程数
+            threads_per_worker (Optional[int]): 每个进程的计算线程数，默认平分CPU核数
+        """
+        self.features = list(features)
+        self.target = target
+        self.sequence_length = sequence_length
+        self.retrain_every = retrain_every
+        self.min_train_dates = min_train_dates
+        self.train_window = train_window
+        self.ensemble_weights = tuple(ensemble_weights)
+        self.n_jobs = n_jobs
+        self.threads_per_worker = threads_per_worker
+        self.config = {
+            'features': self.features,
+            'target': self.target,
+            'epochs': epochs,
+            'batch_size': batch_size,
+            'predict_batch_size': 4096,
+            'validation_split': validation_split,
+            'cache_dir': cache_dir,
+            'save_models': save_models
+        }
+
+    def _cache_key(self, fingerprint: str, period: BacktestPeriod) -> str:
+        """同一份数据、同样的训练参数和区间才能复用缓存"""
+        digest = hashlib.sha256()
+        digest.update(fingerprint.encode())
+        digest.update(json.dumps([
+            self.features, self.target, 'period_scaler',
+            self.config['epochs'], self.config['batch_size'], self.config['validation_split'],
+            period.train_start, period.train_end, period.test_start, period.test_end
+        ]).encode())
+        return digest.hexdigest()
+
+    @instrumented('backtest.run')
+    def run(
+        self,
+        df: pd.DataFrame,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> BacktestResult:
+        """运行回测
+
+        Args:
+            df (pd.DataFrame): 长表，包含ts_code、trade_date、特征和目标变量列（特征为原始值，各区间自行归一化）
+            progress (Optional[Callable[[int, int], None]]): 每个区间完成后调用 progress(已完成, 总数)
+
+        Returns:
+            BacktestResult: 回测结果
+        """
+        started = time.perf_counter()
+        samples = build_panel_samples(df, self.features, self.target, self.sequence_length)
+        periods = walk_forward_periods(len(samples.dates), self.min_train_dates, self.retrain_every, self.train_window)
+        if not periods:
+            raise ValueError(f"交易日数量（{len(samples.dates)}）不足，至少需要 {self.min_train_dates + 1} 个交易日")
+
+        cache_dir = self.config['cache_dir']
+        fingerprint = samples.fingerprint() if cache_dir else None
+        keys = {p.index: self._cache_key(fingerprint, p) if fingerprint else None for p in periods}
+
+        # 已缓存的区间直接在当前进程读取，只有需要训练的区间才交给进程池
+        _worker['samples'] = samples
+        try:
+            pending = [
+                p for p in periods
+                if not (keys[p.index] and os.path.exists(os.path.join(_period_dir(cache_dir, p, keys[p.index]), PREDICTIONS_FILE)))
+            ]
+            n_jobs = max(1, min(self.n_jobs, len(pending)))
+            local = periods if n_jobs == 1 else [p for p in periods if p not in pending]
+
+            results = []
+            for period in local:
+                results.append(run_period(period, self.config, keys[period.index]))
+                if progress is not None:
+                    progress(len(results), len(periods))
+
+            if n_jobs > 1:
+                worker_samples = samples
+                if cache_dir:
+                    # 面板样本写入缓存目录后由各进程内存映射，避免在每个进程中各复制一份
+                    worker_samples = os.path.join(cache_dir, PANEL_DIR, fingerprint[:16])
+                    if not os.path.exists(os.path.join(worker_samples, 'index.json')):
+                        samples.save(worker_samples)
+                threads = self.threads_per_worker or max(1, (os.cpu_count() or 1) // n_jobs)
+                # TensorFlow在fork后不安全，使用spawn启动子进程
+                with ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp.get_context('spawn'),
+                                         initializer=_init_worker, initargs=(worker_samples, threads)) as executor:
+                    futures = [executor.submit(run_period, period, self.config, keys[period.index]) for period in pending]
+                    try:
+                        for future in as_completed(futures):
+                            results.append(future.result())
+                            if progress is not None:
+                                progress(len(results), len(periods))
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+        finally:
+            # 释放当前进程持有的面板样本
+            _worker.pop('samples', None)
+        results.sort(key=lambda result: result['period'])
+
+        return self._assemble(samples, periods, results, started)
+
+    def _assemble(
+        self,
+        samples: PanelSamples,
+        periods: List[BacktestPeriod],
+        results: List[Dict[str, Any]],
+        started: float
+    ) -> BacktestResult:
+        """把各区间的预测结果填入 (交易日 × 股票) 矩阵并计算指标"""
+        sample_ids = np.concatenate([r['sample_ids'] for r in results]).astype(np.int64)
+        lstm_pred = np.concatenate([r['lstm'] for r in results]).astype(np.float64)
+        xgb_pred = np.concatenate([r['xgb'] for r in results]).astype(np.float64)
+        rows, cols = samples.date_index[sample_ids], samples.symbol_index[sample_ids]
+
+        shape = (len(samples.dates), len(samples.symbols))
+
+        def to_matrix(values: np.ndarray) -> np.ndarray:
+            matrix = np.full(shape, np.nan)
+            matrix[rows, cols] = values
+            return matrix
+
+        lstm = to_matrix(lstm_pred)
+        xgb = to_matrix(xgb_pred)
+        ensemble = to_matrix(self.ensemble_weights[0] * lstm_pred + self.ensemble_weights[1] * xgb_pred)
+        actual = to_matrix(samples.labels(sample_ids))
+        previous = to_matrix(samples.previous(sample_ids))
+
+        summary, per_date, per_symbol = backtest_metrics(ensemble, actual, previous)
+        summary['periods'] = len(periods)
+        summary['cached_periods'] = sum(r['cached'] for r in results)
+        per_date.insert(0, 'trade_date', samples.dates)
+        per_symbol.insert(0, 'ts_code', samples.symbols)
+
+        return BacktestResult(
+            dates=samples.dates,
+            symbols=samples.symbols,
+            lstm=lstm,
+            xgb=xgb,
+            ensemble=ensemble,
+            actual=actual,
+            previous=previous,
+            summary=summary,
+            per_date=per_date[per_date['count'] > 0].reset_index(drop=True),
+            per_symbol=per_symbol[per_symbol['count'] > 0].reset_index(drop=True),
+            periods=[{
+                'period': p.index,
+                'train_start': str(samples.dates[p.train_start]),
+                'train_end': str(samples.dates[p.train_end - 1]),
+                'test_start': str(samples.dates[p.test_start]),
+                'test_end': str(samples.dates[p.test_end - 1]),
+                'train_size': r['train_size'],
+                'test_size': len(r['sample_ids']),
+                'cached': r['cached'],
+                'elapsed': r['elapsed']
+            } for p, r in zip(periods, results)],
+            elapsed=time.perf_counter() - started
+        )
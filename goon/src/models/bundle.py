@@ -0,0 +1,272 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from xgboost import XGBRegressor
+from data.scaler_state import scaler_to_dict, scaler_from_dict
+from models.numpy_lstm import NumpyLSTM
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+XGB_FILE = 'xgb.ubj'
+LSTM_DIR = 'lstm'
+ARRAYS_DIR = 'arrays'
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_bundle(
+    path: str,
+    lstm_model=None,
+    xgb_model: Optional[XGBRegressor] = None,
+    scaler=None,
+    features: Optional[List[str]] = None,
+    sequence_length: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    arrays: Optional[Dict[str, np.ndarray]] = None
+) -> str:
+    """保存模型包
+
+    模型包是一个目录：manifest.json 记录版本、特征、序列长度、归一化参数和各文件的哈希；
+    LSTM权重按层保存为独立的 .npy 文件（可内存映射），XGBoost使用原生二进制格式。
+
+    Args:
+        path (str): 模型包目录
+        lstm_model: Keras LSTM模型或NumpyLSTM
+        xgb_model (Optional[XGBRegressor]): XGBoost模型
+        scaler: 已拟合的MinMaxScaler
+        features (Optional[List[str]]): 特征列表
+        sequence_length (Optional[int]): 序列长度
+        metadata (Optional[Dict[str, Any]]): 其他需要记录的信息
+        arrays (Optional[Dict[str, np.ndarray]]): 其他需要随模型保存的数组（如嵌入表），通过 ModelBundle.array 读取
+
+    Returns:
+        str: 模型包哈希，由各文件内容计算得到
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    manifest = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'features': list(features) if features is not None else None,
+        'sequence_length': sequence_length,
+        'scaler': scaler_to_dict(scaler) if scaler is not None else None,
+        'metadata': metadata or {},
+        'files': {}
+    }
+
+    if lstm_model is not None:
+        if not isinstance(lstm_model, NumpyLSTM):
+            lstm_model = NumpyLSTM.from_keras(lstm_model)
+        os.makedirs(os.path.join(tmp_path, LSTM_DIR))
+        layer_files = []
+        for i, layer in enumerate(lstm_model.weights):
+            names = []
+            for j, weight in enumerate(layer):
+                name = f"{LSTM_DIR}/layer{i}_{j}.npy"
+                np.save(os.path.join(tmp_path, name), np.ascontiguousarray(weight))
+                names.append(name)
+            layer_files.append(names)
+        manifest['lstm'] = {'dtype': lstm_model.dtype.name, 'layers': lstm_model.layers, 'arrays': layer_files}
+
+    if xgb_model is not None:
+        xgb_model.save_model(os.path.join(tmp_path, XGB_FILE))
+        manifest['xgb'] = {'file': XGB_FILE}
+
+    if arrays:
+        os.makedirs(os.path.join(tmp_path, ARRAYS_DIR))
+        manifest['arrays'] = {}
+        for name, array in arrays.items():
+            manifest['arrays'][name] = f"{ARRAYS_DIR}/{name}.npy"
+            np.save(os.path.join(tmp_path, manifest['arrays'][name]), np.ascontiguousarray(array))
+
+    for root, _, files in os.walk(tmp_path):
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            manifest['files'][os.path.relpath(full, tmp_path).replace(os.sep, '/')] = _file_digest(full)
+
+    digest = hashlib.sha256(json.dumps(
+        {k: manifest[k] for k in ('features', 'sequence_length', 'scaler', 'files')},
+        sort_keys=True
+    ).encode('utf-8'))
+    manifest['bundle_hash'] = digest.hexdigest()[:16]
+
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # 先写入临时目录再整体替换，读取方不会看到写了一半的模型包
+    if os.path.exists(path):
+        old_path = f"{path}.old-{os.getpid()}"
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.rename(tmp_path, path)
+
+    return manifest['bundle_hash']
+
+
+class ModelBundle:
+    def __init__(self, path: str):
+        """打开模型包，仅读取manifest，各模型在首次访问时才加载
+
+        Args:
+            path (str): 模型包目录
+        """
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"不支持的模型包版本：{self.manifest['format_version']}")
+        self.mtime = os.path.getmtime(manifest_path)
+
+        self._lock = threading.Lock()
+        self._lstm = None
+        self._xgb = None
+        self._scaler = None
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def bundle_hash(self) -> str:
+        return self.manifest['bundle_hash']
+
+    @property
+    def features(self) -> Optional[List[str]]:
+        return self.manifest['features']
+
+    @property
+    def sequence_length(self) -> Optional[int]:
+        return self.manifest['sequence_length']
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.manifest['metadata']
+
+    @property
+    def lstm(self) -> Optional[NumpyLSTM]:
+        """LSTM推理模型，权重以只读内存映射方式加载"""
+        if self._lstm is None and 'lstm' in self.manifest:
+            with self._lock:
+                if self._lstm is None:
+                    spec = self.manifest['lstm']
+                    weights = [
+                        [np.load(os.path.join(self.path, name), mmap_mode='r') for name in names]
+                        for names in spec['arrays']
+                    ]
+                    self._lstm = NumpyLSTM(spec['layers'], weights, spec['dtype'])
+        return self._lstm
+
+    def lstm_weights(self) -> List[np.ndarray]:
+        """按Keras get_weights 的顺序返回LSTM权重，可用于 set_weights 恢复Keras模型"""
+        lstm = self.lstm
+        if lstm is None:
+            return []
+        return [np.array(w) for layer in lstm.weights for w in layer]
+
+    @property
+    def xgb(self) -> Optional[XGBRegressor]:
+        """XGBoost模型，从原生二进制格式加载"""
+        if self._xgb is None and 'xgb' in self.manifest:
+            with self._lock:
+                if self._xgb is None:
+                    model = XGBRegressor()
+                    model.load_model(os.path.join(self.path, self.manifest['xgb']['file']))
+                    self._xgb = model
+        return self._xgb
+
+    def array(self, name: str) -> np.ndarray:
+        """随模型保存的数组，以只读内存映射方式加载
+
+        Raises:
+            KeyError: 模型包中没有该数组
+        """
+        if name not in self._arrays:
+            if name not in self.manifest.get('arrays', {}):
+                raise KeyError(f"模型包中没有数组：{name}")
+            self._arrays[name] = np.load(os.path.join(self.path, self.manifest['arrays'][name]), mmap_mode='r')
+        return self._arrays[name]
+
+    @property
+    def scaler(self):
+        """已拟合的MinMaxScaler，只用于transform"""
+        if self._scaler is None and self.manifest['scaler'] is not None:
+            self._scaler = scaler_from_dict(self.manifest['scaler'])
+        return self._scaler
+
+
+class BundleRegistry:
+    def __init__(self, max_size: int = 1024):
+        """进程级模型包缓存，按LRU淘汰
+
+        Args:
+            max_size (int): 最多缓存的模型包数量
+        """
+        self.max_size = max_size
+        self._bundles: 'OrderedDict[str, ModelBundle]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> ModelBundle:
+        """获取模型包，磁盘上的模型包被重新保存后会自动重新加载
+
+        Args:
+            path (str): 模型包目录
+
+        Returns:
+            ModelBundle: 模型包
+        """
+        key = os.path.abspath(path)
+        mtime = os.path.getmtime(os.path.join(key, MANIFEST_NAME))
+        with self._lock:
+            bundle = self._bundles.get(key)
+            if bundle is not None and bundle.mtime == mtime:
+                self._bundles.move_to_end(key)
+                return bundle
+
+        bundle = ModelBundle(key)
+        with self._lock:
+            self._bundles[key] = bundle
+            self._bundles.move_to_end(key)
+            while len(self._bundles) > self.max_size:
+                self._bundles.popitem(last=False)
+        return bundle
+
+    def invalidate(self, path: Optional[str] = None):
+        """清除缓存
+
+        Args:
+            path (Optional[str]): 模型包目录，为None时清除全部
+        """
+        with self._lock:
+            if path is None:
+                self._bundles.clear()
+            else:
+                self._bundles.pop(os.path.abspath(path), None)
+
+
+default_registry = BundleRegistry()
+
+
+def get_bundle(path: str) -> ModelBundle:
+    """从进程级缓存获取模型包
+
+    Args:
+        path (str): 模型包目录
+
+    Returns:
+        ModelBundle: 模型包
+    """
+    return default_registry.get(path)
@@ -0,0 +1,297 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+from sklearn.metrics import mean_absolute_error
+from tensorflow.keras.models import Model, Sequential
+from tensorflow.keras.layers import Concatenate, Embedding, Input, RepeatVector
+from tensorflow.keras.optimizers import Adam
+from data.dtypes import float_dtype
+from models.backtest import PanelSamples, build_panel_samples
+from models.bundle import ModelBundle, save_bundle
+from models.ensemble import EnsembleWeights
+from models.model_trainer import ModelTrainer
+from models.symbol_encoding import SymbolVocabulary, UNKNOWN_ID
+from utils.instrumentation import instrumented
+
+
+class GlobalModelTrainer:
+    def __init__(
+        self,
+        lstm_params: Optional[Dict[str, Any]] = None,
+        xgb_params: Optional[Dict[str, Any]] = None,
+        symbol_dim: int = 8,
+        sector_dim: int = 4,
+        unknown_rate: float = 0.05
+    ):
+        """在全部股票的面板数据上训练一个LSTM和一个XGBoost模型
+
+        股票和行业作为输入：LSTM通过嵌入层，XGBoost作为类别特征。训练时随机把一小部分样本的
+        股票编号替换为未知，使模型对训练时没有见过的股票（如新上市股票）也能只依靠行业和行情预测。
+        模型有三个输入，ModelTrainer 中基于单个窗口数组的训练、增量更新和评估方法都不适用，
+        因此只借用其模型构建方法和超参数；新数据到达后重新调用 train_global。
+
+        Args:
+            lstm_params (Optional[Dict[str, Any]]): 覆盖 LSTM_DEFAULTS 的LSTM超参数
+            xgb_params (Optional[Dict[str, Any]]): 覆盖 XGB_DEFAULTS 的XGBRegressor参数
+            symbol_dim (int): 股票嵌入向量的维度
+            sector_dim (int): 行业嵌入向量的维度
+            unknown_rate (float): 训练时股票编号替换为未知的比例
+        """
+        # 只用于按超参数构建LSTM结构和XGBoost模型
+        self.base = ModelTrainer(lstm_params, xgb_params)
+        self.lstm_model: Optional[Model] = None
+        self.xgb_model = None
+        self.ensemble_weights: Optional[EnsembleWeights] = None
+        self.symbol_dim = symbol_dim
+        self.sector_dim = sector_dim
+        self.unknown_rate = unknown_rate
+        self.vocabulary: Optional[SymbolVocabulary] = None
+        self.features: Optional[List[str]] = None
+        self.sequence_length: Optional[int] = None
+        self.lstm_core: Optional[Sequential] = None
+        # 面板样本中各股票（PanelSamples.symbols 的顺序）的编号，训练时计算一次
+        self._symbol_lookup: Optional[np.ndarray] = None
+        self._sector_lookup: Optional[np.ndarray] = None
+
+    @property
+    def lstm_params(self) -> Dict[str, Any]:
+        return self.base.lstm_params
+
+    @property
+    def xgb_params(self) -> Dict[str, Any]:
+        return self.base.xgb_params
+
+    def build_global_lstm_model(self, sequence_length: int, n_features: int) -> Model:
+        """构建带股票/行业嵌入的LSTM模型
+
+        嵌入向量重复到每个时间步后与特征拼接，再送入 build_lstm_model 构建的LSTM结构，
+        因此LSTM部分仍可导出为NumpyLSTM，推理时由 GlobalEncoder 查表拼接嵌入向量。
+        """
+        window = Input(shape=(sequence_length, n_features), name='window')
+        symbol = Input(shape=(), dtype='int32', name='symbol')
+        sector = Input(shape=(), dtype='int32', name='sector')
+
+        embedding = Concatenate(name='embedding')([
+            Embedding(self.vocabulary.n_symbols, self.symbol_dim, name='symbol_embedding')(symbol),
+            Embedding(self.vocabulary.n_sectors, self.sector_dim, name='sector_embedding')(sector)
+        ])
+        inputs = Concatenate(axis=-1, name='lstm_inputs')([window, RepeatVector(sequence_length)(embedding)])
+
+        self.lstm_core = self.base.build_lstm_model((sequence_length, n_features + self.symbol_dim + self.sector_dim))
+        model = Model(inputs=[window, symbol, sector], outputs=self.lstm_core(inputs))
+        model.compile(
+            optimizer=Adam(learning_rate=self.lstm_params['learning_rate']),
+            loss='mse',
+            metrics=['mae']
+        )
+        return model
+
+    def _sample_ids(
+        self,
+        samples: PanelSamples,
+        sample_ids: np.ndarray,
+        rng: Optional[np.random.Generator] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """样本的股票和行业编号；传入rng时按 unknown_rate 随机把股票编号替换为未知"""
+        symbol_ids = self._symbol_lookup[samples.symbol_index[sample_ids]]
+        sector_ids = self._sector_lookup[samples.symbol_index[sample_ids]]
+        if rng is not None and self.unknown_rate > 0:
+            symbol_ids = np.where(rng.random(len(symbol_ids)) < self.unknown_rate, UNKNOWN_ID, symbol_ids)
+        return symbol_ids.astype(np.int32), sector_ids
+
+    def _lstm_dataset(
+        self,
+        samples: PanelSamples,
+        sample_ids: np.ndarray,
+        batch_size: int,
+        shuffle: bool,
+        seed: int = 42
+    ):
+        """按批物化窗口的 tf.data 数据集，训练时每个epoch重新打乱全部样本，使每批包含多只股票"""
+        import tensorflow as tf
+
+        rng = np.random.default_rng(seed)
+        dtype = float_dtype()
+        length, n_features = samples.sequence_length, samples.data.shape[1]
+
+        def generator():
+            order = rng.permutation(sample_ids) if shuffle else sample_ids
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                symbol_ids, sector_ids = self._sample_ids(samples, batch, rng if shuffle else None)
+                yield (
+                    {
+                        'window': np.asarray(samples.windows(batch), dtype=dtype),
+                        'symbol': symbol_ids,
+                        'sector': sector_ids
+                    },
+                    np.asarray(samples.labels(batch), dtype=dtype)
+                )
+
+        dataset = tf.data.Dataset.from_generator(
+            generator,
+            output_signature=(
+                {
+                    'window': tf.TensorSpec(shape=(None, length, n_features), dtype=tf.as_dtype(dtype)),
+                    'symbol': tf.TensorSpec(shape=(None,), dtype=tf.int32),
+                    'sector': tf.TensorSpec(shape=(None,), dtype=tf.int32)
+                },
+                tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(dtype))
+            )
+        )
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    def _xgb_inputs(
+        self,
+        samples: PanelSamples,
+        sample_ids: np.ndarray,
+        rng: Optional[np.random.Generator] = None
+    ) -> np.ndarray:
+        """窗口最后一行特征加上股票和行业编号，与 GlobalEncoder.xgb_inputs 一致"""
+        rows = samples.data[samples.window_start[sample_ids] + samples.sequence_length - 1]
+        symbol_ids, sector_ids = self._sample_ids(samples, sample_ids, rng)
+        return np.column_stack([rows, symbol_ids, sector_ids]).astype(float_dtype(), copy=False)
+
+    @instrumented('train.global')
+    def train_global(
+        self,
+        df: pd.DataFrame,
+        features: List[str],
+        target: str,
+        sequence_length: int,
+        stock_basic: Optional[pd.DataFrame] = None,
+        validation_split: float = 0.2,
+        epochs: int = 20,
+        batch_size: int = 256,
+        seed: int = 42
+    ) -> Dict[str, Any]:
+        """在面板数据上训练全局模型
+
+        窗口按股票分别构建，不会跨越两只股票的边界；验证集为时间上最后 validation_split
+        比例的交易日（所有股票），而不是最后几只股票。
+
+        Args:
+            df (pd.DataFrame): 长表，包含ts_code、trade_date、特征和目标变量列（特征应已归一化）
+            features (List[str]): 特征列表
+            target (str): 目标变量
+            sequence_length (int): 序列长度
+            stock_basic (Optional[pd.DataFrame]): DataFetcher.fetch_stock_basic 的结果，用于行业编号
+            validation_split (float): 验证集比例
+            epochs (int): LSTM训练轮数
+            batch_size (int): 批次大小
+            seed (int): 随机种子
+
+        Returns:
+            Dict[str, Any]: LSTM训练历史和验证集上各模型的MAE
+        """
+        samples = build_panel_samples(df, features, target, sequence_length)
+        if len(samples) == 0:
+            raise ValueError("没有可用的训练样本，请检查数据长度和缺失值")
+        self.vocabulary = SymbolVocabulary.fit(samples.symbols, stock_basic)
+        self._symbol_lookup = self.vocabulary.symbol_ids(samples.symbols)
+        self._sector_lookup = self.vocabulary.sector_ids(samples.symbols)
+        self.features = list(features)
+        self.sequence_length = sequence_length
+        rng = np.random.default_rng(seed)
+
+        cutoff = int(len(samples.dates) * (1 - validation_split))
+        train_ids = np.flatnonzero(samples.date_index < cutoff)
+        val_ids = np.flatnonzero(samples.date_index >= cutoff)
+
+        self.lstm_model = self.build_global_lstm_model(sequence_length, len(features))
+        history = self.lstm_model.fit(
+            self._lstm_dataset(samples, train_ids, batch_size, shuffle=True, seed=seed),
+            validation_data=self._lstm_dataset(samples, val_ids, batch_size, shuffle=False) if len(val_ids) else None,
+            epochs=epochs,
+            verbose=1
+        )
+
+        n_features = len(features)
+        self.xgb_model = self.base.build_xgboost_model(
+            tree_method='hist',
+            enable_categorical=True,
+            feature_types=['q'] * n_features + ['c', 'c']
+        )
+        self.xgb_model.fit(self._xgb_inputs(samples, train_ids, rng), samples.labels(train_ids))
+
+        scores: Dict[str, float] = {}
+        if len(val_ids):
+            y_val = samples.labels(val_ids)
+            lstm_pred = self.lstm_model.predict(
+                self._lstm_dataset(samples, val_ids, batch_size, shuffle=False), verbose=0
+            ).reshape(-1)
+            xgb_pred = self.xgb_model.predict(self._xgb_inputs(samples, val_ids))
+            scores = {
+                'lstm_mae': float(mean_absolute_error(y_val, lstm_pred)),
+                'xgb_mae': float(mean_absolute_error(y_val, xgb_pred)),
+                'ensemble_mae': float(mean_absolute_error(y_val, 0.6 * lstm_pred + 0.4 * xgb_pred))
+            }
+
+        return {
+            'lstm_history': history.history,
+            'metrics': scores,
+            'symbols': len(samples.symbols),
+            'train_samples': len(train_ids),
+            'val_samples': len(val_ids)
+        }
+
+    def save_bundle(
+        self,
+        path: str,
+        scaler=None,
+        features: Optional[List[str]] = None,
+        sequence_length: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """保存全局模型包，嵌入表作为数组保存，编号映射记录在元数据中
+
+        LSTM部分保存为普通的LSTM权重，StockPredictor加载后通过 GlobalEncoder 拼接嵌入向量。
+        """
+        if self.lstm_model is None or self.xgb_model is None:
+            raise ValueError("全局模型尚未训练")
+        return save_bundle(
+            path,
+            lstm_model=self.lstm_core,
+            xgb_model=self.xgb_model,
+            scaler=scaler,
+            features=features or self.features,
+            sequence_length=sequence_length or self.sequence_length,
+            metadata={
+                **(metadata or {}),
+                'lstm_params': self.lstm_params,
+                'xgb_params': self.xgb_params,
+                'ensemble_weights': self.ensemble_weights.to_dict() if self.ensemble_weights is not None else None,
+                'global_model': {
+                    'vocabulary': self.vocabulary.to_dict(),
+                    'symbol_dim': self.symbol_dim,
+                    'sector_dim': self.sector_dim
+                }
+            },
+            arrays={
+                'symbol_embedding': self.lstm_model.get_layer('symbol_embedding').get_weights()[0],
+                'sector_embedding': self.lstm_model.get_layer('sector_embedding').get_weights()[0]
+            }
+        )
+
+    def load_bundle(self, path: str):
+        """从全局模型包恢复模型，可用于在其基础上评估或另存
+
+        Args:
+            path (str): 模型包目录
+        """
+        bundle = ModelBundle(path)
+        spec = bundle.metadata.get('global_model')
+        if spec is None:
+            raise ValueError(f"{path}不是全局模型包")
+        self.base = ModelTrainer(bundle.metadata.get('lstm_params'), bundle.metadata.get('xgb_params'))
+        self.vocabulary = SymbolVocabulary.from_dict(spec['vocabulary'])
+        self.symbol_dim, self.sector_dim = spec['symbol_dim'], spec['sector_dim']
+        self.features, self.sequence_length = bundle.features, bundle.sequence_length
+
+        self.lstm_model = self.build_global_lstm_model(self.sequence_length, len(self.features))
+        self.lstm_core.set_weights(bundle.lstm_weights())
+        self.lstm_model.get_layer('symbol_embedding').set_weights([np.array(bundle.array('symbol_embedding'))])
+        self.lstm_model.get_layer('sector_embedding').set_weights([np.array(bundle.array('sector_embedding'))])
+        self.xgb_model = bundle.xgb
+        weights = bundle.metadata.get('ensemble_weights')
+        self.ensemble_weights = EnsembleWeights.from_dict(weights) if weights else None
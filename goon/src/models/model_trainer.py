@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+import joblib
 from typing import List, Dict, Optional, Tuple, Any
 from sklearn.model_selection import train_test_split
 from tensorflow.keras.models import Sequential
@@ -7,44 +8,90 @@ from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.optimizers import Adam
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from models.numpy_lstm import export_lstm_weights
+from models.bundle import save_bundle, ModelBundle
+from models.update_policy import FeatureReference, RetrainPolicy, RetrainDecision, FULL_RETRAIN
+from models.ensemble import EnsembleWeights
+from utils.instrumentation import instrumented
+from data.dtypes import as_float
+from models.streaming import (
+    open_windows, split_time_ordered, iter_batches, make_lstm_dataset, xgb_batch, WindowBatchIter
+)
+
+# 模型的默认超参数，可通过 ModelTrainer(lstm_params, xgb_params) 覆盖（如超参数搜索的结果）
+LSTM_DEFAULTS = {'units': 50, 'dropout': 0.2, 'dense_units': 25, 'learning_rate': 0.001}
+XGB_DEFAULTS = {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 5, 'random_state': 42}
+
 
 class ModelTrainer:
-    def __init__(self):
-        """初始化模型训练器"""
+    def __init__(
+        self,
+        lstm_params: Optional[Dict[str, Any]] = None,
+        xgb_params: Optional[Dict[str, Any]] = None
+    ):
+        """初始化模型训练器
+
+        Args:
+            lstm_params (Optional[Dict[str, Any]]): 覆盖 LSTM_DEFAULTS 的LSTM超参数
+            xgb_params (Optional[Dict[str, Any]]): 覆盖 XGB_DEFAULTS 的XGBRegressor参数
+        """
+        self.lstm_params = {**LSTM_DEFAULTS, **(lstm_params or {})}
+        self.xgb_params = {**XGB_DEFAULTS, **(xgb_params or {})}
         self.lstm_model = None
         self.xgb_model = None
+        # 增量更新状态：上次完整训练时的特征分布、验证误差和之后的增量更新次数
+        self.reference: Optional[FeatureReference] = None
+        self.baseline_error: Optional[float] = None
+        self.incremental_updates = 0
+        # 在样本外预测上优化得到的集成权重（见 models.ensemble.optimize_weights），随模型包保存
+        self.ensemble_weights: Optional[EnsembleWeights] = None
 
     def build_lstm_model(
         self,
         input_shape: Tuple[int, int],
-        output_dim: int = 1
+        output_dim: int = 1,
+        **params
     ) -> Sequential:
         """构建LSTM模型
 
         Args:
             input_shape (Tuple[int, int]): 输入数据形状 (sequence_length, features)
             output_dim (int): 输出维度
+            **params: 覆盖 self.lstm_params 的超参数：units、dropout、dense_units、learning_rate
 
         Returns:
             Sequential: 构建好的LSTM模型
         """
+        params = {**self.lstm_params, **params}
         model = Sequential([
-            LSTM(units=50, return_sequences=True, input_shape=input_shape),
-            Dropout(0.2),
-            LSTM(units=50, return_sequences=False),
-            Dropout(0.2),
-            Dense(units=25),
+            LSTM(units=params['units'], return_sequences=True, input_shape=input_shape),
+            Dropout(params['dropout']),
+            LSTM(units=params['units'], return_sequences=False),
+            Dropout(params['dropout']),
+            Dense(units=params['dense_units']),
             Dense(units=output_dim)
         ])
 
         model.compile(
-            optimizer=Adam(learning_rate=0.001),
+            optimizer=Adam(learning_rate=params['learning_rate']),
             loss='mse',
             metrics=['mae']
         )
 
         return model
 
+    def build_xgboost_model(self, **params) -> XGBRegressor:
+        """构建XGBoost模型
+
+        Args:
+            **params: 覆盖 self.xgb_params 的XGBRegressor参数
+
+        Returns:
+            XGBRegressor: 未训练的模型
+        """
+        return XGBRegressor(**{**self.xgb_params, **params})
+
+    @instrumented('train.lstm')
     def train_lstm(
         self,
         X: np.ndarray,
@@ -65,6 +112,7 @@ class ModelTrainer:
         Returns:
             Dict[str, Any]: 训练历史
         """
+        X, y = as_float(X), as_float(y)
         if self.lstm_model is None:
             self.lstm_model = self.build_lstm_model(
                 input_shape=(X.shape[1], X.shape[2])
@@ -80,11 +128,13 @@ class ModelTrainer:
 
         return history.history
 
+    @instrumented('train.xgboost')
     def train_xgboost(
         self,
         X: np.ndarray,
         y: np.ndarray,
-        test_size: float = 0.2
+        test_size: float = 0.2,
+        shuffle: bool = True
     ) -> Dict[str, float]:
         """训练XGBoost模型
 
@@ -92,21 +142,21 @@ class ModelTrainer:
             X (np.ndarray): 训练数据
             y (np.ndarray): 目标变量
             test_size (float): 测试集比例
+            shuffle (bool): 是否随机划分，为False时测试集取时间上最后的一段样本（见 split_time_ordered）
 
         Returns:
             Dict[str, float]: 模型评估指标
         """
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, random_state=42
-        )
-
-        self.xgb_model = XGBRegressor(
-            n_estimators=100,
-            learning_rate=0.1,
-            max_depth=5,
-            random_state=42
-        )
+        if shuffle:
+            X_train, X_test, y_train, y_test = train_test_split(
+                as_float(X), as_float(y), test_size=test_size, random_state=42
+            )
+        else:
+            n_train = len(split_time_ordered(len(X), test_size)[0])
+            X_train, X_test = as_float(X[:n_train]), as_float(X[n_train:])
+            y_train, y_test = as_float(y[:n_train]), as_float(y[n_train:])
 
+        self.xgb_model = self.build_xgboost_model()
         self.xgb_model.fit(X_train, y_train)
 
         # 模型评估
@@ -119,6 +169,311 @@ class ModelTrainer:
 
         return metrics
 
+    @instrumented('train.lstm_streaming')
+    def train_lstm_streaming(
+        self,
+        x_path: str,
+        y_path: str,
+        validation_split: float = 0.2,
+        epochs: int = 100,
+        batch_size: int = 32,
+        seed: int = 42
+    ) -> Dict[str, Any]:
+        """从内存映射的窗口文件流式训练LSTM模型，内存占用与数据集大小无关
+
+        Args:
+            x_path (str): 窗口特征文件（.npy）
+            y_path (str): 标签文件（.npy）
+            validation_split (float): 验证集比例，取时间上最后的一段样本
+            epochs (int): 训练轮数
+            batch_size (int): 批次大小
+            seed (int): 打乱批次顺序的随机种子
+
+        Returns:
+            Dict[str, Any]: 训练历史
+        """
+        X, y = open_windows(x_path, y_path)
+        train_idx, val_idx = split_time_ordered(len(X), validation_split)
+
+        if self.lstm_model is None:
+            self.lstm_model = self.build_lstm_model(
+                input_shape=(X.shape[1], X.shape[2])
+            )
+
+        train_data = make_lstm_dataset(X, y, train_idx, batch_size, shuffle=True, seed=seed)
+        val_data = make_lstm_dataset(X, y, val_idx, batch_size, shuffle=False) if len(val_idx) else None
+
+        history = self.lstm_model.fit(
+            train_data,
+            validation_data=val_data,
+            epochs=epochs,
+            verbose=1
+        )
+
+        return history.history
+
+    @instrumented('train.xgboost_streaming')
+    def train_xgboost_streaming(
+        self,
+        x_path: str,
+        y_path: str,
+        test_size: float = 0.2,
+        batch_size: int = 65536,
+        features: str = 'last',
+        cache_prefix: Optional[str] = None
+    ) -> Dict[str, float]:
+        """通过迭代器从窗口文件分批构建DMatrix训练XGBoost模型
+
+        设置cache_prefix时使用XGBoost外部内存模式，可训练远大于内存的数据集。
+
+        Args:
+            x_path (str): 窗口特征文件（.npy）
+            y_path (str): 标签文件（.npy）
+            test_size (float): 测试集比例，取时间上最后的一段样本
+            batch_size (int): 每批读取的样本数
+            features (str): 'last' 使用窗口最后一行特征，'flatten' 使用展平后的整个窗口
+            cache_prefix (Optional[str]): 外部内存缓存文件前缀
+
+        Returns:
+            Dict[str, float]: 模型评估指标
+        """
+        import xgboost as xgb
+
+        X, y = open_windows(x_path, y_path)
+        train_idx, test_idx = split_time_ordered(len(X), test_size)
+
+        # 与 build_xgboost_model 使用相同的超参数，树的数量由 num_boost_round 控制
+        model = self.build_xgboost_model(tree_method='hist')
+        params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+
+        dtrain = xgb.DMatrix(WindowBatchIter(X, y, train_idx, batch_size, features, cache_prefix))
+        booster = xgb.train(params, dtrain, num_boost_round=model.n_estimators)
+
+        self.xgb_model = model
+        self.xgb_model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+
+        # 分批预测测试集并评估
+        if len(test_idx) == 0:
+            return {}
+        y_true, y_pred = [], []
+        for batch in iter_batches(test_idx, batch_size, shuffle=False):
+            data, label = xgb_batch(X, y, batch, features)
+            y_pred.append(booster.inplace_predict(data))
+            y_true.append(label)
+        y_true, y_pred = np.concatenate(y_true), np.concatenate(y_pred)
+
+        return {
+            'mse': mean_squared_error(y_true, y_pred),
+            'mae': mean_absolute_error(y_true, y_pred),
+            'r2': r2_score(y_true, y_pred)
+        }
+
+    @instrumented('train.lstm_update')
+    def update_lstm(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        epochs: int = 5,
+        batch_size: int = 32
+    ) -> Dict[str, Any]:
+        """在已有LSTM模型上用新数据微调少量轮次
+
+        Args:
+            X (np.ndarray): 新到达的窗口数据
+            y (np.ndarray): 目标变量
+            epochs (int): 微调轮数
+            batch_size (int): 批次大小
+
+        Returns:
+            Dict[str, Any]: 训练历史
+        """
+        if self.lstm_model is None:
+            raise ValueError("LSTM模型尚未训练")
+
+        history = self.lstm_model.fit(
+            X, y,
+            epochs=epochs,
+            batch_size=batch_size,
+            verbose=0
+        )
+
+        return history.history
+
+    @instrumented('train.xgboost_update')
+    def update_xgboost(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        extra_trees: int = 50
+    ):
+        """在已有XGBoost模型之后继续提升，最多追加 extra_trees 棵树
+
+        Args:
+            X (np.ndarray): 新到达的训练数据
+            y (np.ndarray): 目标变量
+            extra_trees (int): 追加的树数量
+        """
+        if self.xgb_model is None:
+            raise ValueError("XGBoost模型尚未训练")
+
+        params = self.xgb_model.get_params()
+        params['n_estimators'] = extra_trees
+        model = XGBRegressor(**params)
+        model.fit(X, y, xgb_model=self.xgb_model.get_booster())
+        self.xgb_model = model
+
+    def _ensemble_error(self, X: np.ndarray, y: np.ndarray, weights: Tuple[float, float] = (0.6, 0.4)) -> float:
+        """当前模型在窗口数据上的集成MAE，XGBoost使用每个窗口的最后一行特征"""
+        lstm_pred = self.lstm_model.predict(X, verbose=0).reshape(-1)
+        xgb_pred = self.xgb_model.predict(np.ascontiguousarray(X[:, -1, :])).reshape(-1)
+        return float(mean_absolute_error(y, weights[0] * lstm_pred + weights[1] * xgb_pred))
+
+    def train_full(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        validation_split: float = 0.2,
+        epochs: int = 100,
+        batch_size: int = 32
+    ) -> Dict[str, Any]:
+        """从头完整训练两个模型，并记录增量更新所需的参考分布和基准误差
+
+        XGBoost使用每个窗口的最后一行特征，与StockPredictor一致。
+
+        Args:
+            X (np.ndarray): 窗口数据，形状为 (samples, sequence_length, features)
+            y (np.ndarray): 目标变量
+            validation_split (float): 验证集比例，基准误差在时间上最后的这部分样本上计算
+            epochs (int): LSTM训练轮数
+            batch_size (int): 批次大小
+
+        Returns:
+            Dict[str, Any]: LSTM训练历史和XGBoost评估指标
+        """
+        self.lstm_model = None
+        history = self.train_lstm(X, y, validation_split, epochs, batch_size)
+        # 按时间划分，XGBoost不会在计算基准误差的最后一段样本上训练
+        xgb_metrics = self.train_xgboost(np.ascontiguousarray(X[:, -1, :]), y, validation_split, shuffle=False)
+
+        n_train = int(len(X) * (1 - validation_split))
+        self.reference = FeatureReference.fit(X[:n_train])
+        self.baseline_error = self._ensemble_error(X[n_train:], y[n_train:]) if n_train < len(X) else None
+        self.incremental_updates = 0
+
+        return {'lstm_history': history, 'xgb_metrics': xgb_metrics}
+
+    def update_decision(
+        self,
+        X_new: np.ndarray,
+        y_new: np.ndarray,
+        policy: Optional[RetrainPolicy] = None
+    ) -> RetrainDecision:
+        """判断新到达的窗口应该增量更新还是完整重训，不训练模型
+
+        完整重训通常意味着特征分布已经漂移，此时旧的归一化参数同样过时，调用方应先重新拟合
+        归一化器、重新构建窗口，再把新的窗口传给 update_models。
+
+        Args:
+            X_new (np.ndarray): 上次训练后新到达的窗口数据（用当前归一化器变换）
+            y_new (np.ndarray): 对应的目标变量
+            policy (Optional[RetrainPolicy]): 更新策略，默认使用 RetrainPolicy()
+
+        Returns:
+            RetrainDecision: 应采用的更新方式及原因
+        """
+        policy = policy or RetrainPolicy()
+        if self.lstm_model is None or self.xgb_model is None:
+            return RetrainDecision(FULL_RETRAIN, ['模型尚未训练'])
+        return policy.decide(
+            self.reference,
+            X_new,
+            self.baseline_error,
+            self._ensemble_error(X_new, y_new),
+            self.incremental_updates
+        )
+
+    def update_models(
+        self,
+        X_new: np.ndarray,
+        y_new: np.ndarray,
+        policy: Optional[RetrainPolicy] = None,
+        X_full: Optional[np.ndarray] = None,
+        y_full: Optional[np.ndarray] = None,
+        lstm_epochs: int = 5,
+        extra_trees: int = 50,
+        full_epochs: int = 100,
+        decision: Optional[RetrainDecision] = None
+    ) -> RetrainDecision:
+        """用新到达的窗口更新模型，由策略决定增量更新还是完整重训
+
+        增量更新时LSTM微调 lstm_epochs 轮，XGBoost追加最多 extra_trees 棵树；
+        只有特征分布漂移、误差超过阈值或增量次数过多时才完整重训。
+
+        Args:
+            X_new (np.ndarray): 上次训练后新到达的窗口数据
+            y_new (np.ndarray): 对应的目标变量
+            policy (Optional[RetrainPolicy]): 更新策略，默认使用 RetrainPolicy()
+            X_full (Optional[np.ndarray]): 完整重训时使用的全部窗口数据，应已用重新拟合的归一化器变换
+            y_full (Optional[np.ndarray]): 完整重训时使用的全部目标变量
+            lstm_epochs (int): 增量更新时LSTM的微调轮数
+            extra_trees (int): 增量更新时XGBoost追加的树数量
+            full_epochs (int): 完整重训时LSTM的训练轮数
+            decision (Optional[RetrainDecision]): update_decision 预先得到的结果，为None时重新判断
+
+        Returns:
+            RetrainDecision: 本次采用的更新方式及原因
+
+        Raises:
+            ValueError: 需要完整重训但没有提供 X_full / y_full
+        """
+        if decision is None:
+            decision = self.update_decision(X_new, y_new, policy)
+
+        if decision.full_retrain:
+            if X_full is None or y_full is None:
+                raise ValueError(f"需要完整重训（{'；'.join(decision.reasons)}），但没有提供全部窗口数据 X_full / y_full")
+            self.train_full(X_full, y_full, epochs=full_epochs)
+        else:
+            self.update_lstm(X_new, y_new, epochs=lstm_epochs)
+            self.update_xgboost(np.ascontiguousarray(X_new[:, -1, :]), y_new, extra_trees)
+            self.incremental_updates += 1
+
+        return decision
+
+    def update_state(self) -> Dict[str, Any]:
+        """增量更新状态，随模型包一起保存"""
+        return {
+            'reference': self.reference.to_dict() if self.reference is not None else None,
+            'baseline_error': self.baseline_error,
+            'incremental_updates': self.incremental_updates
+        }
+
+    def restore_update_state(self, state: Optional[Dict[str, Any]]):
+        """从 update_state() 的结果恢复增量更新状态"""
+        state = state or {}
+        self.reference = FeatureReference.from_dict(state['reference']) if state.get('reference') else None
+        self.baseline_error = state.get('baseline_error')
+        self.incremental_updates = state.get('incremental_updates', 0)
+
+    def load_bundle(self, path: str):
+        """从模型包恢复可继续训练的模型和增量更新状态
+
+        Args:
+            path (str): 模型包目录
+        """
+        bundle = ModelBundle(path)
+        self.lstm_params = {**LSTM_DEFAULTS, **bundle.metadata.get('lstm_params', {})}
+        self.xgb_params = {**XGB_DEFAULTS, **bundle.metadata.get('xgb_params', {})}
+        if bundle.lstm is not None:
+            self.lstm_model = self.build_lstm_model(
+                input_shape=(bundle.sequence_length, len(bundle.features))
+            )
+            self.lstm_model.set_weights(bundle.lstm_weights())
+        self.xgb_model = bundle.xgb
+        self.restore_update_state(bundle.metadata.get('update_state'))
+        weights = bundle.metadata.get('ensemble_weights')
+        self.ensemble_weights = EnsembleWeights.from_dict(weights) if weights else None
+
     def evaluate_model(self, X_test: np.ndarray, y_test: np.ndarray, model_type: str = 'lstm') -> Dict[str, float]:
         """评估模型性能
 
@@ -156,6 +511,55 @@ class ModelTrainer:
         if self.xgb_model is not None:
             joblib.dump(self.xgb_model, xgb_path)
 
+    def save_bundle(
+        self,
+        path: str,
+        scaler=None,
+        features: Optional[List[str]] = None,
+        sequence_length: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """将模型、归一化器和特征信息保存为一个模型包
+
+        Args:
+            path (str): 模型包目录
+            scaler: 训练时拟合的MinMaxScaler
+            features (Optional[List[str]]): 特征列表
+            sequence_length (Optional[int]): 序列长度
+            metadata (Optional[Dict[str, Any]]): 其他需要记录的信息
+
+        Returns:
+            str: 模型包哈希
+        """
+        if self.lstm_model is None and self.xgb_model is None:
+            raise ValueError("没有可保存的模型")
+        return save_bundle(
+            path,
+            lstm_model=self.lstm_model,
+            xgb_model=self.xgb_model,
+            scaler=scaler,
+            features=features,
+            sequence_length=sequence_length,
+            metadata={
+                **(metadata or {}),
+                'update_state': self.update_state(),
+                'lstm_params': self.lstm_params,
+                'xgb_params': self.xgb_params,
+                'ensemble_weights': self.ensemble_weights.to_dict() if self.ensemble_weights is not None else None
+            }
+        )
+
+    def export_lstm_weights(self, path: str):
+        """导出LSTM权重，供不依赖TensorFlow的NumPy推理使用
+
+        Args:
+            path (str): 权重文件保存路径（.npz）
+        """
+        if self.lstm_model is None:
+            raise ValueError("LSTM模型尚未训练")
+        export_lstm_weights(self.lstm_model, path)
+
+    @instrumented('predict.lstm')
     def predict_lstm(
         self,
         X: np.ndarray
@@ -172,6 +576,7 @@ class ModelTrainer:
             raise ValueError("LSTM模型尚未训练")
         return self.lstm_model.predict(X)
 
+    @instrumented('predict.xgboost')
     def predict_xgboost(
         self,
         X: np.ndarray
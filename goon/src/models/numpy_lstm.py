@@ -0,0 +1,201 @@
+import json
+import numpy as np
+from typing import Any, Dict, List
+
+FORMAT_VERSION = 1
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    # 用tanh实现，数值稳定且不会溢出
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0)
+
+
+def _linear(x: np.ndarray) -> np.ndarray:
+    return x
+
+
+ACTIVATIONS = {
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'relu': _relu,
+    'linear': _linear,
+    None: _linear
+}
+
+
+def _activation(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"不支持的激活函数：{name}")
+    return ACTIVATIONS[name]
+
+
+def _lstm_forward(
+    x: np.ndarray,
+    kernel: np.ndarray,
+    recurrent_kernel: np.ndarray,
+    bias: np.ndarray,
+    config: Dict[str, Any]
+) -> np.ndarray:
+    """LSTM层的批量前向计算，门的顺序与Keras一致：输入门、遗忘门、候选状态、输出门"""
+    units = config['units']
+    activation = _activation(config['activation'])
+    recurrent_activation = _activation(config['recurrent_activation'])
+    n_samples, n_steps, _ = x.shape
+
+    # 一次矩阵乘法算出所有时间步的输入投影
+    projected = x @ kernel
+    if bias is not None:
+        projected += bias
+
+    h = np.zeros((n_samples, units), dtype=x.dtype)
+    c = np.zeros((n_samples, units), dtype=x.dtype)
+    outputs = np.empty((n_samples, n_steps, units), dtype=x.dtype) if config['return_sequences'] else None
+
+    for t in range(n_steps):
+        z = projected[:, t] + h @ recurrent_kernel
+        i = recurrent_activation(z[:, :units])
+        f = recurrent_activation(z[:, units:2 * units])
+        g = activation(z[:, 2 * units:3 * units])
+        o = recurrent_activation(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * activation(c)
+        if outputs is not None:
+            outputs[:, t] = h
+
+    return outputs if outputs is not None else h
+
+
+class NumpyLSTM:
+    def __init__(self, layers: List[Dict[str, Any]], weights: List[List[np.ndarray]], dtype: str = 'float32'):
+        """纯NumPy实现的LSTM推理模型
+
+        支持由LSTM、Dense、Dropout组成的Sequential结构（即 ModelTrainer.build_lstm_model 构建的模型），
+        Dropout在推理时为恒等映射，不保存。
+
+        Args:
+            layers (List[Dict[str, Any]]): 每一层的配置
+            weights (List[List[np.ndarray]]): 每一层的权重，顺序与Keras的get_weights一致
+            dtype (str): 计算使用的数据类型
+        """
+        self.layers = layers
+        self.dtype = np.dtype(dtype)
+        self.weights = [[np.asarray(w, dtype=self.dtype) for w in layer] for layer in weights]
+
+    @classmethod
+    def from_keras(cls, model) -> 'NumpyLSTM':
+        """从训练好的Keras模型提取权重
+
+        Args:
+            model: Keras Sequential模型
+
+        Returns:
+            NumpyLSTM: 对应的NumPy推理模型
+        """
+        layers, weights = [], []
+        for layer in model.layers:
+            kind = type(layer).__name__
+            config = layer.get_config()
+            if kind == 'Dropout':
+                continue
+            if kind == 'LSTM':
+                layers.append({
+                    'type': 'LSTM',
+                    'units': config['units'],
+                    'return_sequences': config['return_sequences'],
+                    'activation': config['activation'],
+                    'recurrent_activation': config['recurrent_activation'],
+                    'use_bias': config['use_bias']
+                })
+            elif kind == 'Dense':
+                layers.append({
+                    'type': 'Dense',
+                    'units': config['units'],
+                    'activation': config['activation'],
+                    'use_bias': config['use_bias']
+                })
+            else:
+                raise ValueError(f"不支持导出的层类型：{kind}")
+            weights.append(layer.get_weights())
+        return cls(layers, weights)
+
+    def save(self, path: str):
+        """保存为单个 .npz 文件
+
+        Args:
+            path (str): 保存路径
+        """
+        arrays = {
+            f"layer{i}_{j}": w
+            for i, layer in enumerate(self.weights)
+            for j, w in enumerate(layer)
+        }
+        header = {'format_version': FORMAT_VERSION, 'dtype': self.dtype.name, 'layers': self.layers}
+        np.savez(path, header=np.array(json.dumps(header)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'NumpyLSTM':
+        """从 .npz 文件加载
+
+        Args:
+            path (str): 权重文件路径
+
+        Returns:
+            NumpyLSTM: 加载后的推理模型
+        """
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header['format_version'] != FORMAT_VERSION:
+                raise ValueError(f"不支持的权重文件版本：{header['format_version']}")
+            weights = []
+            for i in range(len(header['layers'])):
+                layer, j = [], 0
+                while f"layer{i}_{j}" in data:
+                    layer.append(data[f"layer{i}_{j}"])
+                    j += 1
+                weights.append(layer)
+        return cls(header['layers'], weights, header['dtype'])
+
+    def _forward(self, x: np.ndarray) -> np.ndarray:
+        for config, weights in zip(self.layers, self.weights):
+            bias = weights[-1] if config['use_bias'] else None
+            if config['type'] == 'LSTM':
+                x = _lstm_forward(x, weights[0], weights[1], bias, config)
+            else:
+                x = x @ weights[0]
+                if bias is not None:
+                    x = x + bias
+                x = _activation(config['activation'])(x)
+        return x
+
+    def predict(self, X: np.ndarray, batch_size: int = 4096, verbose: int = 0) -> np.ndarray:
+        """批量前向计算，接口与Keras的predict保持一致
+
+        Args:
+            X (np.ndarray): 输入数据，形状为 (samples, sequence_length, features)
+            batch_size (int): 每批样本数，用于限制中间结果的内存占用
+            verbose (int): 为兼容Keras接口保留，不使用
+
+        Returns:
+            np.ndarray: 预测结果，形状为 (samples, output_dim)
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        if len(X) <= batch_size:
+            return self._forward(X)
+        return np.concatenate([
+            self._forward(X[start:start + batch_size])
+            for start in range(0, len(X), batch_size)
+        ])
+
+
+def export_lstm_weights(model, path: str):
+    """将Keras LSTM模型导出为NumPy推理使用的权重文件
+
+    Args:
+        model: Keras Sequential模型
+        path (str): 保存路径（.npz）
+    """
+    NumpyLSTM.from_keras(model).save(path)
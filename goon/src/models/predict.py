@@ -1,15 +1,64 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
-from tensorflow.keras.models import load_model
+from typing import List, Dict, Optional, Union
 from xgboost import XGBRegressor
 import joblib
+from models.numpy_lstm import NumpyLSTM
+from models.bundle import ModelBundle, BundleRegistry, default_registry
+from data.feature_store import FeatureStore
+from data.dtypes import as_float
+from models.prediction_cache import PredictionCache, make_key
+from models.symbol_encoding import GlobalEncoder
+from models.ensemble import EnsembleWeights, DEFAULT_WEIGHTS
+from utils.instrumentation import instrumented
 
 class StockPredictor:
-    def __init__(self):
-        """初始化预测器"""
-        self.lstm_model = None
-        self.xgb_model = None
+    def __init__(self, prediction_cache: Optional[PredictionCache] = None):
+        """初始化预测器
+
+        Args:
+            prediction_cache (Optional[PredictionCache]): 预测结果缓存，只对从模型包加载的模型生效
+        """
+        self._lstm_model = None
+        self._xgb_model = None
+        self.bundle: Optional[ModelBundle] = None
+        # 全局模型包的股票/行业编码，普通模型包为None
+        self.global_encoder: Optional[GlobalEncoder] = None
+        self.prediction_cache = prediction_cache
+
+    @property
+    def lstm_model(self):
+        """LSTM模型；从模型包加载时在第一次使用时才读取权重"""
+        if self._lstm_model is None and self.bundle is not None:
+            return self.bundle.lstm
+        return self._lstm_model
+
+    @lstm_model.setter
+    def lstm_model(self, model):
+        self._lstm_model = model
+
+    @property
+    def xgb_model(self):
+        """XGBoost模型；从模型包加载时在第一次使用时才读取"""
+        if self._xgb_model is None and self.bundle is not None:
+            return self.bundle.xgb
+        return self._xgb_model
+
+    @xgb_model.setter
+    def xgb_model(self, model):
+        self._xgb_model = model
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """当前模型的版本（模型包哈希），不是从模型包加载时为None"""
+        return self.bundle.bundle_hash if self.bundle is not None else None
+
+    @property
+    def ensemble_weights(self) -> Optional[EnsembleWeights]:
+        """模型包中保存的、在样本外预测上优化得到的集成权重，没有时为None"""
+        if self.bundle is None or not self.bundle.metadata.get('ensemble_weights'):
+            return None
+        return EnsembleWeights.from_dict(self.bundle.metadata['ensemble_weights'])
 
     def load_models(self, lstm_path: str, xgb_path: str):
         """加载预训练模型
@@ -17,26 +66,68 @@ class StockPredictor:
         Args:
             lstm_path (str): LSTM模型路径
             xgb_path (str): XGBoost模型路径
+
+        Raises:
+            Exception: 模型文件不存在或无法读取，此时已加载的模型保持不变
+        """
+        # 延迟导入TensorFlow，只使用NumPy推理的进程无需加载
+        from tensorflow.keras.models import load_model
+        lstm_model = load_model(lstm_path)
+        xgb_model = joblib.load(xgb_path)
+        self.lstm_model = lstm_model
+        self.xgb_model = xgb_model
+        self.bundle = None
+        self.global_encoder = None
+
+    @instrumented('predict.load_bundle')
+    def load_bundle(self, path: str, registry: Optional[BundleRegistry] = None):
+        """从模型包加载模型，同一进程内重复加载同一模型包时直接使用缓存
+
+        Args:
+            path (str): 模型包目录
+            registry (Optional[BundleRegistry]): 模型包缓存，默认使用进程级缓存
         """
-        try:
-            self.lstm_model = load_model(lstm_path)
-            self.xgb_model = joblib.load(xgb_path)
-        except Exception as e:
-            print(f"加载模型失败：{str(e)}")
+        registry = registry or default_registry
+        previous = self.bundle
+        self.bundle = registry.get(path)
+        # 同一路径的模型包被重新训练后，清除旧版本的缓存结果
+        if (self.prediction_cache is not None and previous is not None
+                and previous.path == self.bundle.path and previous.bundle_hash != self.bundle.bundle_hash):
+            self.prediction_cache.invalidate(bundle_hash=previous.bundle_hash)
+        # 两个模型都从模型包按需读取，见 lstm_model、xgb_model
+        self.lstm_model = None
+        self.xgb_model = None
+        self.global_encoder = GlobalEncoder.from_bundle(self.bundle)
+
+    def load_numpy_lstm(self, weights_path: str):
+        """加载导出的LSTM权重，使用纯NumPy推理代替Keras
 
-    def predict_lstm(self, X: np.ndarray) -> np.ndarray:
+        Args:
+            weights_path (str): export_lstm_weights 导出的权重文件路径
+        """
+        self.lstm_model = NumpyLSTM.load(weights_path)
+        # xgb_model 未单独设置时从模型包读取，解除模型包关联之前先把它固定下来，否则会随模型包一起丢失
+        if self._xgb_model is None and self.bundle is not None:
+            self._xgb_model = self.bundle.xgb
+        self.bundle = None
+        self.global_encoder = None
+
+    @instrumented('predict.lstm')
+    def predict_lstm(self, X: np.ndarray, **predict_kwargs) -> np.ndarray:
         """使用LSTM模型进行预测
 
         Args:
             X (np.ndarray): 输入数据，形状为 (samples, sequence_length, features)
+            **predict_kwargs: 传给模型predict的其他参数，如batch_size、verbose
 
         Returns:
             np.ndarray: 预测结果
         """
         if self.lstm_model is None:
             raise ValueError("LSTM模型未加载")
-        return self.lstm_model.predict(X)
+        return self.lstm_model.predict(X, **predict_kwargs)
 
+    @instrumented('predict.xgboost')
     def predict_xgboost(self, X: np.ndarray) -> np.ndarray:
         """使用XGBoost模型进行预测
 
@@ -50,6 +141,22 @@ class StockPredictor:
             raise ValueError("XGBoost模型未加载")
         return self.xgb_model.predict(X)
 
+    @staticmethod
+    def _blend(
+        lstm_pred: np.ndarray,
+        xgb_pred: np.ndarray,
+        weights: Union[List[float], EnsembleWeights],
+        X: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """按权重组合两个模型的预测结果，输出形状与LSTM预测一致
+
+        weights为按行情状态划分的 EnsembleWeights 时，由窗口数据X判断各样本所属的状态。
+        """
+        if isinstance(weights, EnsembleWeights):
+            blended = weights.blend({'lstm': lstm_pred, 'xgb': xgb_pred}, X)
+            return blended.reshape(lstm_pred.shape).astype(lstm_pred.dtype, copy=False)
+        return weights[0] * lstm_pred + weights[1] * np.reshape(xgb_pred, lstm_pred.shape)
+
     def ensemble_predict(self, X_lstm: np.ndarray, X_xgb: np.ndarray, weights: Optional[List[float]] = None) -> np.ndarray:
         """集成预测
 
@@ -67,8 +174,128 @@ class StockPredictor:
         lstm_pred = self.predict_lstm(X_lstm)
         xgb_pred = self.predict_xgboost(X_xgb)
 
-        return weights[0] * lstm_pred + weights[1] * xgb_pred
+        return self._blend(lstm_pred, xgb_pred, weights, X_lstm)
+
+    @instrumented('predict.batch', rows=len)
+    def predict_batch(
+        self,
+        data: Dict[str, pd.DataFrame],
+        sequence_length: int,
+        features: List[str],
+        weights: Optional[List[float]] = None,
+        batch_size: int = 1024,
+        use_cache: bool = True
+    ) -> Dict[str, Dict[str, float]]:
+        """批量预测多只股票的下一个交易日价格
 
+        将各股票最近 sequence_length 行特征堆叠为一个张量，每个批次中每个模型只调用一次，
+        集成结果直接由两个模型的输出组合得到。加载的是全局模型包时，所有股票共用同一个模型，
+        由 GlobalEncoder 按股票代码追加股票和行业输入。
+        设置了预测缓存且数据包含trade_date列时，先按 (股票代码, 最后一根K线日期, 模型包哈希, 特征, 权重)
+        查找缓存，只对未命中的股票运行模型。
+
+        Args:
+            data (Dict[str, pd.DataFrame]): 股票代码到其最近行情特征数据的映射
+            sequence_length (int): 序列长度
+            features (List[str]): 特征列表
+            weights (Optional[List[float]]): 集成权重，默认使用模型包中保存的 ensemble_weights，没有时为[0.6, 0.4]
+            batch_size (int): 每批包含的股票数
+            use_cache (bool): 是否使用预测缓存
+
+        Returns:
+            Dict[str, Dict[str, float]]: 股票代码到预测结果的映射；数据不足 sequence_length 行的股票会被跳过
+        """
+        if weights is None:
+            weights = self.ensemble_weights or list(DEFAULT_WEIGHTS)
+        weights_key = weights.key() if isinstance(weights, EnsembleWeights) else weights
+
+        results, cache_keys = {}, {}
+        cache = self.prediction_cache if use_cache and self.model_version is not None else None
+        if cache is not None:
+            for code, df in data.items():
+                if 'trade_date' not in df.columns or len(df) < sequence_length:
+                    continue
+                key = make_key(code, df['trade_date'].iloc[-1], self.model_version, features, weights_key)
+                cached = cache.get(key)
+                if cached is not None:
+                    results[code] = cached
+                else:
+                    cache_keys[code] = key
+
+        codes, windows = [], []
+        for code, df in data.items():
+            if code in results:
+                continue
+            if len(df) < sequence_length:
+                print(f"股票{code}数据不足{sequence_length}行，跳过预测")
+                continue
+            codes.append(code)
+            windows.append(df[features].to_numpy()[-sequence_length:])
+
+        computed = {}
+        for start in range(0, len(codes), batch_size):
+            batch_codes = codes[start:start + batch_size]
+            X_lstm = as_float(np.stack(windows[start:start + batch_size]))
+            # XGBoost使用每个窗口的最后一行特征
+            X_xgb = X_lstm[:, -1, :]
+            X_window = X_lstm
+            if self.global_encoder is not None:
+                X_xgb = self.global_encoder.xgb_inputs(X_xgb, batch_codes)
+                X_lstm = self.global_encoder.lstm_inputs(X_lstm, batch_codes)
+
+            lstm_pred = self.predict_lstm(X_lstm, batch_size=len(X_lstm), verbose=0).reshape(-1)
+            xgb_pred = self.predict_xgboost(X_xgb).reshape(-1)
+            ensemble_pred = self._blend(lstm_pred, xgb_pred, weights, X_window)
+
+            for i, code in enumerate(batch_codes):
+                computed[code] = {
+                    'lstm_prediction': float(lstm_pred[i]),
+                    'xgb_prediction': float(xgb_pred[i]),
+                    'ensemble_prediction': float(ensemble_pred[i])
+                }
+
+        if cache is not None and cache_keys:
+            cache.put_many({cache_keys[code]: computed[code] for code in computed if code in cache_keys})
+        results.update(computed)
+        return results
+
+    @instrumented('predict.from_store', rows=len)
+    def predict_from_store(
+        self,
+        store: FeatureStore,
+        ts_codes: Union[str, List[str]],
+        sequence_length: int,
+        weights: Optional[List[float]] = None,
+        batch_size: int = 1024
+    ) -> Dict[str, Dict[str, float]]:
+        """从特征库读取最近 sequence_length 行特征并预测
+
+        特征列表和归一化参数都来自特征库中训练时保存的版本，只做transform，不重新计算指标或拟合。
+
+        Args:
+            store (FeatureStore): 特征库
+            ts_codes (Union[str, List[str]]): 股票代码或代码列表
+            sequence_length (int): 序列长度
+            weights (Optional[List[float]]): 集成权重，默认使用模型包中保存的 ensemble_weights，没有时为[0.6, 0.4]
+            batch_size (int): 每批包含的股票数
+
+        Returns:
+            Dict[str, Dict[str, float]]: 股票代码到预测结果的映射
+        """
+        if isinstance(ts_codes, str):
+            ts_codes = [ts_codes]
+
+        groups: Dict[tuple, Dict[str, pd.DataFrame]] = {}
+        for code in ts_codes:
+            features = tuple(store.manifest(code)['features'])
+            groups.setdefault(features, {})[code] = store.transform_tail(code, sequence_length)
+
+        results = {}
+        for features, data in groups.items():
+            results.update(self.predict_batch(data, sequence_length, list(features), weights, batch_size))
+        return results
+
+    @instrumented('predict.next_day')
     def predict_next_day(self, 
                         current_data: pd.DataFrame,
                         sequence_length: int,
@@ -83,26 +310,16 @@ class StockPredictor:
         Returns:
             Dict[str, float]: 预测结果，包含不同模型的预测值
         """
-        # 准备LSTM输入数据
-        lstm_input = current_data[features].values[-sequence_length:]
-        lstm_input = lstm_input.reshape(1, sequence_length, len(features))
-
-        # 准备XGBoost输入数据
-        xgb_input = current_data[features].values[-1:]
-
-        # 单个模型预测
-        lstm_prediction = self.predict_lstm(lstm_input)[0][0]
-        xgb_prediction = self.predict_xgboost(xgb_input)[0]
-
-        # 集成预测
-        ensemble_prediction = self.ensemble_predict(
-            lstm_input,
-            xgb_input,
-            weights=[0.6, 0.4]  # 可以根据模型表现调整权重
-        )[0][0]
-
-        return {
-            'lstm_prediction': float(lstm_prediction),
-            'xgb_prediction': float(xgb_prediction),
-            'ensemble_prediction': float(ensemble_prediction)
-        }
\ No newline at end of file
+        if len(current_data) < sequence_length:
+            raise ValueError(f"数据不足{sequence_length}行，无法预测")
+
+        # 只有知道股票代码时才能使用预测缓存
+        has_code = 'ts_code' in current_data.columns
+        code = str(current_data['ts_code'].iloc[-1]) if has_code else '_'
+        return self.predict_batch(
+            {code: current_data},
+            sequence_length,
+            features,
+            weights=None,  # 使用模型包中保存的集成权重
+            use_cache=has_code
+        )[code]
@@ -0,0 +1,154 @@
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CacheKey = Tuple[str, str, str, str, str]
+
+
+def make_key(
+    ts_code: str,
+    trade_date: str,
+    bundle_hash: str,
+    features: Iterable[str],
+    weights: Optional[Iterable[float]] = None
+) -> CacheKey:
+    """构建缓存键：(股票代码, 最后一根K线日期, 模型包哈希, 特征列表, 集成权重)"""
+    return (
+        str(ts_code),
+        str(trade_date),
+        str(bundle_hash),
+        ','.join(features),
+        ','.join(f"{w:g}" for w in weights) if weights is not None else ''
+    )
+
+
+class PredictionCache:
+    def __init__(self, max_size: int = 100000, disk_path: Optional[str] = None):
+        """预测结果缓存
+
+        预测结果只在出现新K线或模型更新后才会变化，键中包含最后一根K线的日期和模型包哈希，
+        因此无需设置过期时间。内存层按LRU淘汰；设置disk_path时使用SQLite文件作为第二层，
+        可在多个进程之间共享。
+
+        Args:
+            max_size (int): 内存层最多缓存的结果数
+            disk_path (Optional[str]): SQLite缓存文件路径，为None时只使用内存
+        """
+        self.max_size = max_size
+        self.disk_path = disk_path
+        self._memory: 'OrderedDict[CacheKey, Dict[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'ts_code TEXT, trade_date TEXT, bundle_hash TEXT, features TEXT, weights TEXT, '
+                'result TEXT, created_at REAL, '
+                'PRIMARY KEY (ts_code, trade_date, bundle_hash, features, weights))'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS predictions_bundle ON predictions (bundle_hash)')
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _remember(self, key: CacheKey, value: Dict[str, float]):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, float]]:
+        """查找缓存，未命中时返回None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return dict(value)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT result FROM predictions WHERE ts_code=? AND trade_date=? AND bundle_hash=? '
+                    'AND features=? AND weights=?',
+                    key
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return dict(value)
+
+            self.misses += 1
+            return None
+
+    def put(self, key: CacheKey, value: Dict[str, float]):
+        """写入缓存"""
+        self.put_many({key: value})
+
+    def put_many(self, items: Dict[CacheKey, Dict[str, float]]):
+        """批量写入缓存，磁盘层在一个事务中完成"""
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, dict(value))
+            if self._db is not None and items:
+                now = time.time()
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [key + (json.dumps(value), now) for key, value in items.items()]
+                )
+                self._db.commit()
+
+    def invalidate(self, bundle_hash: Optional[str] = None, ts_code: Optional[str] = None) -> int:
+        """清除缓存，模型重新训练后按旧的模型包哈希清除
+
+        Args:
+            bundle_hash (Optional[str]): 只清除该模型包的结果
+            ts_code (Optional[str]): 只清除该股票的结果；两者都为None时清除全部
+
+        Returns:
+            int: 从内存层清除的条目数
+        """
+        with self._lock:
+            stale: List[CacheKey] = [
+                key for key in self._memory
+                if (bundle_hash is None or key[2] == bundle_hash) and (ts_code is None or key[0] == ts_code)
+            ]
+            for key in stale:
+                del self._memory[key]
+
+            if self._db is not None:
+                conditions, params = [], []
+                if bundle_hash is not None:
+                    conditions.append('bundle_hash=?')
+                    params.append(bundle_hash)
+                if ts_code is not None:
+                    conditions.append('ts_code=?')
+                    params.append(ts_code)
+                where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+                self._db.execute(f'DELETE FROM predictions{where}', params)
+                self._db.commit()
+
+            return len(stale)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._memory),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
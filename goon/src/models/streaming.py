@@ -0,0 +1,189 @@
+import numpy as np
+import xgboost as xgb
+from typing import Iterator, Optional, Tuple
+from data.dtypes import float_dtype
+
+XGB_FEATURE_MODES = ('last', 'flatten')
+# 流式训练LSTM时打乱缓冲区包含的批次数
+DEFAULT_SHUFFLE_BUFFER = 64
+
+
+def open_windows(x_path: str, y_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """以只读内存映射方式打开窗口数据文件
+
+    Args:
+        x_path (str): 窗口特征文件（.npy），形状为 (样本数, sequence_length, 特征数)
+        y_path (str): 标签文件（.npy），形状为 (样本数,)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (X, y) 内存映射数组
+    """
+    X = np.load(x_path, mmap_mode='r')
+    y = np.load(y_path, mmap_mode='r')
+    if len(X) != len(y):
+        raise ValueError("窗口特征与标签的样本数不一致")
+    return X, y
+
+
+def split_time_ordered(n_samples: int, validation_split: float) -> Tuple[np.ndarray, np.ndarray]:
+    """按时间顺序划分训练/验证区间，验证集取最后一段样本"""
+    n_train = int(n_samples * (1 - validation_split))
+    return np.arange(n_train), np.arange(n_train, n_samples)
+
+
+def iter_batches(
+    indices: np.ndarray,
+    batch_size: int,
+    shuffle: bool = True,
+    rng: Optional[np.random.Generator] = None
+) -> Iterator[np.ndarray]:
+    """生成连续样本块的索引
+
+    打乱时只打乱块的顺序，每次读取内存映射文件时都是连续访问；块内样本的打乱由调用方
+    在读入内存后完成（见 make_lstm_dataset）。
+
+    Args:
+        indices (np.ndarray): 可用样本的索引
+        batch_size (int): 批次大小
+        shuffle (bool): 是否打乱
+        rng (Optional[np.random.Generator]): 随机数生成器
+
+    Yields:
+        np.ndarray: 每个批次的样本索引（升序）
+    """
+    starts = np.arange(0, len(indices), batch_size)
+    if shuffle:
+        rng = rng or np.random.default_rng()
+        starts = rng.permutation(starts)
+    for start in starts:
+        yield indices[start:start + batch_size]
+
+
+def make_lstm_dataset(
+    X: np.ndarray,
+    y: np.ndarray,
+    indices: np.ndarray,
+    batch_size: int = 32,
+    shuffle: bool = True,
+    seed: int = 42,
+    shuffle_buffer: int = DEFAULT_SHUFFLE_BUFFER
+):
+    """构建从内存映射窗口文件流式读取的 tf.data 数据集
+
+    打乱时每次连续读取 shuffle_buffer 个批次的样本到缓冲区，在缓冲区内随机排列后再切分批次，
+    缓冲区的读取顺序也随机打乱，每个epoch的批次组成都不同。通过prefetch让读取与训练并行，
+    内存占用只与缓冲区大小有关。
+
+    Args:
+        X (np.ndarray): 内存映射的窗口特征
+        y (np.ndarray): 内存映射的标签
+        indices (np.ndarray): 参与训练的样本索引
+        batch_size (int): 批次大小
+        shuffle (bool): 是否在每个epoch打乱样本
+        seed (int): 随机种子
+        shuffle_buffer (int): 打乱缓冲区包含的批次数
+
+    Returns:
+        tf.data.Dataset: 产出 (X_batch, y_batch) 的数据集
+    """
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    dtype = float_dtype()
+
+    def generator():
+        if not shuffle:
+            for batch in iter_batches(indices, batch_size, shuffle=False):
+                yield (
+                    np.asarray(X[batch[0]:batch[-1] + 1], dtype=dtype),
+                    np.asarray(y[batch[0]:batch[-1] + 1], dtype=dtype)
+                )
+            return
+
+        for block in iter_batches(indices, batch_size * max(1, shuffle_buffer), shuffle=True, rng=rng):
+            X_block = np.asarray(X[block[0]:block[-1] + 1], dtype=dtype)
+            y_block = np.asarray(y[block[0]:block[-1] + 1], dtype=dtype)
+            order = rng.permutation(len(block))
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                yield X_block[rows], y_block[rows]
+
+    dataset = tf.data.Dataset.from_generator(
+        generator,
+        output_signature=(
+            tf.TensorSpec(shape=(None,) + X.shape[1:], dtype=tf.as_dtype(dtype)),
+            tf.TensorSpec(shape=(None,), dtype=tf.as_dtype(dtype))
+        )
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def xgb_batch(
+    X: np.ndarray,
+    y: np.ndarray,
+    batch: np.ndarray,
+    features: str = 'last'
+) -> Tuple[np.ndarray, np.ndarray]:
+    """读取一个连续批次并转换为XGBoost的二维输入
+
+    Args:
+        X (np.ndarray): 内存映射的窗口特征
+        y (np.ndarray): 内存映射的标签
+        batch (np.ndarray): 批次内的样本索引（连续区间）
+        features (str): 'last' 使用窗口最后一行特征（与StockPredictor一致），'flatten' 使用展平后的整个窗口
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (特征, 标签)
+    """
+    window = X[batch[0]:batch[-1] + 1]
+    if features == 'last':
+        data = np.asarray(window[:, -1, :], dtype=float_dtype())
+    else:
+        data = np.asarray(window, dtype=float_dtype()).reshape(len(window), -1)
+    return data, np.asarray(y[batch[0]:batch[-1] + 1], dtype=float_dtype())
+
+
+class WindowBatchIter(xgb.DataIter):
+    def __init__(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        indices: np.ndarray,
+        batch_size: int = 65536,
+        features: str = 'last',
+        cache_prefix: Optional[str] = None
+    ):
+        """按批从内存映射窗口文件读取数据的XGBoost迭代器
+
+        设置cache_prefix时XGBoost使用外部内存模式，把分页数据缓存到磁盘。
+
+        Args:
+            X (np.ndarray): 内存映射的窗口特征
+            y (np.ndarray): 内存映射的标签
+            indices (np.ndarray): 参与训练的样本索引（连续区间）
+            batch_size (int): 每批样本数
+            features (str): 'last' 使用窗口最后一行特征（与StockPredictor一致），'flatten' 使用展平后的整个窗口
+            cache_prefix (Optional[str]): 外部内存缓存文件前缀
+        """
+        if features not in XGB_FEATURE_MODES:
+            raise ValueError(f"features必须是{XGB_FEATURE_MODES}之一")
+        self.X = X
+        self.y = y
+        self.indices = indices
+        self.batch_size = batch_size
+        self.features = features
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._position >= len(self.indices):
+            return False
+        batch = self.indices[self._position:self._position + self.batch_size]
+        self._position += self.batch_size
+
+        data, label = xgb_batch(self.X, self.y, batch, self.features)
+        input_data(data=data, label=label)
+        return True
+
+    def reset(self):
+        self._position = 0
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 训练时没有见过的股票或行业统一编码为0
+UNKNOWN_ID = 0
+
+
+class SymbolVocabulary:
+    def __init__(self, symbols: List[str], sectors: Dict[str, str], sector_names: Optional[List[str]] = None):
+        """股票代码和所属行业到整数编号的映射，编号从1开始，0表示未知
+
+        Args:
+            symbols (List[str]): 训练数据中的股票代码
+            sectors (Dict[str, str]): 股票代码到行业的映射，可以包含训练数据之外的股票，
+                使训练时没有见过的股票仍能按所属行业编码；没有行业信息的股票编码为未知行业
+            sector_names (Optional[List[str]]): 有编号的行业，默认为训练股票所属的行业
+                （其他行业没有训练过的嵌入向量，编码为未知）
+        """
+        self.symbols = list(symbols)
+        self.sectors = {code: sector for code, sector in sectors.items() if isinstance(sector, str) and sector}
+        if sector_names is None:
+            sector_names = {self.sectors[code] for code in self.symbols if code in self.sectors}
+        self.sector_names = sorted(sector_names)
+        self._symbol_ids = {code: i + 1 for i, code in enumerate(self.symbols)}
+        self._sector_ids = {name: i + 1 for i, name in enumerate(self.sector_names)}
+
+    @classmethod
+    def fit(
+        cls,
+        ts_codes: Iterable[str],
+        stock_basic: Optional[pd.DataFrame] = None,
+        sector_column: str = 'industry'
+    ) -> 'SymbolVocabulary':
+        """从训练数据的股票代码和 DataFetcher.fetch_stock_basic 的结果构建映射
+
+        Args:
+            ts_codes (Iterable[str]): 训练数据中的股票代码
+            stock_basic (Optional[pd.DataFrame]): 股票基本信息，包含ts_code和行业列
+            sector_column (str): 行业列名
+
+        Returns:
+            SymbolVocabulary: 编号映射
+        """
+        sectors = {}
+        if stock_basic is not None and len(stock_basic) and sector_column in stock_basic.columns:
+            sectors = dict(zip(stock_basic['ts_code'].astype(str), stock_basic[sector_column]))
+        return cls(sorted({str(code) for code in ts_codes}), sectors)
+
+    @property
+    def n_symbols(self) -> int:
+        """股票编号的取值个数（包括未知）"""
+        return len(self.symbols) + 1
+
+    @property
+    def n_sectors(self) -> int:
+        """行业编号的取值个数（包括未知）"""
+        return len(self.sector_names) + 1
+
+    def symbol_ids(self, codes: Iterable[str]) -> np.ndarray:
+        return np.array([self._symbol_ids.get(str(code), UNKNOWN_ID) for code in codes], dtype=np.int32)
+
+    def sector_ids(self, codes: Iterable[str]) -> np.ndarray:
+        return np.array(
+            [self._sector_ids.get(self.sectors.get(str(code)), UNKNOWN_ID) for code in codes],
+            dtype=np.int32
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'symbols': self.symbols, 'sectors': self.sectors, 'sector_names': self.sector_names}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'SymbolVocabulary':
+        return cls(data['symbols'], data['sectors'], data.get('sector_names'))
+
+
+class GlobalEncoder:
+    def __init__(
+        self,
+        vocabulary: SymbolVocabulary,
+        symbol_embedding: np.ndarray,
+        sector_embedding: np.ndarray
+    ):
+        """全局模型的输入编码
+
+        LSTM的输入为每个时间步的特征拼接股票和行业的嵌入向量（同一窗口内各时间步相同），
+        XGBoost的输入为窗口最后一行特征加上股票和行业编号两列类别特征。
+
+        Args:
+            vocabulary (SymbolVocabulary): 编号映射
+            symbol_embedding (np.ndarray): 股票嵌入表，形状为 (n_symbols, 维度)
+            sector_embedding (np.ndarray): 行业嵌入表，形状为 (n_sectors, 维度)
+        """
+        self.vocabulary = vocabulary
+        self.symbol_embedding = symbol_embedding
+        self.sector_embedding = sector_embedding
+
+    @classmethod
+    def from_bundle(cls, bundle) -> Optional['GlobalEncoder']:
+        """从模型包读取编码信息，不是全局模型包时返回None"""
+        spec = bundle.metadata.get('global_model')
+        if spec is None:
+            return None
+        return cls(
+            SymbolVocabulary.from_dict(spec['vocabulary']),
+            bundle.array('symbol_embedding'),
+            bundle.array('sector_embedding')
+        )
+
+    def ids(self, codes: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.vocabulary.symbol_ids(codes), self.vocabulary.sector_ids(codes)
+
+    def lstm_inputs(self, windows: np.ndarray, codes: List[str]) -> np.ndarray:
+        """把嵌入向量拼接到窗口的每个时间步，形状 (样本, 序列, 特征) -> (样本, 序列, 特征 + 嵌入维度)"""
+        symbol_ids, sector_ids = self.ids(codes)
+        embedding = np.concatenate(
+            [self.symbol_embedding[symbol_ids], self.sector_embedding[sector_ids]], axis=1
+        ).astype(windows.dtype, copy=False)
+        n, length, _ = windows.shape
+        return np.concatenate(
+            [windows, np.broadcast_to(embedding[:, None, :], (n, length, embedding.shape[1]))], axis=2
+        )
+
+    def xgb_inputs(self, rows: np.ndarray, codes: List[str]) -> np.ndarray:
+        """在特征后追加股票和行业编号两列"""
+        symbol_ids, sector_ids = self.ids(codes)
+        return np.column_stack([rows, symbol_ids, sector_ids]).astype(rows.dtype, copy=False)
@@ -0,0 +1,500 @@
+import os
+import json
+import math
+import time
+import hashlib
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+from dataclasses import asdict, dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from data.dtypes import as_float
+from utils.instrumentation import instrumented
+
+SUCCESSIVE_HALVING = 'successive_halving'
+HYPERBAND = 'hyperband'
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'
+)
+
+# 工作进程内的训练/验证数据，由 _init_worker 初始化一次
+_worker: Dict[str, Any] = {}
+
+
+@dataclass
+class Choice:
+    """从给定的取值中均匀抽取"""
+    values: List[Any]
+
+    def sample(self, rng: np.random.Generator) -> Any:
+        return self.values[int(rng.integers(len(self.values)))]
+
+
+@dataclass
+class Uniform:
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(rng.uniform(self.low, self.high))
+
+
+@dataclass
+class LogUniform:
+    """在对数尺度上均匀抽取，适合学习率等跨数量级的参数"""
+    low: float
+    high: float
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(np.exp(rng.uniform(np.log(self.low), np.log(self.high))))
+
+
+@dataclass
+class IntUniform:
+    """在 [low, high] 中均匀抽取整数"""
+    low: int
+    high: int
+
+    def sample(self, rng: np.random.Generator) -> int:
+        return int(rng.integers(self.low, self.high + 1))
+
+
+# 参数名以 'lstm.' / 'xgb.' 开头，分别传给 ModelTrainer 的 lstm_params / xgb_params；
+# 训练轮数和树的数量由搜索的资源预算决定，不在搜索空间中
+DEFAULT_SEARCH_SPACE = {
+    'lstm.units': Choice([32, 50, 64, 100, 128]),
+    'lstm.dropout': Uniform(0.0, 0.5),
+    'lstm.learning_rate': LogUniform(1e-4, 1e-2),
+    'xgb.learning_rate': LogUniform(0.01, 0.3),
+    'xgb.max_depth': IntUniform(3, 10),
+    'xgb.min_child_weight': LogUniform(0.5, 20.0),
+    'xgb.subsample': Uniform(0.5, 1.0),
+    'xgb.colsample_bytree': Uniform(0.5, 1.0)
+}
+
+
+def split_params(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """把搜索得到的参数拆分为 (lstm_params, xgb_params)，可直接传给 ModelTrainer"""
+    lstm_params = {k[len('lstm.'):]: v for k, v in params.items() if k.startswith('lstm.')}
+    xgb_params = {k[len('xgb.'):]: v for k, v in params.items() if k.startswith('xgb.')}
+    return lstm_params, xgb_params
+
+
+@dataclass
+class Bracket:
+    """一组逐轮淘汰的试验：第i轮以 resources[i] 的预算评估 n_trials[i] 个配置，只保留最好的 1/eta 进入下一轮"""
+    index: int
+    n_trials: List[int]
+    resources: List[int]
+
+
+def make_brackets(
+    min_resource: int,
+    max_resource: int,
+    eta: int = 3,
+    method: str = HYPERBAND,
+    n_trials: Optional[int] = None
+) -> List[Bracket]:
+    """划分搜索的各个bracket
+
+    successive_halving 只有一个从 min_resource 开始的bracket；hyperband 在多个bracket中
+    权衡配置数量和每个配置的起始预算，避免一开始预算太小而误删学得慢的配置。
+
+    Args:
+        min_resource (int): 第一轮的最小预算
+        max_resource (int): 单个配置的最大预算
+        eta (int): 每轮保留的比例为 1/eta，预算扩大 eta 倍
+        method (str): 'successive_halving' 或 'hyperband'
+        n_trials (Optional[int]): successive_halving 第一轮的配置数，默认 eta^轮数
+
+    Returns:
+        List[Bracket]: bracket列表
+    """
+    if eta < 2:
+        raise ValueError("eta 必须不小于2")
+    if not 0 < min_resource <= max_resource:
+        raise ValueError("预算必须满足 0 < min_resource <= max_resource")
+    s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+
+    if method == SUCCESSIVE_HALVING:
+        plans = [(s_max, n_trials or eta ** s_max)]
+    elif method == HYPERBAND:
+        plans = [(s, int(math.ceil((s_max + 1) / (s + 1) * eta ** s))) for s in range(s_max, -1, -1)]
+    else:
+        raise ValueError(f"未知的搜索方法：{method}")
+
+    brackets = []
+    for s, n in plans:
+        counts, resources = [], []
+        for i in range(s + 1):
+            counts.append(max(1, int(n * eta ** -i)))
+            resources.append(max(1, int(round(max_resource * eta ** (i - s)))))
+        brackets.append(Bracket(index=len(brackets), n_trials=counts, resources=resources))
+    return brackets
+
+
+def _init_worker(X_train, y_train, X_val, y_val, n_threads: int):
+    """保存训练/验证数据并限制进程内TensorFlow/XGBoost/BLAS的线程数，避免多个进程互相抢占CPU"""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    from threadpoolctl import threadpool_limits
+    _worker['thread_limits'] = threadpool_limits(n_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    _worker.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val, threads=n_threads)
+
+
+def evaluate_trial(params: Dict[str, Any], resource: int, config: Dict[str, Any]) -> Dict[str, Any]:
+    """以给定预算训练一个配置，返回验证集上的集成MAE
+
+    LSTM训练 resource 轮，XGBoost最多 resource * trees_per_unit 棵树；两者都在验证集上早停，
+    LSTM的损失出现NaN时立即终止，发散的配置得分为无穷大。
+
+    Args:
+        params (Dict[str, Any]): 配置，参数名带 'lstm.' / 'xgb.' 前缀
+        resource (int): 预算
+        config (Dict[str, Any]): 搜索参数，见 HyperparameterSearch.config
+
+    Returns:
+        Dict[str, Any]: 验证得分、各模型的MAE和实际训练的轮数/树的数量
+    """
+    import tensorflow as tf
+    from sklearn.metrics import mean_absolute_error
+    from models.model_trainer import ModelTrainer
+
+    X_train, y_train, X_val, y_val = (_worker[k] for k in ('X_train', 'y_train', 'X_val', 'y_val'))
+    start = time.perf_counter()
+    # 固定随机种子，恢复搜索时重新评估的试验与中断前的结果一致
+    tf.keras.utils.set_random_seed(config['seed'])
+    trainer = ModelTrainer(*split_params(params))
+    predictions, details = {}, {}
+
+    if 'lstm' in config['models']:
+        trainer.lstm_model = trainer.build_lstm_model((X_train.shape[1], X_train.shape[2]))
+        history = trainer.lstm_model.fit(
+            X_train, y_train,
+            validation_data=(X_val, y_val),
+            epochs=resource,
+            batch_size=config['batch_size'],
+            callbacks=[
+                tf.keras.callbacks.TerminateOnNaN(),
+                tf.keras.callbacks.EarlyStopping(patience=config['patience'], restore_best_weights=True)
+            ],
+            verbose=0
+        )
+        predictions['lstm'] = trainer.lstm_model.predict(X_val, batch_size=4096, verbose=0).reshape(-1)
+        details['lstm_epochs'] = len(history.history['loss'])
+
+    if 'xgb' in config['models']:
+        X_train_last = np.ascontiguousarray(X_train[:, -1, :])
+        X_val_last = np.ascontiguousarray(X_val[:, -1, :])
+        trainer.xgb_model = trainer.build_xgboost_model(
+            n_estimators=resource * config['trees_per_unit'],
+            early_stopping_rounds=max(1, config['patience'] * config['trees_per_unit'] // 2),
+            n_jobs=_worker.get('threads')
+        )
+        trainer.xgb_model.fit(X_train_last, y_train, eval_set=[(X_val_last, y_val)], verbose=False)
+        predictions['xgb'] = trainer.xgb_model.predict(X_val_last)
+        details['xgb_trees'] = int(trainer.xgb_model.best_iteration) + 1
+
+    weights = {name: config['ensemble_weights'][name] for name in predictions}
+    total = sum(weights.values())
+    blended = sum(weights[name] / total * pred for name, pred in predictions.items())
+
+    scores = {}
+    for name, pred in {**predictions, 'ensemble': blended}.items():
+        scores[name] = float(mean_absolute_error(y_val, pred)) if np.all(np.isfinite(pred)) else float('inf')
+
+    return {
+        'score': scores['ensemble'],
+        'scores': scores,
+        **details,
+        'elapsed': time.perf_counter() - start
+    }
+
+
+@dataclass
+class TuningResult:
+    """超参数搜索结果"""
+    best_params: Dict[str, Any]
+    best_score: float
+    best_resource: int
+    trials: pd.DataFrame
+    evaluated: int = 0
+    reused: int = 0
+    elapsed: float = 0.0
+    brackets: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def lstm_params(self) -> Dict[str, Any]:
+        return split_params(self.best_params)[0]
+
+    @property
+    def xgb_params(self) -> Dict[str, Any]:
+        return split_params(self.best_params)[1]
+
+
+class HyperparameterSearch:
+    def __init__(
+        self,
+        space: Optional[Dict[str, Any]] = None,
+        models: Tuple[str, ...] = ('lstm', 'xgb'),
+        method: str = HYPERBAND,
+        min_resource: int = 1,
+        max_resource: int = 27,
+        eta: int = 3,
+        n_trials: Optional[int] = None,
+        trees_per_unit: int = 20,
+        patience: int = 3,
+        validation_split: float = 0.2,
+        batch_size: int = 256,
+        ensemble_weights: Tuple[float, float] = (0.6, 0.4),
+        log_path: Optional[str] = None,
+        n_jobs: int = 1,
+        threads_per_worker: Optional[int] = None,
+        seed: int = 42
+    ):
+        """基于successive halving / Hyperband的超参数搜索
+
+        每一轮以较小的预算评估一批配置，只有最好的 1/eta 以 eta 倍的预算进入下一轮，
+        因此大部分配置只用很少的训练轮数就被淘汰。一个预算单位对应LSTM的1个训练轮次和
+        XGBoost的 trees_per_unit 棵树。验证集为时间上最后的 validation_split 部分样本。
+
+        同一轮内的试验在进程池中并行，每个进程的线程数限制为 threads_per_worker。设置log_path时，
+        每个试验完成后追加一行到JSONL日志，中断后以相同参数重新运行会跳过已完成的试验。
+
+        Args:
+            space (Optional[Dict[str, Any]]): 搜索空间，默认 DEFAULT_SEARCH_SPACE
+            models (Tuple[str, ...]): 参与训练和评估的模型，'lstm' 和/或 'xgb'
+            method (str): 'hyperband' 或 'successive_halving'
+            min_resource (int): 第一轮的最小预算
+            max_resource (int): 单个配置的最大预算
+            eta (int): 每轮淘汰比例的倒数
+            n_trials (Optional[int]): successive_halving 第一轮的配置数
+            trees_per_unit (int): 每个预算单位对应的XGBoost树的数量
+            patience (int): 早停的容忍轮数（XGBoost按 patience * trees_per_unit / 2 棵树计）
+            validation_split (float): 验证集比例
+            batch_size (int): LSTM训练批次大小
+            ensemble_weights (Tuple[float, float]): LSTM和XGBoost的集成权重，只训练一个模型时不使用
+            log_path (Optional[str]): 试验日志路径（JSONL）
+            n_jobs (int): 并行进程数
+            threads_per_worker (Optional[int]): 每个进程的计算线程数，默认平分CPU核数
+            seed (int): 抽取配置的随机种子
+        """
+        unknown = set(models) - {'lstm', 'xgb'}
+        if not models or unknown:
+            raise ValueError(f"models 只能包含 'lstm' 和 'xgb'，当前为{models}")
+        space = DEFAULT_SEARCH_SPACE if space is None else space
+        self.space = {name: spec for name, spec in space.items() if name.split('.', 1)[0] in models}
+        self.method = method
+        self.brackets = make_brackets(min_resource, max_resource, eta, method, n_trials)
+        self.eta = eta
+        self.validation_split = validation_split
+        self.log_path = log_path
+        self.n_jobs = n_jobs
+        self.threads_per_worker = threads_per_worker
+        self.seed = seed
+        self.config = {
+            'models': tuple(models),
+            'trees_per_unit': trees_per_unit,
+            'patience': patience,
+            'batch_size': batch_size,
+            'ensemble_weights': {'lstm': ensemble_weights[0], 'xgb': ensemble_weights[1]},
+            'seed': seed
+        }
+
+    def sample_configs(self, bracket: Bracket) -> List[Tuple[str, Dict[str, Any]]]:
+        """抽取一个bracket的初始配置；由种子和bracket序号决定，恢复搜索时得到相同的配置"""
+        rng = np.random.default_rng([self.seed, bracket.index])
+        return [
+            (f"b{bracket.index}-t{i}", {name: spec.sample(rng) for name, spec in self.space.items()})
+            for i in range(bracket.n_trials[0])
+        ]
+
+    def _search_key(self, X: np.ndarray, y: np.ndarray) -> str:
+        """同一份数据（按全部内容计算哈希）和同样的搜索参数才能复用试验日志"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({
+            'space': {name: [type(spec).__name__, asdict(spec)] for name, spec in sorted(self.space.items())},
+            'method': self.method,
+            'brackets': [asdict(b) for b in self.brackets],
+            'eta': self.eta,
+            'validation_split': self.validation_split,
+            'seed': self.seed,
+            'config': self.config,
+            'shape': list(X.shape)
+        }, sort_keys=True, default=str).encode())
+        digest.update(np.ascontiguousarray(y).data)
+        # X通常是窗口视图，分块复制为连续数组再计算哈希，不会一次性物化全部窗口
+        for start in range(0, len(X), 4096):
+            digest.update(np.ascontiguousarray(X[start:start + 4096]).data)
+        return digest.hexdigest()
+
+    def _load_log(self, search_key: str) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        completed = {}
+        if self.log_path and os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时可能留下不完整的最后一行
+                        continue
+                    if record.get('search') == search_key:
+                        completed[(record['trial'], record['resource'])] = record
+        return completed
+
+    def _append_log(self, record: Dict[str, Any]):
+        if not self.log_path:
+            return
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=float) + '\n')
+            f.flush()
+
+    @instrumented('tuning.search')
+    def run(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> TuningResult:
+        """运行搜索
+
+        Args:
+            X (np.ndarray): 窗口数据，形状为 (samples, sequence_length, features)
+            y (np.ndarray): 目标变量
+            progress (Optional[Callable[[int, int], None]]): 每个试验完成后调用 progress(已完成, 总数)
+
+        Returns:
+            TuningResult: 最优配置及全部试验记录
+        """
+        started = time.perf_counter()
+        X, y = as_float(X), as_float(y)
+        n_train = int(len(X) * (1 - self.validation_split))
+        if n_train <= 0 or n_train >= len(X):
+            raise ValueError("训练集和验证集都不能为空，请检查样本数和 validation_split")
+        data = (
+            np.ascontiguousarray(X[:n_train]), y[:n_train],
+            np.ascontiguousarray(X[n_train:]), y[n_train:]
+        )
+
+        search_key = self._search_key(X, y)
+        completed = self._load_log(search_key)
+        total = sum(sum(b.n_trials) for b in self.brackets)
+        records, evaluated, reused = [], 0, 0
+
+        n_jobs = max(1, self.n_jobs)
+        executor = None
+        if n_jobs == 1:
+            _worker.update(X_train=data[0], y_train=data[1], X_val=data[2], y_val=data[3])
+
+        try:
+            for bracket in self.brackets:
+                survivors = self.sample_configs(bracket)
+                for rung, resource in enumerate(bracket.resources):
+                    rung_records = {}
+                    pending = []
+                    for trial, params in survivors:
+                        record = completed.get((trial, resource))
+                        if record is not None:
+                            rung_records[trial] = record
+                            reused += 1
+                        else:
+                            pending.append((trial, params))
+
+                    def on_done(trial, params, outcome):
+                        record = {
+                            'search': search_key,
+                            'trial': trial,
+                            'bracket': bracket.index,
+                            'rung': rung,
+                            'resource': resource,
+                            'params': params,
+                            **outcome
+                        }
+                        self._append_log(record)
+                        rung_records[trial] = record
+
+                    if n_jobs == 1:
+                        for trial, params in pending:
+                            on_done(trial, params, self._evaluate(params, resource))
+                            evaluated += 1
+                            if progress is not None:
+                                progress(evaluated + reused, total)
+                    elif pending:
+                        if executor is None:
+                            # 进程池在第一次需要训练时才启动，完全从日志恢复时不必加载TensorFlow
+                            threads = self.threads_per_worker or max(1, (os.cpu_count() or 1) // n_jobs)
+                            # TensorFlow在fork后不安全，使用spawn启动子进程
+                            executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp.get_context('spawn'),
+                                                           initializer=_init_worker, initargs=(*data, threads))
+                        futures = {
+                            executor.submit(evaluate_trial, params, resource, self.config): (trial, params)
+                            for trial, params in pending
+                        }
+                        for future in as_completed(futures):
+                            trial, params = futures[future]
+                            try:
+                                outcome = {'status': 'ok', **future.result()}
+                            except Exception as e:
+                                outcome = {'status': 'failed', 'score': float('inf'), 'error': repr(e)}
+                            on_done(trial, params, outcome)
+                            evaluated += 1
+                            if progress is not None:
+                                progress(evaluated + reused, total)
+
+                    ranked = sorted(survivors, key=lambda item: rung_records[item[0]]['score'])
+                    records.extend(rung_records[trial] for trial, _ in survivors)
+                    if rung + 1 < len(bracket.resources):
+                        survivors = ranked[:bracket.n_trials[rung + 1]]
+        except BaseException:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = None
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            # 释放当前进程持有的训练集和验证集
+            for name in ('X_train', 'y_train', 'X_val', 'y_val'):
+                _worker.pop(name, None)
+
+        trials = pd.DataFrame([
+            {
+                **{k: v for k, v in r.items() if k not in ('search', 'params', 'scores')},
+                **{f"score_{name}": value for name, value in r.get('scores', {}).items()},
+                **r['params']
+            }
+            for r in records
+        ])
+        # 最优配置取最大预算下得分最低的试验，预算较小时的得分偏高，不能直接比较
+        finished = [r for r in records if np.isfinite(r['score'])]
+        if not finished:
+            raise RuntimeError("全部试验都失败或发散")
+        max_resource = max(r['resource'] for r in finished)
+        best = min((r for r in finished if r['resource'] == max_resource), key=lambda r: r['score'])
+
+        return TuningResult(
+            best_params=best['params'],
+            best_score=best['score'],
+            best_resource=best['resource'],
+            trials=trials,
+            evaluated=evaluated,
+            reused=reused,
+            elapsed=time.perf_counter() - started,
+            brackets=[asdict(b) for b in self.brackets]
+        )
+
+    def _evaluate(self, params: Dict[str, Any], resource: int) -> Dict[str, Any]:
+        """在当前进程中评估一个试验，出错的试验记为失败而不中止搜索"""
+        try:
+            return {'status': 'ok', **evaluate_trial(params, resource, self.config)}
+        except Exception as e:
+            return {'status': 'failed', 'score': float('inf'), 'error': repr(e)}
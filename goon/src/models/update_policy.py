@@ -0,0 +1,162 @@
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+FULL_RETRAIN = 'full'
+INCREMENTAL_UPDATE = 'incremental'
+
+
+def population_stability_index(
+    expected_proportions: np.ndarray,
+    actual_proportions: np.ndarray,
+    epsilon: float = 1e-6
+) -> float:
+    """计算群体稳定性指数（PSI）
+
+    一般认为 PSI < 0.1 分布稳定，0.1 ~ 0.25 轻微漂移，> 0.25 明显漂移。
+
+    Args:
+        expected_proportions (np.ndarray): 参考分布各分箱的占比
+        actual_proportions (np.ndarray): 新数据各分箱的占比
+        epsilon (float): 避免空分箱导致对数无穷大的下限
+
+    Returns:
+        float: PSI值
+    """
+    expected = np.clip(np.asarray(expected_proportions, dtype=float), epsilon, None)
+    actual = np.clip(np.asarray(actual_proportions, dtype=float), epsilon, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+class FeatureReference:
+    def __init__(self, edges: List[np.ndarray], proportions: List[np.ndarray]):
+        """训练数据各特征的分箱分布，用于检测新数据的分布漂移
+
+        Args:
+            edges (List[np.ndarray]): 每个特征的内部分箱边界
+            proportions (List[np.ndarray]): 每个特征各分箱的样本占比
+        """
+        self.edges = edges
+        self.proportions = proportions
+
+    @classmethod
+    def fit(cls, X: np.ndarray, bins: int = 10) -> 'FeatureReference':
+        """按训练数据的分位数分箱
+
+        Args:
+            X (np.ndarray): 二维特征数据，形状为 (样本数, 特征数)；三维窗口数据取每个窗口的最后一行
+            bins (int): 分箱数
+
+        Returns:
+            FeatureReference: 参考分布
+        """
+        X = cls._as_2d(X)
+        edges = [np.unique(np.quantile(X[:, j], np.linspace(0, 1, bins + 1)[1:-1])) for j in range(X.shape[1])]
+        return cls(edges, [cls._proportions(X[:, j], e) for j, e in enumerate(edges)])
+
+    @staticmethod
+    def _as_2d(X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        return X[:, -1, :] if X.ndim == 3 else X
+
+    @staticmethod
+    def _proportions(values: np.ndarray, edges: np.ndarray, smoothing: float = 0.0) -> np.ndarray:
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        return (counts + smoothing) / max(len(values) + smoothing * len(counts), 1)
+
+    def psi(self, X: np.ndarray) -> np.ndarray:
+        """计算新数据每个特征相对参考分布的PSI
+
+        新数据通常只有几十个样本，各分箱计数加0.5平滑，避免空分箱把PSI放大。
+        """
+        X = self._as_2d(X)
+        return np.array([
+            population_stability_index(expected, self._proportions(X[:, j], self.edges[j], 0.5))
+            for j, expected in enumerate(self.proportions)
+        ])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'edges': [e.tolist() for e in self.edges],
+            'proportions': [p.tolist() for p in self.proportions]
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'FeatureReference':
+        return cls(
+            [np.asarray(e, dtype=float) for e in state['edges']],
+            [np.asarray(p, dtype=float) for p in state['proportions']]
+        )
+
+
+@dataclass
+class RetrainDecision:
+    mode: str
+    reasons: List[str] = field(default_factory=list)
+    max_psi: Optional[float] = None
+    error_ratio: Optional[float] = None
+
+    @property
+    def full_retrain(self) -> bool:
+        return self.mode == FULL_RETRAIN
+
+
+@dataclass
+class RetrainPolicy:
+    """决定使用增量更新还是完整重训
+
+    Attributes:
+        psi_threshold (float): 任一特征的PSI超过该值（另加样本量带来的噪声项）视为分布漂移
+        error_ratio_threshold (float): 新数据误差超过基准误差的倍数
+        max_incremental_updates (int): 连续增量更新的最大次数，超过后强制完整重训
+    """
+    psi_threshold: float = 0.25
+    error_ratio_threshold: float = 1.5
+    max_incremental_updates: int = 20
+
+    def decide(
+        self,
+        reference: Optional[FeatureReference],
+        X_new: np.ndarray,
+        baseline_error: Optional[float],
+        recent_error: Optional[float],
+        incremental_updates: int
+    ) -> RetrainDecision:
+        """根据分布漂移、误差变化和已增量更新次数做出决策
+
+        Args:
+            reference (Optional[FeatureReference]): 上次完整训练时的特征分布，None时直接完整重训
+            X_new (np.ndarray): 新到达的特征数据
+            baseline_error (Optional[float]): 上次完整训练后的验证集误差
+            recent_error (Optional[float]): 当前模型在新数据上的误差
+            incremental_updates (int): 上次完整训练后已进行的增量更新次数
+
+        Returns:
+            RetrainDecision: 决策结果
+        """
+        if reference is None:
+            return RetrainDecision(FULL_RETRAIN, ['没有参考分布'])
+
+        reasons = []
+        max_psi = 0.0
+        if len(X_new):
+            # 无漂移时 PSI * 样本数 近似服从自由度为 (分箱数 - 1) 的卡方分布，
+            # 新数据样本少时按其99%分位数放宽阈值（Wilson-Hilferty近似）
+            psi = reference.psi(X_new)
+            dof = np.array([max(len(p) - 1, 1) for p in reference.proportions], dtype=float)
+            noise = dof * (1 - 2 / (9 * dof) + 2.326 * np.sqrt(2 / (9 * dof))) ** 3 / len(X_new)
+            max_psi = float(np.max(psi))
+            if np.any(psi > self.psi_threshold + noise):
+                reasons.append(f"特征分布漂移（PSI={max_psi:.3f}）")
+
+        error_ratio = None
+        if baseline_error and recent_error is not None:
+            error_ratio = recent_error / baseline_error
+            if error_ratio > self.error_ratio_threshold:
+                reasons.append(f"误差上升至基准的{error_ratio:.2f}倍")
+
+        if incremental_updates >= self.max_incremental_updates:
+            reasons.append(f"已连续增量更新{incremental_updates}次")
+
+        mode = FULL_RETRAIN if reasons else INCREMENTAL_UPDATE
+        return RetrainDecision(mode, reasons, max_psi, error_ratio)
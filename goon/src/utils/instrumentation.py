@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+import tracemalloc
+import numpy as np
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+logger = logging.getLogger('goon.metrics')
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _count_rows(result: Any) -> Optional[int]:
+    """推断函数返回值包含的行数：DataFrame/数组取长度，元组取第一个元素的长度
+
+    字典通常是指标或配置而不是逐行结果，不计行数；按行组织的字典由 instrumented 的 rows 参数指定。
+    """
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if hasattr(result, 'shape') and getattr(result, 'shape', None):
+        return int(result.shape[0])
+    if isinstance(result, list):
+        return len(result)
+    return None
+
+
+class _StageStats:
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.wall_total = 0.0
+        self.cpu_total = 0.0
+        self.rows_total = 0
+        self.peak_memory = 0
+        self.wall_samples = deque(maxlen=max_samples)
+
+
+class _NullStage:
+    """禁用时使用的空上下文，不做任何记录"""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, owner: 'Instrumentation', name: str, rows: Optional[int]):
+        self.owner = owner
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.owner._push_memory_frame()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        peak = self.owner._pop_memory_frame()
+        self.owner.record_stage(self.name, wall, cpu, self.rows, peak, error=exc_type is not None)
+        return False
+
+
+class Instrumentation:
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        track_memory: Optional[bool] = None,
+        max_samples: int = 2048
+    ):
+        """流水线各阶段的性能指标收集器
+
+        记录每个阶段的调用次数、墙钟时间、CPU时间、处理行数和内存峰值，以及计数器和延迟分布。
+        未启用时所有记录接口直接返回，开销可以忽略。
+
+        Args:
+            enabled (Optional[bool]): 是否启用，默认读取环境变量 GOON_METRICS
+            track_memory (Optional[bool]): 是否用tracemalloc统计各阶段内存峰值（有额外开销），
+                默认读取环境变量 GOON_METRICS_MEMORY
+            max_samples (int): 每个分布保留的最近样本数，用于计算分位数
+        """
+        self.enabled = _env_flag('GOON_METRICS') if enabled is None else enabled
+        self.track_memory = _env_flag('GOON_METRICS_MEMORY') if track_memory is None else track_memory
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """清空已收集的指标"""
+        with self._lock:
+            self._stages: Dict[str, _StageStats] = {}
+            self._counters: Dict[str, float] = {}
+            self._samples: Dict[str, deque] = {}
+
+    def enable(self, track_memory: Optional[bool] = None):
+        self.enabled = True
+        if track_memory is not None:
+            self.track_memory = track_memory
+
+    def disable(self):
+        self.enabled = False
+
+    def stage(self, name: str, rows: Optional[int] = None):
+        """记录一个阶段的上下文管理器，可在with块内设置 stage.rows
+
+        Args:
+            name (str): 阶段名称，如 'fetch.stock_daily'
+            rows (Optional[int]): 该阶段处理的行数
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    def _push_memory_frame(self):
+        if not self.track_memory:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # 嵌套阶段：先把当前峰值归入外层阶段，再为内层重新开始统计
+        stack = getattr(self._local, 'memory_stack', None)
+        if stack is None:
+            stack = self._local.memory_stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak - stack[-1][0])
+        tracemalloc.reset_peak()
+        stack.append([current, 0])
+
+    def _pop_memory_frame(self) -> Optional[int]:
+        stack = getattr(self._local, 'memory_stack', None)
+        if not self.track_memory or not stack:
+            return None
+        start, inner_peak = stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        stage_peak = max(inner_peak, peak - start)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak - stack[-1][0])
+        tracemalloc.reset_peak()
+        return max(stage_peak, 0)
+
+    def record_stage(
+        self,
+        name: str,
+        wall: float,
+        cpu: float,
+        rows: Optional[int] = None,
+        peak_memory: Optional[int] = None,
+        error: bool = False
+    ):
+        """记录一次阶段执行的结果"""
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = _StageStats(self.max_samples)
+            stats.calls += 1
+            stats.errors += int(error)
+            stats.wall_total += wall
+            stats.cpu_total += cpu
+            stats.wall_samples.append(wall)
+            if rows is not None:
+                stats.rows_total += rows
+            if peak_memory is not None:
+                stats.peak_memory = max(stats.peak_memory, peak_memory)
+
+    def increment(self, name: str, value: float = 1):
+        """累加计数器，如API调用次数"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """记录一个观测值，如单次API调用的延迟（秒）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(value)
+
+    @staticmethod
+    def _quantiles(samples) -> Dict[str, float]:
+        if not samples:
+            return {}
+        values = np.quantile(np.fromiter(samples, dtype=float), QUANTILES)
+        return {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, values)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前全部指标的字典"""
+        with self._lock:
+            stages = {
+                name: {
+                    'calls': s.calls,
+                    'errors': s.errors,
+                    'wall_seconds': s.wall_total,
+                    'cpu_seconds': s.cpu_total,
+                    'rows': s.rows_total,
+                    'peak_memory_bytes': s.peak_memory if self.track_memory else None,
+                    'wall_quantiles': self._quantiles(s.wall_samples)
+                }
+                for name, s in self._stages.items()
+            }
+            counters = dict(self._counters)
+            latencies = {
+                name: {'count': len(samples), **self._quantiles(samples)}
+                for name, samples in self._samples.items()
+            }
+        return {'stages': stages, 'counters': counters, 'latencies': latencies}
+
+    def to_log_records(self) -> List[Dict[str, Any]]:
+        """转换为结构化日志记录，每个阶段、计数器和分布各一条"""
+        snapshot = self.snapshot()
+        records = [{'type': 'stage', 'name': name, **data} for name, data in snapshot['stages'].items()]
+        records += [{'type': 'counter', 'name': name, 'value': value}
+                    for name, value in snapshot['counters'].items()]
+        records += [{'type': 'latency', 'name': name, **data}
+                    for name, data in snapshot['latencies'].items()]
+        return records
+
+    def log(self, target: Optional[logging.Logger] = None):
+        """以每行一个JSON的形式写入日志"""
+        target = target or logger
+        for record in self.to_log_records():
+            target.info(json.dumps(record, ensure_ascii=False))
+
+    def to_prometheus(self, prefix: str = 'goon') -> str:
+        """导出为Prometheus文本格式"""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]):
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value}")
+
+        stages = snapshot['stages']
+        metric('stage_calls_total', 'counter', 'Number of stage executions.',
+               [({'stage': n}, s['calls']) for n, s in stages.items()])
+        metric('stage_errors_total', 'counter', 'Number of stage executions that raised.',
+               [({'stage': n}, s['errors']) for n, s in stages.items()])
+        metric('stage_wall_seconds_total', 'counter', 'Wall-clock time spent in each stage.',
+               [({'stage': n}, s['wall_seconds']) for n, s in stages.items()])
+        metric('stage_cpu_seconds_total', 'counter', 'Process CPU time spent in each stage.',
+               [({'stage': n}, s['cpu_seconds']) for n, s in stages.items()])
+        metric('stage_rows_total', 'counter', 'Rows processed by each stage.',
+               [({'stage': n}, s['rows']) for n, s in stages.items()])
+        metric('stage_peak_memory_bytes', 'gauge', 'Peak traced Python memory within each stage.',
+               [({'stage': n}, s['peak_memory_bytes']) for n, s in stages.items()
+                if s['peak_memory_bytes'] is not None])
+        metric('stage_wall_seconds', 'summary', 'Recent wall-clock time quantiles per stage.',
+               [({'stage': n, 'quantile': f"{int(key[1:]) / 100:g}"}, value)
+                for n, s in stages.items() for key, value in s['wall_quantiles'].items()])
+        metric('events_total', 'counter', 'Event counters such as API calls.',
+               [({'name': n}, v) for n, v in snapshot['counters'].items()])
+        metric('latency_seconds', 'summary', 'Recent latency quantiles.',
+               [({'name': n, 'quantile': f"{int(key[1:]) / 100:g}"}, value)
+                for n, data in snapshot['latencies'].items()
+                for key, value in data.items() if key != 'count'])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = 'goon'):
+        """写入Prometheus文本文件（可配合node_exporter的textfile收集器）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, path)
+
+
+metrics = Instrumentation()
+
+
+def instrumented(
+    name: str,
+    instrumentation: Optional[Instrumentation] = None,
+    rows: Optional[Callable[[Any], Optional[int]]] = None
+) -> Callable:
+    """为函数添加阶段计时的装饰器，返回值的行数自动计入该阶段
+
+    Args:
+        name (str): 阶段名称
+        instrumentation (Optional[Instrumentation]): 指标收集器，默认使用进程级的 metrics
+        rows (Optional[Callable[[Any], Optional[int]]]): 由返回值计算行数的函数，默认见 _count_rows
+    """
+    count_rows = rows or _count_rows
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = instrumentation or metrics
+            if not target.enabled:
+                return func(*args, **kwargs)
+            with target.stage(name) as stage:
+                result = func(*args, **kwargs)
+                stage.rows = count_rows(result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from models.backtest import backtest_metrics, walk_forward_periods
+
+
+def test_expanding_window_periods():
+    periods = walk_forward_periods(n_dates=10, min_train_dates=4, retrain_every=3)
+    assert [(p.train_start, p.train_end, p.test_start, p.test_end) for p in periods] == [
+        (0, 4, 4, 7),
+        (0, 7, 7, 10)
+    ]
+    assert [p.index for p in periods] == [0, 1]
+
+
+def test_rolling_window_periods_cover_every_test_date_once():
+    periods = walk_forward_periods(n_dates=23, min_train_dates=5, retrain_every=4, train_window=6)
+    tested = np.concatenate([np.arange(p.test_start, p.test_end) for p in periods])
+    np.testing.assert_array_equal(tested, np.arange(5, 23))
+    for p in periods:
+        # 训练区间紧接在测试区间之前，长度不超过滚动窗口
+        assert p.train_end == p.test_start
+        assert p.train_end - p.train_start == min(6, p.test_start)
+    assert periods[-1].test_end == 23
+
+
+def test_not_enough_dates():
+    assert walk_forward_periods(n_dates=5, min_train_dates=5, retrain_every=1) == []
+
+
+@pytest.mark.parametrize('min_train_dates, retrain_every', [(0, 1), (5, 0)])
+def test_invalid_period_arguments(min_train_dates, retrain_every):
+    with pytest.raises(ValueError):
+        walk_forward_periods(10, min_train_dates, retrain_every)
+
+
+def test_backtest_metrics():
+    nan = np.nan
+    # 3个交易日 × 2只股票，第二只股票第一天没有预测
+    previous = np.array([[10.0, nan], [10.0, 20.0], [10.0, 20.0]])
+    actual = np.array([[11.0, nan], [9.0, 21.0], [11.0, 19.0]])
+    prediction = np.array([[12.0, nan], [11.0, 22.0], [9.0, 18.0]])
+    summary, per_date, per_symbol = backtest_metrics(prediction, actual, previous)
+
+    assert summary['samples'] == 5
+    # 方向：第1天命中，第2天 (错, 对)，第3天 (错, 对)
+    assert summary['hit_rate'] == pytest.approx(3 / 5)
+    errors = np.array([1.0, 2.0, 1.0, 2.0, 1.0])
+    assert summary['mae'] == pytest.approx(errors.mean())
+    assert summary['rmse'] == pytest.approx(np.sqrt((errors ** 2).mean()))
+
+    np.testing.assert_array_equal(per_date['count'], [1, 2, 2])
+    np.testing.assert_allclose(per_date['hit_rate'], [1.0, 0.5, 0.5])
+    # 只有一只股票时横截面IC无意义
+    assert np.isnan(per_date['ic'][0])
+    np.testing.assert_allclose(per_date['ic'][1:], [1.0, 1.0])
+    assert summary['mean_ic'] == pytest.approx(1.0)
+
+    # 持仓：第1天 (+1, 0)，第2天 (+0.5, +0.5)，第3天 (-0.5, -0.5)
+    np.testing.assert_allclose(per_date['turnover'], [0.5, 0.5, 1.0])
+    assert summary['mean_turnover'] == pytest.approx(0.75)
+
+    np.testing.assert_array_equal(per_symbol['count'], [3, 2])
+    np.testing.assert_allclose(per_symbol['hit_rate'], [1 / 3, 1.0])
+    np.testing.assert_array_equal(per_symbol['direction_changes'], [1, 1])
+
+
+def test_backtest_metrics_without_predictions():
+    empty = np.full((2, 3), np.nan)
+    summary, per_date, per_symbol = backtest_metrics(empty, empty, empty)
+    assert summary['samples'] == 0
+    assert np.isnan(summary['hit_rate']) and np.isnan(summary['mean_turnover'])
+    assert len(per_date) == 2 and len(per_symbol) == 3
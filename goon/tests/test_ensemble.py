@@ -0,0 +1,104 @@
+from math import comb
+
+import numpy as np
+import pytest
+
+from models.ensemble import EnsembleWeights, optimize_weights, regime_scores, simplex_grid
+
+
+@pytest.mark.parametrize('n_models, step', [(1, 0.5), (2, 0.05), (3, 0.1), (4, 0.25)])
+def test_simplex_grid_enumerates_the_simplex(n_models, step):
+    grid = simplex_grid(n_models, step)
+    units = round(1 / step)
+    assert grid.shape == (comb(units + n_models - 1, n_models - 1), n_models)
+    np.testing.assert_allclose(grid.sum(axis=1), 1.0)
+    assert (grid >= 0).all()
+    np.testing.assert_allclose(grid * units, np.round(grid * units))
+    assert len(np.unique(grid, axis=0)) == len(grid)
+
+
+@pytest.mark.parametrize('n_models, step', [(0, 0.1), (2, 0.3), (2, 0.0)])
+def test_simplex_grid_rejects_invalid_arguments(n_models, step):
+    with pytest.raises((ValueError, ZeroDivisionError)):
+        simplex_grid(n_models, step)
+
+
+def test_optimize_weights_recovers_the_best_blend():
+    rng = np.random.default_rng(0)
+    y = rng.standard_normal(500)
+    # 两个模型的误差方差不同且独立，MSE最优权重约为 0.8 / 0.2
+    predictions = {'lstm': y + 0.5 * rng.standard_normal(500), 'xgb': y + 1.0 * rng.standard_normal(500)}
+    weights = optimize_weights(predictions, y, step=0.05)
+
+    assert weights.models == ['lstm', 'xgb']
+    assert weights.n_regimes == 1
+    assert weights.weights[0, 0] == pytest.approx(0.8, abs=0.1)
+
+    grid = simplex_grid(2, 0.05)
+    losses = [np.mean((np.column_stack([predictions['lstm'], predictions['xgb']]) @ w - y) ** 2) for w in grid]
+    assert weights.losses[0] == pytest.approx(min(losses))
+
+
+def test_optimize_weights_mae_picks_exact_model():
+    y = np.linspace(0, 1, 100)
+    weights = optimize_weights({'a': y + 1.0, 'b': y.copy()}, y, metric='mae')
+    np.testing.assert_allclose(weights.weights[0], [0.0, 1.0])
+
+
+def test_optimize_weights_per_regime():
+    rng = np.random.default_rng(1)
+    n, length = 400, 10
+    calm = rng.standard_normal((n // 2, length, 1)) * 0.1
+    volatile = rng.standard_normal((n // 2, length, 1)) * 5.0
+    X = np.concatenate([calm, volatile])
+    y = rng.standard_normal(n)
+    # 平稳行情中 a 准确，剧烈波动时 b 准确
+    a = np.where(np.arange(n) < n // 2, y, y + 3.0)
+    b = np.where(np.arange(n) < n // 2, y + 3.0, y)
+    weights = optimize_weights({'a': a, 'b': b}, y, X=X, n_regimes=2, min_regime_samples=10)
+
+    assert weights.n_regimes == 2
+    np.testing.assert_allclose(weights.weights, [[1.0, 0.0], [0.0, 1.0]])
+    regimes = weights.regimes(X)
+    assert (regimes[:n // 2] == 0).all() and (regimes[n // 2:] == 1).all()
+    np.testing.assert_allclose(weights.blend({'a': a, 'b': b}, X), y)
+
+
+def test_small_regimes_fall_back_to_global_weights():
+    rng = np.random.default_rng(2)
+    X = rng.standard_normal((60, 5, 1))
+    y = rng.standard_normal(60)
+    weights = optimize_weights({'a': y, 'b': y + 1.0}, y, X=X, n_regimes=3, min_regime_samples=100)
+    np.testing.assert_allclose(weights.weights, [[1.0, 0.0]] * 3)
+
+
+def test_optimize_weights_validates_inputs():
+    with pytest.raises(ValueError):
+        optimize_weights({'a': np.zeros(3)}, np.zeros(4))
+    with pytest.raises(ValueError):
+        optimize_weights({'a': np.zeros(3)}, np.zeros(3), metric='r2')
+    with pytest.raises(ValueError):
+        optimize_weights({'a': np.zeros(3), 'b': np.zeros(3)}, np.zeros(3), n_regimes=2)
+
+
+def test_ensemble_weights_round_trip():
+    weights = EnsembleWeights(['lstm', 'xgb'], np.array([[0.6, 0.4], [0.3, 0.7]]), thresholds=[0.5], losses=[1.0, 2.0])
+    restored = EnsembleWeights.from_dict(weights.to_dict())
+    np.testing.assert_array_equal(restored.weights, weights.weights)
+    np.testing.assert_array_equal(restored.thresholds, weights.thresholds)
+    assert restored.key() == weights.key()
+
+    with pytest.raises(ValueError):
+        EnsembleWeights(['lstm', 'xgb'], np.array([[0.6, 0.4]]), thresholds=[0.5])
+
+
+def test_regime_scores_use_differenced_volatility():
+    X = np.zeros((2, 4, 2))
+    # 单边趋势的一阶差分恒定，波动率为0；来回震荡的波动率为正
+    X[0, :, 0] = [0.0, 1.0, 2.0, 3.0]
+    X[1, :, 1] = [0.0, 1.0, 0.0, 1.0]
+    np.testing.assert_allclose(regime_scores(X), [0.0, 0.0])
+    scores = regime_scores(X, feature_index=1)
+    assert scores[0] == 0.0 and scores[1] > 0.9
+    with pytest.raises(ValueError):
+        regime_scores(X[0])
@@ -0,0 +1,107 @@
+import pytest
+
+from models.prediction_cache import PredictionCache, make_key
+
+FEATURES = ['open', 'close']
+
+
+def key(ts_code='000001.SZ', trade_date='20240102', bundle_hash='v1', weights=None):
+    return make_key(ts_code, trade_date, bundle_hash, FEATURES, weights)
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    cache = PredictionCache(max_size=10, disk_path=str(tmp_path / 'predictions.db'))
+    yield cache
+    cache.close()
+
+
+def test_make_key_includes_weights():
+    assert key(weights=[0.6, 0.4]) != key(weights=[0.5, 0.5])
+    assert key(weights=[0.6, 0.4]) == key(weights=(0.6, 0.4))
+    assert key()[-1] == ''
+
+
+def test_get_and_put():
+    cache = PredictionCache()
+    assert cache.get(key()) is None
+    cache.put(key(), {'ensemble': 1.5})
+    assert cache.get(key()) == {'ensemble': 1.5}
+    assert cache.stats() == {'size': 1, 'hits': 1, 'disk_hits': 0, 'misses': 1}
+
+
+def test_returned_values_are_copies():
+    cache = PredictionCache()
+    value = {'ensemble': 1.0}
+    cache.put(key(), value)
+    value['ensemble'] = 2.0
+    cache.get(key())['ensemble'] = 3.0
+    assert cache.get(key()) == {'ensemble': 1.0}
+
+
+def test_lru_eviction():
+    cache = PredictionCache(max_size=2)
+    a, b, c = key('A'), key('B'), key('C')
+    cache.put(a, {'ensemble': 1.0})
+    cache.put(b, {'ensemble': 2.0})
+    # 访问a后b成为最久未使用的条目
+    assert cache.get(a) is not None
+    cache.put(c, {'ensemble': 3.0})
+
+    assert len(cache) == 2
+    assert cache.get(b) is None
+    assert cache.get(a) == {'ensemble': 1.0}
+    assert cache.get(c) == {'ensemble': 3.0}
+
+
+def test_invalidate_by_bundle_and_symbol():
+    cache = PredictionCache()
+    cache.put_many({
+        key('A', bundle_hash='v1'): {'ensemble': 1.0},
+        key('B', bundle_hash='v1'): {'ensemble': 2.0},
+        key('A', bundle_hash='v2'): {'ensemble': 3.0}
+    })
+    assert cache.invalidate(bundle_hash='v1', ts_code='A') == 1
+    assert cache.get(key('A', bundle_hash='v1')) is None
+    assert cache.get(key('B', bundle_hash='v1')) is not None
+
+    assert cache.invalidate(bundle_hash='v1') == 1
+    assert cache.get(key('A', bundle_hash='v2')) == {'ensemble': 3.0}
+
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+
+
+def test_disk_layer_is_shared(disk_cache, tmp_path):
+    disk_cache.put(key(), {'ensemble': 1.5})
+
+    other = PredictionCache(disk_path=str(tmp_path / 'predictions.db'))
+    try:
+        assert other.get(key()) == {'ensemble': 1.5}
+        assert other.stats()['disk_hits'] == 1
+        # 读入后由内存层命中
+        assert other.get(key()) == {'ensemble': 1.5}
+        assert other.stats()['hits'] == 1
+    finally:
+        other.close()
+
+
+def test_disk_layer_survives_memory_eviction(disk_cache):
+    for i in range(15):
+        disk_cache.put(key(str(i)), {'ensemble': float(i)})
+    assert len(disk_cache) == 10
+    assert disk_cache.get(key('0')) == {'ensemble': 0.0}
+    assert disk_cache.stats()['disk_hits'] == 1
+
+
+def test_invalidate_clears_disk_layer(disk_cache, tmp_path):
+    disk_cache.put(key(bundle_hash='v1'), {'ensemble': 1.0})
+    disk_cache.put(key(bundle_hash='v2'), {'ensemble': 2.0})
+    disk_cache.invalidate(bundle_hash='v1')
+
+    other = PredictionCache(disk_path=str(tmp_path / 'predictions.db'))
+    try:
+        assert other.get(key(bundle_hash='v1')) is None
+        assert other.get(key(bundle_hash='v2')) == {'ensemble': 2.0}
+    finally:
+        other.close()
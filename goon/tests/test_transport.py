@@ -0,0 +1,209 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from data.transport import (
+    CircuitBreaker, CircuitOpenError, RetryPolicy, SingleFlight, Transport, CLOSED, OPEN, HALF_OPEN
+)
+
+
+class FakeBackend:
+    def __init__(self, errors=(), delay=0.0):
+        """依次抛出errors中的异常，之后返回固定的数据"""
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(self, api_name, **params):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if self.delay:
+            time.sleep(self.delay)
+        if error is not None:
+            raise error
+        return pd.DataFrame({'close': [1.0, 2.0]})
+
+
+def make_transport(backend, **kwargs):
+    kwargs.setdefault('retry', RetryPolicy(max_retries=3, backoff_base=0.0))
+    return Transport(backend, **kwargs)
+
+
+def test_retries_transient_errors():
+    backend = FakeBackend([ConnectionError(), TimeoutError()])
+    df = make_transport(backend).call('daily', ts_code='000001.SZ')
+    assert backend.calls == 3
+    assert list(df['close']) == [1.0, 2.0]
+
+
+def test_gives_up_after_max_retries():
+    backend = FakeBackend([ConnectionError()] * 10)
+    with pytest.raises(ConnectionError):
+        make_transport(backend, breaker=CircuitBreaker(failure_threshold=100)).call('daily')
+    assert backend.calls == 4
+
+
+def test_fatal_errors_are_not_retried():
+    backend = FakeBackend([ValueError('bad params')])
+    with pytest.raises(ValueError):
+        make_transport(backend).call('daily')
+    assert backend.calls == 1
+
+
+def test_fatal_errors_do_not_open_the_breaker():
+    backend = FakeBackend([ValueError()] * 5)
+    transport = make_transport(backend, breaker=CircuitBreaker(failure_threshold=3))
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            transport.call('daily')
+    assert transport.breaker.state == CLOSED
+    assert transport.call('daily') is not None
+
+
+def test_breaker_opens_and_rejects_calls():
+    backend = FakeBackend([ConnectionError()] * 3)
+    transport = make_transport(
+        backend,
+        retry=RetryPolicy(max_retries=0),
+        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    )
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            transport.call('daily')
+    assert transport.breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        transport.call('daily')
+    assert backend.calls == 3
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # 试探请求进行中，其他请求仍被拒绝
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_interrupted_probe_does_not_block_forever():
+    class InterruptingBackend:
+        def call(self, api_name, **params):
+            raise KeyboardInterrupt()
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(KeyboardInterrupt):
+        make_transport(InterruptingBackend(), breaker=breaker).call('daily')
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    # 超过reset_timeout后放行下一个试探请求
+    assert make_transport(FakeBackend(), breaker=breaker).call('daily') is not None
+    assert breaker.state == CLOSED
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    backend = FakeBackend(delay=0.2)
+    transport = make_transport(backend)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(transport.call('daily', ts_code='000001.SZ')))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert len(results) == 4
+    # 每个调用方（包括发起者）都拿到独立的副本
+    assert len({id(df) for df in results}) == 4
+    results[0]['close'] = 0.0
+    assert all(list(df['close']) == [1.0, 2.0] for df in results[1:])
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError('down')
+
+    def follower():
+        started.wait()
+        try:
+            flight.do('key', lambda: pytest.fail('follower should not run'))
+        except ConnectionError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    with pytest.raises(ConnectionError):
+        flight.do('key', failing)
+    thread.join()
+    assert len(errors) == 1
+
+
+def test_single_flight_uncoalesced_result_is_not_copied():
+    flight = SingleFlight()
+    value = object()
+    result, coalesced = flight.do('key', lambda: value, copy=lambda v: object())
+    assert result is value
+    assert not coalesced
+
+
+def test_different_params_are_not_coalesced():
+    backend = FakeBackend(delay=0.1)
+    transport = make_transport(backend)
+    threads = [
+        threading.Thread(target=transport.call, args=('daily',), kwargs={'ts_code': code})
+        for code in ('000001.SZ', '000002.SZ')
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.calls == 2
+
+
+def test_rate_limiter_view_shares_breaker():
+    class CountingLimiter:
+        acquired = 0
+
+        def acquire(self, tokens=1):
+            self.acquired += tokens
+
+    backend = FakeBackend([ConnectionError()])
+    transport = make_transport(backend)
+    limiter = CountingLimiter()
+    view = transport.with_rate_limiter(limiter)
+
+    view.call('daily')
+    assert transport.rate_limiter is None
+    assert view.breaker is transport.breaker
+    # 每次实际请求（包括重试）都取令牌
+    assert limiter.acquired == 2
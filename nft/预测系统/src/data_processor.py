@@ -1,37 +1,75 @@
+import copy
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 import tushare as ts
 import akshare as ak
 from datetime import datetime, timedelta
+from windowing import build_sequences
+from dtypes import as_float, cast_frame, check_float_dtype
+from ohlcv_cache import OHLCVCache
+from market_data import (
+    OHLCV_COLUMNS, TUSHARE_FIELDS, normalize_tushare, normalize_akshare, merge_sources, fetch_concurrently
+)
 
 class DataProcessor:
-    def __init__(self, token):
+    def __init__(self, token, cache_dir=None):
         self.token = token
         ts.set_token(token)
         self.pro = ts.pro_api()
         self.scaler = MinMaxScaler()
+        self.cache = OHLCVCache(cache_dir) if cache_dir else None
+    
+    def copy(self):
+        """返回共享数据源连接和行情缓存、但归一化参数独立的副本"""
+        clone = copy.copy(self)
+        clone.scaler = copy.deepcopy(self.scaler)
+        return clone
+    
+    def _get_daily(self, stock_code, start_date, end_date):
+        """获取日线行情（只请求模型用到的字段），配置了缓存时只从API补充缺失的日期区间"""
+        fields = ','.join(TUSHARE_FIELDS)
+        if self.cache is None:
+            return self.pro.daily(ts_code=stock_code, start_date=start_date, end_date=end_date,
+                                  fields=fields)
+        
+        for gap_start, gap_end in self.cache.missing_ranges(stock_code, start_date, end_date):
+            gap_df = self.pro.daily(ts_code=stock_code, start_date=gap_start, end_date=gap_end,
+                                    fields=fields)
+            self.cache.write(stock_code, gap_df, gap_start, gap_end)
+        return self.cache.read(stock_code, start_date, end_date, columns=OHLCV_COLUMNS)
+    
+    def _get_akshare_daily(self, stock_code, start_date, end_date):
+        """从AkShare获取日线行情
+        
+        使用不复权数据，与Tushare的daily接口口径一致，两者才能逐日互相补齐
+        """
+        return ak.stock_zh_a_hist(symbol=stock_code.split('.')[0], period='daily',
+                                  start_date=start_date, end_date=end_date, adjust='')
     
     def get_stock_data(self, stock_code, start_date, end_date):
-        """获取股票历史数据"""
+        """获取股票历史数据
+        
+        同时请求Tushare和AkShare，按trade_date合并：以Tushare为准，缺失的日期和字段用AkShare补齐；
+        其中一个数据源失败时只使用另一个
+        """
         try:
-            # 使用tushare获取基础行情数据
-            df = self.pro.daily(ts_code=stock_code, start_date=start_date, end_date=end_date)
-            
-            # 使用akshare获取技术指标数据
-            stock_code_ak = stock_code.split('.')[0]
-            tech_df = ak.stock_zh_a_hist(symbol=stock_code_ak, period='daily',
-                                        start_date=start_date, end_date=end_date,
-                                        adjust='qfq')
+            frames, errors = fetch_concurrently({
+                'tushare': lambda: normalize_tushare(self._get_daily(stock_code, start_date, end_date)),
+                'akshare': lambda: normalize_akshare(self._get_akshare_daily(stock_code, start_date, end_date))
+            })
+            for name, error in errors.items():
+                print(f"从{name}获取数据失败: {error}")
+            if not frames:
+                return None
             
             # 合并数据
-            df = df.sort_values('trade_date')
-            tech_df = tech_df.sort_values('日期')
+            df = merge_sources([frames[name] for name in ('tushare', 'akshare') if name in frames])
             
             # 添加技术指标
             df = self._add_technical_indicators(df)
             
-            return df
+            return cast_frame(df)
         except Exception as e:
             print(f"获取数据时出错: {e}")
             return None
@@ -61,8 +99,11 @@ class DataProcessor:
         
         return df
     
-    def prepare_data(self, df, sequence_length=10):
-        """准备模型训练数据"""
+    def prepare_data(self, df, sequence_length=10, fit_scaler=True):
+        """准备模型训练数据
+
+        fit_scaler为False时沿用已拟合的归一化参数（只做transform），用于推理
+        """
         # 选择特征
         features = ['open', 'high', 'low', 'close', 'vol', 
                    'MA5', 'MA10', 'MA20', 'MACD', 'Signal', 'RSI', 'Volatility']
@@ -71,18 +112,16 @@ class DataProcessor:
         df = df.dropna()
         
         # 准备特征数据
-        X = df[features].values
-        y = df['close'].values
+        X = as_float(df[features].to_numpy())
+        y = as_float(df['close'].to_numpy())
         
         # 数据标准化
-        X_scaled = self.scaler.fit_transform(X)
-        
-        # 创建序列数据
-        X_sequences = []
-        y_sequences = []
-        
-        for i in range(len(X_scaled) - sequence_length):
-            X_sequences.append(X_scaled[i:(i + sequence_length)])
-            y_sequences.append(y[i + sequence_length])
+        if fit_scaler:
+            X_scaled = self.scaler.fit_transform(X)
+        else:
+            X_scaled = self.scaler.transform(X)
+        # 按行连续存储，每个窗口在内存中是连续的一段，展平给XGBoost时无需复制
+        X_scaled = np.ascontiguousarray(check_float_dtype(X_scaled, 'X'))
         
-        return np.array(X_sequences), np.array(y_sequences)
\ No newline at end of file
+        # 创建序列数据（滑动窗口视图，不复制数据）
+        return build_sequences(X_scaled, y, sequence_length)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务在检查点处发现已被取消"""
+
+
+class Job:
+    def __init__(self, key, description=''):
+        """后台任务的状态，由工作线程更新，页面脚本只读取"""
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.description = description
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = '排队中'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """请求取消，任务在下一个检查点停止"""
+        self._cancel_event.set()
+
+    def report(self, progress, message=None):
+        """更新进度，同时作为取消检查点：已请求取消时抛出 JobCancelled"""
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobRunner:
+    def __init__(self, max_workers=2, cache_size=32, job_ttl=3600, resource_size=8):
+        """在线程池中执行训练/交叉验证任务，并按参数缓存结果
+
+        同一参数的任务正在执行时再次提交会直接返回该任务，多个用户共享同一个实例。
+
+        Args:
+            max_workers: 同时执行的任务数
+            cache_size: 最多缓存的结果数，按LRU淘汰
+            job_ttl: 已结束的任务保留的秒数，超过后连同其结果一起丢弃（结果仍可能留在缓存中）；
+                放回后超过这个时间没有再取出的模型资源同样丢弃
+            resource_size: 最多保留的模型资源数（训练好的模型和归一化参数），按LRU淘汰
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.cache_size = cache_size
+        self.job_ttl = job_ttl
+        self.resource_size = resource_size
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._results = OrderedDict()
+        # key -> (放回时间, 资源)，按放回顺序排列
+        self._resources = OrderedDict()
+
+    def submit(self, key, func, *args, description='', **kwargs):
+        """提交任务，func的第一个参数为Job，用于报告进度和检查取消
+
+        已有相同key的缓存结果时返回一个已完成的任务，不会重新计算。
+        """
+        with self._lock:
+            self._prune()
+            active = self._active.get(key)
+            if active is not None and not active.finished:
+                return active
+
+            job = Job(key, description)
+            self._jobs[job.id] = job
+            if key in self._results:
+                self._results.move_to_end(key)
+                job.result = self._results[key]
+                job.status = DONE
+                job.progress = 1.0
+                job.message = '使用缓存结果'
+                job.started_at = job.finished_at = time.time()
+                return job
+
+            self._active[key] = job
+
+        self.executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _run(self, job, func, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.check_cancelled()
+            result = func(job, *args, **kwargs)
+            job.check_cancelled()
+        except JobCancelled:
+            job.status = CANCELLED
+            job.message = '已取消'
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            job.message = f'失败：{e}'
+        else:
+            with self._lock:
+                self._results[job.key] = result
+                self._results.move_to_end(job.key)
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            job.result = result
+            job.progress = 1.0
+            job.message = '完成'
+            job.status = DONE
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+
+    def _prune(self):
+        """丢弃结束超过 job_ttl 秒的任务和闲置超过 job_ttl 秒的资源，调用方需持有锁"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+        while self._resources and next(iter(self._resources.values()))[0] < cutoff:
+            self._resources.popitem(last=False)
+
+    def get(self, job_id):
+        """按id查找任务，已过期或不存在时返回None"""
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cached(self, key):
+        """返回缓存的结果，没有时返回None"""
+        with self._lock:
+            return self._results.get(key)
+
+    def invalidate(self, key=None):
+        """清除结果缓存，key为None时清除全部"""
+        with self._lock:
+            if key is None:
+                self._results.clear()
+            else:
+                self._results.pop(key, None)
+
+    def checkout(self, key):
+        """取出共享的模型等资源，取出期间其他任务拿不到，用完后通过 checkin 放回"""
+        with self._lock:
+            self._prune()
+            entry = self._resources.pop(key, None)
+            return entry[1] if entry is not None else None
+
+    def checkin(self, key, resource):
+        """放回资源，超过 resource_size 时淘汰最久没有使用的资源"""
+        with self._lock:
+            self._resources.pop(key, None)
+            self._resources[key] = (time.time(), resource)
+            while len(self._resources) > self.resource_size:
+                self._resources.popitem(last=False)
+
+
+def keras_progress_callback(job, start, end, epochs, label='训练LSTM'):
+    """把Keras训练的epoch进度映射到任务进度的 [start, end] 区间，任务被取消时停止训练"""
+    import tensorflow as tf
+
+    class _JobProgress(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            job.progress = start + (end - start) * (epoch + 1) / epochs
+            job.message = f'{label}（{epoch + 1}/{epochs}）'
+            if job.cancel_requested:
+                self.model.stop_training = True
+
+    return _JobProgress()
@@ -1,16 +1,34 @@
 import os
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from data_processor import DataProcessor
-from models.model_trainer import ModelTrainer
+from models.model_trainer import ModelTrainer, REGIME_FEATURE
+from models.ensemble import optimize_weights, regime_scores
+from job_runner import JobRunner, PENDING, RUNNING, FAILED, CANCELLED, keras_progress_callback
 import streamlit as st
 import plotly.graph_objects as go
 
 # 加载环境变量
 load_dotenv()
 TUSHARE_TOKEN = os.getenv('TUSHARE_TOKEN')
+OHLCV_CACHE_DIR = os.getenv('OHLCV_CACHE_DIR')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# 完整训练和增量更新时LSTM的训练轮数
+TRAIN_EPOCHS = 50
+UPDATE_EPOCHS = 5
+
+# 兼容较旧的Streamlit版本
+_cache_resource = getattr(st, 'cache_resource', None) or st.experimental_singleton
+_rerun = getattr(st, 'rerun', None) or st.experimental_rerun
+
+
+@_cache_resource
+def get_job_runner():
+    """所有会话共享同一个后台任务执行器和结果缓存"""
+    return JobRunner(max_workers=JOB_WORKERS)
 
 def plot_predictions(dates, actual, predicted, stock_code):
     """绘制预测结果图表"""
@@ -44,8 +62,185 @@ def plot_predictions(dates, actual, predicted, stock_code):
     
     return fig
 
+def run_prediction_job(job, runner, stock_code, start_date, end_date, sequence_length,
+                       cv_warm_start, incremental):
+    """后台任务：获取数据、训练（或增量更新）模型、预测测试集并交叉验证
+    
+    返回的结果只包含预测值和指标，各模型的预测（包括交叉验证的样本外预测）分别保存，
+    调整或重新优化集成权重时无需重新计算。
+    """
+    model_key = (stock_code, sequence_length)
+    # 增量更新时取出已训练的模型和归一化参数，取出期间其他任务会重新训练而不是并发修改同一个模型
+    cached = runner.checkout(model_key) if incremental else None
+    try:
+        result, resource = _prediction_job(job, stock_code, start_date, end_date, sequence_length,
+                                           cv_warm_start, _working_copy(cached))
+    except BaseException:
+        # 任务只修改副本，失败或取消时放回未改动的原资源，不会留下训练到一半的模型
+        if cached is not None:
+            runner.checkin(model_key, cached)
+        raise
+    # 成功时放回更新后的资源，放回后本任务不再使用其中的模型
+    runner.checkin(model_key, resource)
+    return result
+
+def _working_copy(cached):
+    """复制取出的资源供任务修改，未取出资源时返回None"""
+    if cached is None:
+        return None
+    return {
+        'data_processor': cached['data_processor'].copy(),
+        'model_trainer': cached['model_trainer'].copy(),
+        'last_date': cached['last_date']
+    }
+
+def _prediction_job(job, stock_code, start_date, end_date, sequence_length, cv_warm_start, cached):
+    """run_prediction_job 的主体，返回 (任务结果, 需要放回执行器的模型资源)"""
+    if cached is not None:
+        data_processor = cached['data_processor']
+        model_trainer = cached['model_trainer']
+    else:
+        data_processor = DataProcessor(TUSHARE_TOKEN, cache_dir=OHLCV_CACHE_DIR)
+        model_trainer = ModelTrainer()
+    
+    # 获取数据
+    job.report(0.0, '正在获取数据...')
+    df = data_processor.get_stock_data(stock_code, start_date, end_date)
+    if df is None or len(df) == 0:
+        raise ValueError('获取数据失败，请检查股票代码和日期范围')
+    
+    # 准备数据
+    X, y = data_processor.prepare_data(df, sequence_length, fit_scaler=cached is None)
+    target_dates = df.dropna()['trade_date'].values[sequence_length:]
+    
+    # 划分训练集和测试集
+    train_size = int(len(X) * 0.8)
+    X_train, X_test = X[:train_size], X[train_size:]
+    y_train, y_test = y[:train_size], y[train_size:]
+    
+    # 训练模型
+    job.report(0.05, '正在训练模型...')
+    notice = None
+    if cached is None:
+        model_trainer.train_models(X_train, y_train, epochs=TRAIN_EPOCHS,
+                                   callbacks=[keras_progress_callback(job, 0.05, 0.5, TRAIN_EPOCHS)])
+    else:
+        # 只用上次训练之后新到达的样本更新模型，漂移或误差过大时才完整重训
+        new_mask = target_dates[:train_size] > cached['last_date']
+        if new_mask.any():
+            decision = model_trainer.update_decision(X_train[new_mask], y_train[new_mask])
+            if decision.full_retrain:
+                # 分布已漂移，旧的归一化参数同样过时：重新拟合后在新缩放的窗口上完整重训
+                X, y = data_processor.prepare_data(df, sequence_length, fit_scaler=True)
+                X_train, X_test = X[:train_size], X[train_size:]
+                y_train, y_test = y[:train_size], y[train_size:]
+                model_trainer.train_models(X_train, y_train, epochs=TRAIN_EPOCHS,
+                                           callbacks=[keras_progress_callback(job, 0.05, 0.5, TRAIN_EPOCHS)])
+                notice = f"已完整重训：{'；'.join(decision.reasons)}"
+            else:
+                model_trainer.incremental_update(
+                    X_train[new_mask], y_train[new_mask], epochs=UPDATE_EPOCHS, decision=decision,
+                    callbacks=[keras_progress_callback(job, 0.05, 0.5, UPDATE_EPOCHS)]
+                )
+                notice = f"已增量更新 {int(new_mask.sum())} 个新样本"
+        else:
+            notice = '没有新数据，沿用已训练的模型'
+    job.check_cancelled()
+    
+    # 预测
+    job.report(0.55, '正在预测...')
+    lstm_pred, xgb_pred = model_trainer.predict_components(X_test)
+    
+    # 交叉验证只使用训练段，样本外预测和据此优化的集成权重都不会接触测试段
+    job.report(0.6, '正在进行交叉验证...')
+    cv_result = model_trainer.cross_validate(
+        X_train, y_train,
+        n_jobs=min(5, os.cpu_count() or 1),
+        warm_start=cv_warm_start,
+        return_details=True,
+        progress=lambda done, total: job.report(0.6 + 0.4 * done / total, f'交叉验证（{done}/{total}）')
+    )
+    # 在样本外预测上优化的集成权重随模型一起保存，增量更新时继续使用
+    model_trainer.fit_ensemble_weights(cv_result, X_train)
+    
+    resource = {
+        'data_processor': data_processor,
+        'model_trainer': model_trainer,
+        'last_date': target_dates[train_size - 1]
+    }
+    return {
+        'stock_code': stock_code,
+        'test_dates': target_dates[train_size:],
+        'y_test': y_test,
+        'lstm_pred': lstm_pred,
+        'xgb_pred': xgb_pred,
+        'cv_result': cv_result,
+        'oof_scores': regime_scores(X_train[cv_result['oof']['index']], REGIME_FEATURE),
+        'test_scores': regime_scores(X_test, REGIME_FEATURE),
+        'notice': notice
+    }, resource
+
+def show_result(result, ensemble_weights, n_regimes=1):
+    """展示任务结果，集成预测由缓存的各模型预测按当前权重组合
+    
+    ensemble_weights 为None时在交叉验证的样本外预测上重新搜索权重（n_regimes 个行情状态各自一组），
+    只使用缓存的预测，不重新训练或推理
+    """
+    if result['notice']:
+        st.info(result['notice'])
+    
+    y_test = result['y_test']
+    if ensemble_weights is None:
+        oof = result['cv_result']['oof']
+        weights = optimize_weights({'lstm': oof['lstm'], 'xgb': oof['xgb']}, oof['y'],
+                                   scores=result['oof_scores'], n_regimes=n_regimes, feature_index=REGIME_FEATURE)
+        y_pred = weights.blend({'lstm': result['lstm_pred'], 'xgb': result['xgb_pred']}, scores=result['test_scores'])
+        st.caption('自动优化的集成权重（LSTM / XGBoost）：' + '；'.join(
+            f"状态{i + 1}: {row[0]:.2f} / {row[1]:.2f}" for i, row in enumerate(weights.weights)
+        ))
+    else:
+        y_pred = ensemble_weights * result['lstm_pred'] + (1 - ensemble_weights) * result['xgb_pred']
+    
+    # 评估模型
+    metrics = ModelTrainer().evaluate(y_test, y_pred)
+    
+    # 显示评估指标
+    st.subheader('模型评估指标')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('MSE', f"{metrics['mse']:.4f}")
+    col2.metric('RMSE', f"{metrics['rmse']:.4f}")
+    col3.metric('MAE', f"{metrics['mae']:.4f}")
+    col4.metric('R²', f"{metrics['r2']:.4f}")
+    
+    # 绘制预测结果
+    fig = plot_predictions(result['test_dates'], y_test, y_pred, result['stock_code'])
+    st.plotly_chart(fig)
+    
+    cv_result = result['cv_result']
+    cv_scores = cv_result['mean_scores']
+        
+    st.subheader('交叉验证结果')
+    st.write('平均评估指标：')
+    st.json({
+        key: f"{value:.4f}"
+        for key, value in cv_scores.items()
+    })
+    st.write(f"各折结果（总耗时 {cv_result['elapsed']:.1f} 秒）：")
+    st.dataframe(pd.DataFrame([
+        {
+            '折': fold['fold'] + 1,
+            '训练样本数': fold['train_size'],
+            '验证样本数': fold['val_size'],
+            **fold['metrics'],
+            '训练耗时(秒)': fold['train_time'],
+            '预测耗时(秒)': fold['predict_time']
+        }
+        for fold in cv_result['folds']
+    ]))
+
 def main():
     st.title('股票价格预测系统')
+    runner = get_job_runner()
     
     # 侧边栏配置
     st.sidebar.header('参数设置')
@@ -59,72 +254,48 @@ def main():
     
     # 模型参数
     sequence_length = st.sidebar.slider('序列长度', 5, 30, 10)
-    ensemble_weights = st.sidebar.slider('LSTM权重', 0.0, 1.0, 0.6)
+    auto_weights = st.sidebar.checkbox('自动优化集成权重（基于交叉验证样本外预测）', True)
+    if auto_weights:
+        ensemble_weights = None
+        n_regimes = st.sidebar.slider('行情状态数（按窗口波动率划分，各自一组权重）', 1, 3, 1)
+    else:
+        ensemble_weights = st.sidebar.slider('LSTM权重', 0.0, 1.0, 0.6)
+        n_regimes = 1
+    cv_warm_start = st.sidebar.checkbox('交叉验证热启动（更快，各折在前一折模型上继续训练）', False)
+    incremental = st.sidebar.checkbox('增量更新（复用已训练的该股票模型）', True)
     
     if st.sidebar.button('开始预测'):
-        try:
-            # 初始化数据处理器和模型训练器
-            data_processor = DataProcessor(TUSHARE_TOKEN)
-            model_trainer = ModelTrainer()
-            
-            # 获取数据
-            df = data_processor.get_stock_data(
-                stock_code,
-                start_date.strftime('%Y%m%d'),
-                end_date.strftime('%Y%m%d')
-            )
-            
-            if df is None or len(df) == 0:
-                st.error('获取数据失败，请检查股票代码和日期范围')
-                return
-            
-            # 准备数据
-            X, y = data_processor.prepare_data(df, sequence_length)
-            
-            # 划分训练集和测试集
-            train_size = int(len(X) * 0.8)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y[:train_size], y[train_size:]
-            
-            # 训练模型
-            with st.spinner('正在训练模型...'):
-                model_trainer.train_models(X_train, y_train)
-            
-            # 预测
-            y_pred = model_trainer.predict(
-                X_test,
-                ensemble_weights=(ensemble_weights, 1-ensemble_weights)
-            )
-            
-            # 评估模型
-            metrics = model_trainer.evaluate(y_test, y_pred)
-            
-            # 显示评估指标
-            st.subheader('模型评估指标')
-            col1, col2, col3, col4 = st.columns(4)
-            col1.metric('MSE', f"{metrics['mse']:.4f}")
-            col2.metric('RMSE', f"{metrics['rmse']:.4f}")
-            col3.metric('MAE', f"{metrics['mae']:.4f}")
-            col4.metric('R²', f"{metrics['r2']:.4f}")
-            
-            # 绘制预测结果
-            test_dates = df['trade_date'].values[train_size+sequence_length:]
-            fig = plot_predictions(test_dates, y_test, y_pred, stock_code)
-            st.plotly_chart(fig)
-            
-            # 交叉验证
-            with st.spinner('正在进行交叉验证...'):
-                cv_scores = model_trainer.cross_validate(X, y)
-                
-            st.subheader('交叉验证结果')
-            st.write('平均评估指标：')
-            st.json({
-                key: f"{value:.4f}"
-                for key, value in cv_scores.items()
-            })
-            
-        except Exception as e:
-            st.error(f'发生错误: {str(e)}')
+        params = (
+            stock_code,
+            start_date.strftime('%Y%m%d'),
+            end_date.strftime('%Y%m%d'),
+            sequence_length,
+            cv_warm_start,
+            incremental
+        )
+        # 集成权重不影响训练，不计入缓存键；相同参数的结果直接复用
+        job = runner.submit(params, run_prediction_job, runner, *params,
+                            description=f'{stock_code} {params[1]}-{params[2]}')
+        st.session_state['job_id'] = job.id
+    
+    job = runner.get(st.session_state.get('job_id'))
+    if job is None:
+        return
+    
+    if job.status in (PENDING, RUNNING):
+        st.write(f'任务：{job.description}')
+        st.progress(job.progress)
+        st.caption(f'{job.message}（已运行 {job.elapsed:.0f} 秒）')
+        if st.button('取消任务', disabled=job.cancel_requested):
+            job.cancel()
+        time.sleep(1)
+        _rerun()
+    elif job.status == FAILED:
+        st.error(f'发生错误: {job.error}')
+    elif job.status == CANCELLED:
+        st.warning('任务已取消')
+    else:
+        show_result(job.result, ensemble_weights, n_regimes)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+# 模型只用到这些行情字段，各数据源只请求（或只保留）这些列
+OHLCV_COLUMNS = ['trade_date', 'open', 'high', 'low', 'close', 'vol']
+TUSHARE_FIELDS = ['ts_code'] + OHLCV_COLUMNS
+
+# AkShare的中文列名到Tushare列名的映射，两者的成交量单位都是手
+AKSHARE_COLUMNS = {
+    '日期': 'trade_date',
+    '开盘': 'open',
+    '最高': 'high',
+    '最低': 'low',
+    '收盘': 'close',
+    '成交量': 'vol'
+}
+
+
+def normalize_tushare(df: pd.DataFrame) -> pd.DataFrame:
+    """Tushare日线数据：只保留行情字段，trade_date为YYYYMMDD字符串"""
+    df = df[OHLCV_COLUMNS].copy()
+    df['trade_date'] = df['trade_date'].astype(str)
+    return df
+
+
+def normalize_akshare(df: pd.DataFrame) -> pd.DataFrame:
+    """AkShare日线数据：列名转换为Tushare的列名，日期转换为YYYYMMDD字符串"""
+    df = df[list(AKSHARE_COLUMNS)].rename(columns=AKSHARE_COLUMNS)
+    df['trade_date'] = pd.to_datetime(df['trade_date']).dt.strftime('%Y%m%d')
+    return df
+
+
+def merge_sources(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """按trade_date合并多个数据源，靠前的数据源优先，缺失的日期和字段由后面的数据源补齐
+
+    Args:
+        frames (List[pd.DataFrame]): 已规范化的数据，按优先级排列
+
+    Returns:
+        pd.DataFrame: 按trade_date升序排列的合并结果
+    """
+    merged = None
+    for df in frames:
+        df = df.drop_duplicates('trade_date', keep='last').set_index('trade_date')
+        merged = df if merged is None else merged.combine_first(df)
+    if merged is None:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    return merged.sort_index().reset_index()[OHLCV_COLUMNS]
+
+
+def fetch_concurrently(
+    fetchers: Dict[str, Callable[[], pd.DataFrame]]
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]:
+    """同时请求多个数据源，单个数据源失败不影响其他数据源
+
+    Args:
+        fetchers (Dict[str, Callable[[], pd.DataFrame]]): 数据源名称到请求函数的映射
+
+    Returns:
+        Tuple[Dict[str, pd.DataFrame], Dict[str, Exception]]: (成功的结果, 失败的异常)
+    """
+    frames, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+        futures = {name: executor.submit(fetch) for name, fetch in fetchers.items()}
+        for name, future in futures.items():
+            try:
+                df = future.result()
+            except Exception as e:
+                errors[name] = e
+                continue
+            if df is None or len(df) == 0:
+                errors[name] = ValueError('返回数据为空')
+            else:
+                frames[name] = df
+    return frames, errors
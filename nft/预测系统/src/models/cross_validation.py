@@ -0,0 +1,152 @@
+import os
+import time
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.model_selection import TimeSeriesSplit
+
+THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+    'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'
+)
+
+
+def _init_worker(n_threads):
+    """限制子进程内TensorFlow/XGBoost/BLAS的线程数，避免多个进程互相抢占CPU"""
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _fit_and_score(trainer, fold, X_train, y_train, X_val, y_val, ensemble_weights, warm):
+    """在一个折上训练（或继续训练）并评估，返回该折的结果"""
+    start = time.perf_counter()
+    if warm:
+        trainer.update_models(X_train, y_train)
+    else:
+        trainer.train_models(X_train, y_train)
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lstm_pred, xgb_pred = trainer.predict_components(X_val)
+    y_pred = trainer.blend(lstm_pred, xgb_pred, ensemble_weights, X_val)
+    predict_time = time.perf_counter() - start
+
+    return {
+        'fold': fold,
+        'train_size': len(X_train),
+        'val_size': len(X_val),
+        'warm_start': warm,
+        'metrics': trainer.evaluate(y_val, y_pred),
+        'train_time': train_time,
+        'predict_time': predict_time,
+        'predictions': {'lstm': lstm_pred, 'xgb': xgb_pred}
+    }
+
+
+def _run_fold(fold, X_train, y_train, X_val, y_val, ensemble_weights, model_params=None):
+    """子进程入口：用独立的ModelTrainer从头训练一个折"""
+    from models.model_trainer import ModelTrainer
+    return _fit_and_score(ModelTrainer(**(model_params or {})), fold, X_train, y_train, X_val, y_val, ensemble_weights, False)
+
+
+def _run_warm_start(folds, X, y, ensemble_weights, progress=None, model_params=None):
+    """热启动模式：后一个折在前一个折的模型上继续训练，因此折之间必须顺序执行"""
+    from models.model_trainer import ModelTrainer
+    trainer = ModelTrainer(**(model_params or {}))
+    results = []
+    for fold, (train_idx, val_idx) in enumerate(folds):
+        results.append(_fit_and_score(
+            trainer, fold, X[train_idx], y[train_idx], X[val_idx], y[val_idx],
+            ensemble_weights, warm=fold > 0
+        ))
+        if progress is not None:
+            progress(len(results), len(folds))
+    return results
+
+
+def run_cross_validation(X, y, n_splits=5, n_jobs=1, warm_start=False,
+                         threads_per_worker=None, ensemble_weights=(0.6, 0.4), progress=None,
+                         model_params=None):
+    """时间序列交叉验证
+
+    每个折使用独立的ModelTrainer(**model_params)，不会修改调用方训练器的状态。
+    n_jobs > 1 时各折在进程池中并行训练，每个进程的线程数限制为 threads_per_worker；
+    warm_start=True 时第一个折从头训练，之后每个扩展窗口折在前一折模型的基础上继续训练。
+    progress(已完成折数, 总折数) 在每个折完成后于调用方进程中调用，可以抛出异常来中止。
+
+    Returns:
+        dict: folds为每折的指标和耗时，mean_scores为各指标的平均值，elapsed为总耗时，
+            oof为各验证集上每个模型的样本外预测（index为样本在X中的位置，y为真实值），
+            可直接用于 models.ensemble.optimize_weights 搜索集成权重
+    """
+    start = time.perf_counter()
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+
+    if warm_start:
+        # 热启动的折之间存在依赖，在单独的进程中顺序执行以同样限制线程数
+        if n_jobs > 1:
+            threads = threads_per_worker or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context('spawn'),
+                                     initializer=_init_worker, initargs=(threads,)) as executor:
+                fold_results = executor.submit(_run_warm_start, folds, X, y, ensemble_weights,
+                                               model_params=model_params).result()
+            if progress is not None:
+                progress(len(folds), len(folds))
+        else:
+            fold_results = _run_warm_start(folds, X, y, ensemble_weights, progress, model_params)
+    elif n_jobs > 1:
+        n_jobs = min(n_jobs, n_splits)
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // n_jobs)
+        # TensorFlow在fork后不安全，使用spawn启动子进程
+        executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp.get_context('spawn'),
+                                       initializer=_init_worker, initargs=(threads,))
+        try:
+            futures = [
+                executor.submit(_run_fold, fold, X[train_idx], y[train_idx],
+                                X[val_idx], y[val_idx], ensemble_weights, model_params)
+                for fold, (train_idx, val_idx) in enumerate(folds)
+            ]
+            fold_results = []
+            for future in as_completed(futures):
+                fold_results.append(future.result())
+                if progress is not None:
+                    progress(len(fold_results), len(folds))
+        except BaseException:
+            # 取消尚未开始的折并立即返回，不等待正在运行的折训练完
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        fold_results.sort(key=lambda result: result['fold'])
+    else:
+        from models.model_trainer import ModelTrainer
+        fold_results = []
+        for fold, (train_idx, val_idx) in enumerate(folds):
+            fold_results.append(_fit_and_score(ModelTrainer(**(model_params or {})), fold, X[train_idx], y[train_idx],
+                                               X[val_idx], y[val_idx], ensemble_weights, False))
+            if progress is not None:
+                progress(len(fold_results), len(folds))
+
+    # 各折的验证集互不重叠，按样本位置拼接成样本外预测
+    predictions = [result.pop('predictions') for result in fold_results]
+    oof_index = np.concatenate([folds[result['fold']][1] for result in fold_results])
+    oof = {'index': oof_index, 'y': np.asarray(y)[oof_index]}
+    for name in predictions[0]:
+        oof[name] = np.concatenate([fold_predictions[name] for fold_predictions in predictions])
+
+    mean_scores = {
+        metric: float(np.mean([result['metrics'][metric] for result in fold_results]))
+        for metric in fold_results[0]['metrics']
+    }
+
+    return {
+        'folds': fold_results,
+        'mean_scores': mean_scores,
+        'oof': oof,
+        'elapsed': time.perf_counter() - start
+    }
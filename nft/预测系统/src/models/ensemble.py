@@ -0,0 +1,213 @@
+import numpy as np
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence
+
+# 没有学习到的权重时使用的LSTM/XGBoost集成权重
+DEFAULT_WEIGHTS = (0.6, 0.4)
+ENSEMBLE_METRICS = ('mse', 'mae')
+
+
+def simplex_grid(n_models: int, step: float = 0.05) -> np.ndarray:
+    """枚举所有非负、和为1且以step为间隔的权重组合
+
+    Args:
+        n_models (int): 模型数
+        step (float): 权重间隔，1 / step 必须为整数
+
+    Returns:
+        np.ndarray: 形状为 (组合数, n_models)，组合数为 C(1 / step + n_models - 1, n_models - 1)
+    """
+    if n_models < 1:
+        raise ValueError("模型数必须为正整数")
+    units = int(round(1 / step))
+    if units < 1 or not np.isclose(units * step, 1.0):
+        raise ValueError(f"1 / step 必须为正整数，当前step为{step}")
+
+    # 隔板法：在 units + n_models - 1 个位置中选 n_models - 1 个隔板，相邻隔板之间的空位数即为各模型的份数
+    bars = list(combinations(range(units + n_models - 1), n_models - 1))
+    bars = np.array(bars, dtype=np.int64).reshape(len(bars), n_models - 1)
+    edges = np.column_stack([
+        np.full(len(bars), -1), bars, np.full(len(bars), units + n_models - 1)
+    ])
+    return (np.diff(edges, axis=1) - 1) / units
+
+
+def regime_scores(X: np.ndarray, feature_index: int = 0) -> np.ndarray:
+    """每个窗口内某个特征一阶差分的标准差，作为划分行情状态（波动率高低）的依据
+
+    Args:
+        X (np.ndarray): 窗口数据，形状为 (样本, 序列, 特征)
+        feature_index (int): 使用的特征列
+
+    Returns:
+        np.ndarray: 形状为 (样本,)
+    """
+    if X.ndim != 3:
+        raise ValueError(f"窗口数据必须是三维数组，当前维度：{X.ndim}")
+    return np.diff(np.asarray(X[:, :, feature_index], dtype=np.float64), axis=1).std(axis=1)
+
+
+def _grid_losses(P: np.ndarray, y: np.ndarray, grid: np.ndarray, metric: str, chunk_size: int = 256) -> np.ndarray:
+    """所有权重组合在 (P, y) 上的误差，形状为 (组合数,)"""
+    if metric == 'mse':
+        # 平方误差只依赖 P^T P、P^T y 和 y^T y，无需计算每个组合的集成结果
+        gram, cross = P.T @ P, P.T @ y
+        return (np.einsum('gi,ij,gj->g', grid, gram, grid) - 2 * grid @ cross + y @ y) / len(y)
+    losses = np.empty(len(grid))
+    for start in range(0, len(grid), chunk_size):
+        blended = P @ grid[start:start + chunk_size].T
+        losses[start:start + chunk_size] = np.abs(blended - y[:, None]).mean(axis=0)
+    return losses
+
+
+class EnsembleWeights:
+    def __init__(
+        self,
+        models: Sequence[str],
+        weights: np.ndarray,
+        thresholds: Optional[np.ndarray] = None,
+        feature_index: int = 0,
+        losses: Optional[Sequence[float]] = None
+    ):
+        """按行情状态划分的集成权重
+
+        Args:
+            models (Sequence[str]): 模型名称，与权重的列对应
+            weights (np.ndarray): 形状为 (状态数, 模型数)，每行和为1
+            thresholds (Optional[np.ndarray]): 状态之间的波动率分界（升序），长度为状态数 - 1
+            feature_index (int): 计算波动率使用的特征列，见 regime_scores
+            losses (Optional[Sequence[float]]): 各状态在样本外预测上的误差，仅用于展示
+        """
+        self.models = list(models)
+        self.weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        self.thresholds = np.asarray(thresholds if thresholds is not None else [], dtype=np.float64)
+        self.feature_index = int(feature_index)
+        self.losses = list(losses) if losses is not None else None
+        if self.weights.shape != (len(self.thresholds) + 1, len(self.models)):
+            raise ValueError(f"权重形状{self.weights.shape}与模型数和状态数不一致")
+
+    @classmethod
+    def constant(cls, weights: Sequence[float] = DEFAULT_WEIGHTS, models: Sequence[str] = ('lstm', 'xgb')) -> 'EnsembleWeights':
+        """不区分行情状态的固定权重"""
+        return cls(models, np.asarray(weights, dtype=np.float64)[None, :])
+
+    @property
+    def n_regimes(self) -> int:
+        return len(self.weights)
+
+    def regimes(self, X: Optional[np.ndarray] = None, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """样本所属的行情状态，scores 未给出时由窗口数据 X 计算"""
+        if scores is None:
+            if X is None:
+                raise ValueError("按行情状态集成时需要窗口数据或波动率")
+            scores = regime_scores(X, self.feature_index)
+        return np.searchsorted(self.thresholds, scores, side='right')
+
+    def blend(
+        self,
+        predictions: Dict[str, np.ndarray],
+        X: Optional[np.ndarray] = None,
+        scores: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """按各样本所属状态的权重组合各模型的预测
+
+        Args:
+            predictions (Dict[str, np.ndarray]): 模型名称到一维预测的映射
+            X (Optional[np.ndarray]): 窗口数据，只有多个状态时才需要
+            scores (Optional[np.ndarray]): 预先计算的 regime_scores，给出时不再使用X
+
+        Returns:
+            np.ndarray: 集成预测，形状为 (样本,)
+        """
+        P = np.column_stack([np.reshape(predictions[name], -1) for name in self.models])
+        if self.n_regimes == 1:
+            return P @ self.weights[0]
+        return np.einsum('nm,nm->n', P, self.weights[self.regimes(X, scores)])
+
+    def key(self) -> List[float]:
+        """权重和状态分界展平后的数值，用作预测缓存键的一部分"""
+        return self.weights.ravel().tolist() + self.thresholds.tolist()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'models': self.models,
+            'weights': self.weights.tolist(),
+            'thresholds': self.thresholds.tolist(),
+            'feature_index': self.feature_index,
+            'losses': self.losses
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'EnsembleWeights':
+        return cls(data['models'], np.asarray(data['weights']), np.asarray(data['thresholds']),
+                   data.get('feature_index', 0), data.get('losses'))
+
+    def __repr__(self) -> str:
+        rows = ', '.join('[' + ', '.join(f"{w:.2f}" for w in row) + ']' for row in self.weights)
+        return f"EnsembleWeights(models={self.models}, weights=[{rows}], thresholds={self.thresholds.tolist()})"
+
+
+def optimize_weights(
+    predictions: Dict[str, np.ndarray],
+    y: np.ndarray,
+    X: Optional[np.ndarray] = None,
+    scores: Optional[np.ndarray] = None,
+    n_regimes: int = 1,
+    feature_index: int = 0,
+    step: float = 0.05,
+    metric: str = 'mse',
+    min_regime_samples: int = 50
+) -> EnsembleWeights:
+    """在样本外（交叉验证各折验证集）预测上网格搜索集成权重
+
+    在权重单纯形的网格上一次性计算所有组合的误差并取最小值，支持任意数量的模型，
+    只使用已缓存的各模型预测，不需要重新训练或推理。n_regimes > 1 时按窗口波动率的分位数
+    把样本分为若干行情状态，每个状态单独搜索权重；样本数少于 min_regime_samples 的状态沿用全局权重。
+
+    Args:
+        predictions (Dict[str, np.ndarray]): 模型名称到一维样本外预测的映射
+        y (np.ndarray): 真实值
+        X (Optional[np.ndarray]): 与预测对应的窗口数据，用于计算行情状态
+        scores (Optional[np.ndarray]): 预先计算的 regime_scores，给出时不再使用X
+        n_regimes (int): 行情状态数
+        feature_index (int): 计算波动率使用的特征列
+        step (float): 权重网格间隔
+        metric (str): 'mse' 或 'mae'
+        min_regime_samples (int): 单独搜索权重所需的最少样本数
+
+    Returns:
+        EnsembleWeights: 最优权重
+    """
+    if metric not in ENSEMBLE_METRICS:
+        raise ValueError(f"metric必须是{ENSEMBLE_METRICS}之一")
+    models = list(predictions)
+    P = np.column_stack([np.asarray(predictions[name], dtype=np.float64).reshape(-1) for name in models])
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    if len(P) != len(y) or len(y) == 0:
+        raise ValueError("预测与真实值长度不一致或为空")
+    grid = simplex_grid(len(models), step)
+
+    losses = _grid_losses(P, y, grid, metric)
+    best = int(np.argmin(losses))
+    if n_regimes <= 1:
+        return EnsembleWeights(models, grid[best][None, :], feature_index=feature_index, losses=[float(losses[best])])
+
+    if scores is None:
+        if X is None:
+            raise ValueError("按行情状态搜索权重时需要窗口数据或波动率")
+        scores = regime_scores(X, feature_index)
+    thresholds = np.unique(np.quantile(scores, np.linspace(0, 1, n_regimes + 1)[1:-1]))
+    regimes = np.searchsorted(thresholds, scores, side='right')
+
+    weights, regime_losses = [], []
+    for regime in range(len(thresholds) + 1):
+        mask = regimes == regime
+        if mask.sum() < min_regime_samples:
+            weights.append(grid[best])
+            regime_losses.append(float(_grid_losses(P[mask], y[mask], grid[best:best + 1], metric)[0])
+                                 if mask.any() else float('nan'))
+            continue
+        regime_loss = _grid_losses(P[mask], y[mask], grid, metric)
+        weights.append(grid[int(np.argmin(regime_loss))])
+        regime_losses.append(float(regime_loss.min()))
+    return EnsembleWeights(models, np.array(weights), thresholds, feature_index, regime_losses)
@@ -0,0 +1,129 @@
+import numpy as np
+import xgboost as xgb
+from typing import Optional, Sequence
+from dtypes import float_dtype
+
+# 构建QuantileDMatrix时每批写入的样本数，批缓冲区只分配一次并在各批之间复用
+DEFAULT_CHUNK_SIZE = 8192
+
+
+def resolve_lags(sequence_length: int, lags: Optional[Sequence[int]] = None) -> np.ndarray:
+    """检查并返回滞后阶数
+
+    滞后k表示窗口倒数第k+1行（滞后0为窗口最后一行）。默认使用全部时间步，并按从旧到新的顺序排列，
+    此时得到的列与 reshape(n, -1) 展平窗口完全一致。
+
+    Args:
+        sequence_length (int): 窗口长度
+        lags (Optional[Sequence[int]]): 滞后阶数，按给定顺序输出
+
+    Returns:
+        np.ndarray: 滞后阶数
+    """
+    if lags is None:
+        return np.arange(sequence_length - 1, -1, -1)
+    lags = np.asarray(lags, dtype=np.int64)
+    if lags.ndim != 1 or len(lags) == 0:
+        raise ValueError("滞后阶数必须是非空的一维序列")
+    if lags.min() < 0 or lags.max() >= sequence_length:
+        raise ValueError(f"滞后阶数必须在[0, {sequence_length - 1}]范围内")
+    return lags
+
+
+def build_lag_matrix(
+    X: np.ndarray,
+    lags: Optional[Sequence[int]] = None,
+    out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """把窗口中选定的滞后行直接写入一个连续的二维数组，作为XGBoost的输入
+
+    每个滞后对应一组连续的列（宽度为特征数），写入时只按滞后逐块复制，
+    窗口可以是 sliding_windows 产生的视图，不会先物化完整的三维窗口。
+
+    Args:
+        X (np.ndarray): 窗口数据，形状为 (样本, 序列, 特征)
+        lags (Optional[Sequence[int]]): 滞后阶数，见 resolve_lags
+        out (Optional[np.ndarray]): 预先分配的输出数组，形状为 (样本, 滞后数 * 特征)
+
+    Returns:
+        np.ndarray: 形状为 (样本, 滞后数 * 特征) 的C连续数组
+    """
+    if X.ndim != 3:
+        raise ValueError(f"窗口数据必须是三维数组，当前维度：{X.ndim}")
+    n, length, n_features = X.shape
+    lags = resolve_lags(length, lags)
+    shape = (n, len(lags) * n_features)
+    if out is None:
+        out = np.empty(shape, dtype=float_dtype())
+    elif out.shape != shape or not out.flags.c_contiguous:
+        raise ValueError(f"输出数组必须是形状为{shape}的C连续数组")
+
+    for j, lag in enumerate(lags):
+        out[:, j * n_features:(j + 1) * n_features] = X[:, length - 1 - lag, :]
+    return out
+
+
+class LagMatrixIter(xgb.DataIter):
+    def __init__(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        lags: Optional[Sequence[int]] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        """按批把窗口写入同一个预分配缓冲区并交给XGBoost的迭代器
+
+        用于构建QuantileDMatrix：XGBoost逐批计算分位数并量化，内存中不会出现完整的浮点特征矩阵。
+
+        Args:
+            X (np.ndarray): 窗口数据，形状为 (样本, 序列, 特征)
+            y (np.ndarray): 标签
+            lags (Optional[Sequence[int]]): 滞后阶数，见 resolve_lags
+            chunk_size (int): 每批样本数
+        """
+        if len(X) != len(y):
+            raise ValueError("特征与目标变量长度不一致")
+        self.X = X
+        self.y = np.asarray(y, dtype=float_dtype())
+        self.lags = resolve_lags(X.shape[1], lags)
+        self.chunk_size = chunk_size
+        self.buffer = np.empty((min(chunk_size, len(X)), len(self.lags) * X.shape[2]), dtype=float_dtype())
+        self._position = 0
+        super().__init__()
+
+    def next(self, input_data) -> bool:
+        if self._position >= len(self.X):
+            return False
+        start, stop = self._position, min(self._position + self.chunk_size, len(self.X))
+        self._position = stop
+
+        data = build_lag_matrix(self.X[start:stop], self.lags, out=self.buffer[:stop - start])
+        input_data(data=data, label=self.y[start:stop])
+        return True
+
+    def reset(self):
+        self._position = 0
+
+
+def lag_quantile_dmatrix(
+    X: np.ndarray,
+    y: np.ndarray,
+    lags: Optional[Sequence[int]] = None,
+    ref: Optional[xgb.QuantileDMatrix] = None,
+    max_bin: int = 256,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> xgb.QuantileDMatrix:
+    """由窗口构建供hist方法训练的量化DMatrix
+
+    Args:
+        X (np.ndarray): 窗口数据，形状为 (样本, 序列, 特征)
+        y (np.ndarray): 标签
+        lags (Optional[Sequence[int]]): 滞后阶数，见 resolve_lags
+        ref (Optional[xgb.QuantileDMatrix]): 参考数据，设置时直接使用其分箱边界而不重新计算分位数
+        max_bin (int): 分箱数，必须与训练参数一致
+        chunk_size (int): 每批样本数
+
+    Returns:
+        xgb.QuantileDMatrix: 量化后的训练数据
+    """
+    return xgb.QuantileDMatrix(LagMatrixIter(X, y, lags, chunk_size), ref=ref, max_bin=max_bin)
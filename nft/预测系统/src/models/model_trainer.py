@@ -1,85 +1,252 @@
+import copy
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.optimizers import Adam
+import xgboost as xgb
 from xgboost import XGBRegressor
-from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from models.cross_validation import run_cross_validation
+from models.lag_features import build_lag_matrix, lag_quantile_dmatrix, resolve_lags
+from models.ensemble import EnsembleWeights, DEFAULT_WEIGHTS, optimize_weights
+from update_policy import FeatureReference, RetrainPolicy, RetrainDecision, FULL_RETRAIN
+
+# 模型的默认超参数，可通过 ModelTrainer(lstm_params, xgb_params) 覆盖
+LSTM_DEFAULTS = {'units': 100, 'second_units': 50, 'dense_units': 25, 'dropout': 0.2, 'learning_rate': 0.001}
+XGB_DEFAULTS = {
+    'n_estimators': 1000,
+    'learning_rate': 0.01,
+    'max_depth': 5,
+    'min_child_weight': 1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'random_state': 42
+}
+# XGBoost在时间上最后一段验证集上的早停轮数
+EARLY_STOPPING_ROUNDS = 10
+# 按行情状态集成时计算窗口波动率使用的特征列（DataProcessor.prepare_data 特征中的close）
+REGIME_FEATURE = 3
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, lstm_params=None, xgb_params=None, lags=None):
+        """lstm_params / xgb_params 覆盖 LSTM_DEFAULTS / XGB_DEFAULTS 中的超参数（如超参数搜索的结果），
+        lags 为XGBoost使用的窗口滞后阶数（见 models.lag_features.resolve_lags），默认使用整个窗口
+        """
+        self.lstm_params = {**LSTM_DEFAULTS, **(lstm_params or {})}
+        self.xgb_params = {**XGB_DEFAULTS, **(xgb_params or {})}
+        self.lags = None if lags is None else [int(lag) for lag in lags]
         self.lstm_model = None
         self.xgb_model = None
+        # 上次完整训练时XGBoost训练段的量化数据，验证段和之后的增量更新直接复用其分箱边界
+        self.xgb_reference = None
+        # 增量更新状态：上次完整训练时的特征分布、验证误差和之后的增量更新次数
+        self.reference = None
+        self.baseline_error = None
+        self.incremental_updates = 0
+        # 在交叉验证样本外预测上优化得到的集成权重，未优化时使用 DEFAULT_WEIGHTS
+        self.ensemble_weights = None
+        
+    def copy(self):
+        """返回可以独立训练的副本，修改副本不影响原模型
         
-    def build_lstm_model(self, input_shape):
-        """构建LSTM模型"""
+        LSTM通过 clone_model 复制结构后写入相同的权重（优化器状态不复制），XGBoost复制booster；
+        xgb_reference 只作为量化参考、从不原地修改，与原模型共用
+        """
+        clone = ModelTrainer(self.lstm_params, self.xgb_params, self.lags)
+        if self.lstm_model is not None:
+            clone.lstm_model = tf.keras.models.clone_model(self.lstm_model)
+            clone.lstm_model.set_weights(self.lstm_model.get_weights())
+            clone.lstm_model.compile(optimizer=Adam(learning_rate=self.lstm_params['learning_rate']),
+                                     loss='mse',
+                                     metrics=['mae'])
+        clone.xgb_model = copy.deepcopy(self.xgb_model)
+        clone.xgb_reference = self.xgb_reference
+        clone.reference = copy.deepcopy(self.reference)
+        clone.baseline_error = self.baseline_error
+        clone.incremental_updates = self.incremental_updates
+        clone.ensemble_weights = copy.deepcopy(self.ensemble_weights)
+        return clone
+        
+    def build_lstm_model(self, input_shape, **overrides):
+        """构建LSTM模型，overrides覆盖 self.lstm_params 中的超参数"""
+        params = {**self.lstm_params, **overrides}
         model = Sequential([
-            LSTM(100, return_sequences=True, input_shape=input_shape),
-            Dropout(0.2),
-            LSTM(50, return_sequences=False),
-            Dropout(0.2),
-            Dense(25, activation='relu'),
+            LSTM(params['units'], return_sequences=True, input_shape=input_shape),
+            Dropout(params['dropout']),
+            LSTM(params['second_units'], return_sequences=False),
+            Dropout(params['dropout']),
+            Dense(params['dense_units'], activation='relu'),
             Dense(1)
         ])
         
-        model.compile(optimizer=Adam(learning_rate=0.001),
+        model.compile(optimizer=Adam(learning_rate=params['learning_rate']),
                       loss='mse',
                       metrics=['mae'])
         
         return model
     
-    def build_xgboost_model(self):
-        """构建XGBoost模型"""
-        return XGBRegressor(
-            n_estimators=1000,
-            learning_rate=0.01,
-            max_depth=5,
-            min_child_weight=1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42
+    def build_xgboost_model(self, **overrides):
+        """构建XGBoost模型，overrides覆盖 self.xgb_params 中的参数"""
+        return XGBRegressor(**{**self.xgb_params, **overrides})
+    
+    def _fit_xgboost(self, X_train, y_train, validation_split, num_boost_round=None, xgb_model=None):
+        """用hist方法在量化DMatrix上训练XGBoost，在时间上最后 validation_split 比例的样本上早停
+        
+        训练段的量化数据只构建一次，验证段和增量更新的数据都以它为参考，不再重新计算分位数。
+        """
+        model = self.build_xgboost_model(tree_method='hist')
+        params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+        max_bin = params.get('max_bin', 256)
+        
+        n_fit = int(len(X_train) * (1 - validation_split))
+        ref = self.xgb_reference if xgb_model is not None else None
+        if ref is not None and ref.num_col() != len(resolve_lags(X_train.shape[1], self.lags)) * X_train.shape[2]:
+            ref = None
+        dtrain = lag_quantile_dmatrix(X_train[:n_fit], y_train[:n_fit], self.lags, ref=ref, max_bin=max_bin)
+        evals = []
+        if n_fit < len(X_train):
+            dvalid = lag_quantile_dmatrix(X_train[n_fit:], y_train[n_fit:], self.lags,
+                                          ref=dtrain, max_bin=max_bin)
+            evals = [(dvalid, 'valid')]
+        
+        booster = xgb.train(
+            params,
+            dtrain,
+            num_boost_round=num_boost_round or model.n_estimators,
+            evals=evals,
+            early_stopping_rounds=EARLY_STOPPING_ROUNDS if evals else None,
+            verbose_eval=False,
+            xgb_model=xgb_model
         )
+        # 只保留到验证误差最小的树，之后的增量更新在此基础上追加
+        if evals:
+            booster = booster[:booster.best_iteration + 1]
+        if xgb_model is None:
+            self.xgb_reference = dtrain
+        
+        model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+        return model
     
-    def train_models(self, X_train, y_train, validation_split=0.2):
-        """训练LSTM和XGBoost模型"""
+    def train_models(self, X_train, y_train, validation_split=0.2, epochs=50, callbacks=None):
+        """训练LSTM和XGBoost模型，callbacks会传给LSTM的fit（如进度和取消回调）"""
         # 训练LSTM模型
         self.lstm_model = self.build_lstm_model((X_train.shape[1], X_train.shape[2]))
         self.lstm_model.fit(
             X_train, y_train,
-            epochs=50,
+            epochs=epochs,
             batch_size=32,
             validation_split=validation_split,
+            callbacks=callbacks,
             verbose=1
         )
         
-        # 准备XGBoost的输入数据
-        X_train_2d = X_train.reshape(X_train.shape[0], -1)
-        
         # 训练XGBoost模型
-        self.xgb_model = self.build_xgboost_model()
-        self.xgb_model.fit(
-            X_train_2d,
-            y_train,
-            eval_set=[(X_train_2d, y_train)],
-            early_stopping_rounds=10,
-            verbose=False
+        self.xgb_model = self._fit_xgboost(X_train, y_train, validation_split)
+        
+        # 记录参考分布和验证段误差，供增量更新时判断是否需要完整重训
+        n_fit = int(len(X_train) * (1 - validation_split))
+        self.reference = FeatureReference.fit(X_train[:n_fit])
+        self.baseline_error = (
+            mean_absolute_error(y_train[n_fit:], self.predict(X_train[n_fit:]))
+            if n_fit < len(X_train) else None
+        )
+        self.incremental_updates = 0
+    
+    def update_models(self, X_train, y_train, epochs=10, extra_trees=100, validation_split=0.2,
+                      callbacks=None):
+        """在已有模型的基础上继续训练：LSTM继续训练少量轮次，XGBoost在原有树之后追加新树"""
+        if self.lstm_model is None or self.xgb_model is None:
+            return self.train_models(X_train, y_train, validation_split)
+        
+        self.lstm_model.fit(
+            X_train, y_train,
+            epochs=epochs,
+            batch_size=32,
+            validation_split=validation_split,
+            callbacks=callbacks,
+            verbose=0
+        )
+        
+        self.xgb_model = self._fit_xgboost(X_train, y_train, validation_split, num_boost_round=extra_trees,
+                                           xgb_model=self.xgb_model.get_booster())
+    
+    def update_decision(self, X_new, y_new, policy=None):
+        """判断新到达的窗口应该增量更新还是完整重训，不训练模型，返回 RetrainDecision
+        
+        完整重训通常意味着特征分布已经漂移，调用方应先用新数据重新拟合归一化参数再训练
+        """
+        policy = policy or RetrainPolicy()
+        if self.lstm_model is None or self.xgb_model is None:
+            return RetrainDecision(FULL_RETRAIN, ['模型尚未训练'])
+        return policy.decide(
+            self.reference,
+            X_new,
+            self.baseline_error,
+            mean_absolute_error(y_new, self.predict(X_new)),
+            self.incremental_updates
         )
     
-    def predict(self, X_test, ensemble_weights=(0.6, 0.4)):
-        """使用模型集成进行预测"""
+    def incremental_update(self, X_new, y_new, policy=None, X_full=None, y_full=None,
+                           epochs=5, extra_trees=50, callbacks=None, decision=None):
+        """用新到达的窗口更新模型，只有特征漂移、误差超过阈值或增量次数过多时才完整重训
+        
+        完整重训使用 X_full / y_full（默认只用新数据），decision 为 update_decision 预先得到的结果，
+        返回 RetrainDecision
+        """
+        if decision is None:
+            decision = self.update_decision(X_new, y_new, policy)
+        
+        if decision.full_retrain:
+            if X_full is None:
+                X_full, y_full = X_new, y_new
+            self.train_models(X_full, y_full, callbacks=callbacks)
+        else:
+            self.update_models(X_new, y_new, epochs=epochs, extra_trees=extra_trees,
+                               validation_split=0.0, callbacks=callbacks)
+            self.incremental_updates += 1
+        
+        return decision
+    
+    def predict_components(self, X_test):
+        """分别返回LSTM和XGBoost的预测，调整集成权重时无需重新预测"""
         # LSTM预测
-        lstm_pred = self.lstm_model.predict(X_test)
+        lstm_pred = self.lstm_model.predict(X_test).flatten()
         
         # XGBoost预测
-        X_test_2d = X_test.reshape(X_test.shape[0], -1)
-        xgb_pred = self.xgb_model.predict(X_test_2d)
+        xgb_pred = self.xgb_model.predict(build_lag_matrix(X_test, self.lags))
+        
+        return lstm_pred, xgb_pred
+    
+    def blend(self, lstm_pred, xgb_pred, ensemble_weights=None, X=None):
+        """组合两个模型的预测
         
-        # 集成预测结果
-        ensemble_pred = (ensemble_weights[0] * lstm_pred.flatten() +
-                        ensemble_weights[1] * xgb_pred)
+        ensemble_weights 可以是 (LSTM权重, XGBoost权重) 或 EnsembleWeights，默认使用 self.ensemble_weights，
+        按行情状态划分的权重需要窗口数据X判断各样本所属的状态
+        """
+        if ensemble_weights is None:
+            ensemble_weights = self.ensemble_weights or DEFAULT_WEIGHTS
+        if isinstance(ensemble_weights, EnsembleWeights):
+            return ensemble_weights.blend({'lstm': lstm_pred, 'xgb': xgb_pred}, X)
+        return ensemble_weights[0] * lstm_pred + ensemble_weights[1] * xgb_pred
+    
+    def predict(self, X_test, ensemble_weights=None):
+        """使用模型集成进行预测，ensemble_weights 见 blend"""
+        lstm_pred, xgb_pred = self.predict_components(X_test)
+        return self.blend(lstm_pred, xgb_pred, ensemble_weights, X_test)
+    
+    def fit_ensemble_weights(self, cv_result, X, n_regimes=1, step=0.05, metric='mse'):
+        """用 cross_validate(return_details=True) 结果中缓存的样本外预测搜索集成权重并保存到 self.ensemble_weights
         
-        return ensemble_pred
+        只在已有的预测上计算，不重新训练或推理；X为交叉验证使用的窗口数据，用于划分行情状态
+        """
+        oof = cv_result['oof']
+        self.ensemble_weights = optimize_weights(
+            {'lstm': oof['lstm'], 'xgb': oof['xgb']}, oof['y'],
+            X=X[oof['index']] if n_regimes > 1 else None,
+            n_regimes=n_regimes, feature_index=REGIME_FEATURE, step=step, metric=metric
+        )
+        return self.ensemble_weights
     
     def evaluate(self, y_true, y_pred):
         """评估模型性能"""
@@ -95,26 +262,19 @@ class ModelTrainer:
             'r2': r2
         }
     
-    def cross_validate(self, X, y, n_splits=5):
-        """使用时间序列交叉验证评估模型"""
-        tscv = TimeSeriesSplit(n_splits=n_splits)
-        cv_scores = []
-        
-        for train_idx, val_idx in tscv.split(X):
-            X_train, X_val = X[train_idx], X[val_idx]
-            y_train, y_val = y[train_idx], y[val_idx]
-            
-            # 训练模型
-            self.train_models(X_train, y_train)
-            
-            # 预测和评估
-            y_pred = self.predict(X_val)
-            scores = self.evaluate(y_val, y_pred)
-            cv_scores.append(scores)
-        
-        # 计算平均分数
-        avg_scores = {}
-        for metric in cv_scores[0].keys():
-            avg_scores[metric] = np.mean([score[metric] for score in cv_scores])
-        
-        return avg_scores
\ No newline at end of file
+    def cross_validate(self, X, y, n_splits=5, n_jobs=1, warm_start=False, return_details=False,
+                       ensemble_weights=None, progress=None):
+        """使用时间序列交叉验证评估模型
+
+        各折使用与本训练器超参数相同的独立训练器，不会覆盖 self.lstm_model / self.xgb_model；
+        n_jobs > 1 时各折在进程池中并行执行，warm_start=True 时每个折在前一折模型上继续训练。
+        progress(已完成折数, 总折数) 在每个折完成后调用。ensemble_weights 默认使用 self.ensemble_weights；
+        return_details=True 时结果中的oof为各模型的样本外预测，可用 fit_ensemble_weights 搜索集成权重。
+        """
+        result = run_cross_validation(X, y, n_splits=n_splits, n_jobs=n_jobs, warm_start=warm_start,
+                                      ensemble_weights=ensemble_weights or self.ensemble_weights or DEFAULT_WEIGHTS,
+                                      progress=progress,
+                                      model_params={'lstm_params': self.lstm_params,
+                                                    'xgb_params': self.xgb_params,
+                                                    'lags': self.lags})
+        return result if return_details else result['mean_scores']
\ No newline at end of file
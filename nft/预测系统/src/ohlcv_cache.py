@@ -0,0 +1,189 @@
+import os
+import json
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+DATE_FORMAT = '%Y%m%d'
+
+
+def _to_date(value: str) -> datetime:
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def _shift(value: str, days: int) -> str:
+    return (_to_date(value) + timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+def _merge_ranges(ranges: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """合并重叠或相邻的日期区间"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= _shift(merged[-1][1], 1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class OHLCVCache:
+    def __init__(self, cache_dir: str):
+        """初始化本地日线数据缓存
+
+        每只股票对应一个Parquet文件（按trade_date去重）和一个记录已覆盖日期区间的JSON文件。
+        记录的是请求过的区间而不是实际存在的交易日，因此停牌和节假日不会被反复重新拉取。
+
+        Args:
+            cache_dir (str): 缓存目录
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _data_path(self, ts_code: str) -> str:
+        return os.path.join(self.cache_dir, f"{ts_code}.parquet")
+
+    def _meta_path(self, ts_code: str) -> str:
+        return os.path.join(self.cache_dir, f"{ts_code}.json")
+
+    def covered_ranges(self, ts_code: str) -> List[Tuple[str, str]]:
+        """获取已缓存的日期区间
+
+        Args:
+            ts_code (str): 股票代码
+
+        Returns:
+            List[Tuple[str, str]]: 已覆盖的日期区间列表，格式：YYYYMMDD
+        """
+        path = self._meta_path(ts_code)
+        if not os.path.exists(path):
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return [tuple(r) for r in json.load(f)['ranges']]
+
+    def missing_ranges(self, ts_code: str, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """计算请求区间中尚未缓存的部分
+
+        Args:
+            ts_code (str): 股票代码
+            start_date (str): 开始日期，格式：YYYYMMDD
+            end_date (str): 结束日期，格式：YYYYMMDD
+
+        Returns:
+            List[Tuple[str, str]]: 需要从API补充获取的日期区间
+        """
+        if start_date > end_date:
+            return []
+
+        missing = []
+        cursor = start_date
+        for covered_start, covered_end in self.covered_ranges(ts_code):
+            if covered_end < cursor:
+                continue
+            if covered_start > end_date:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, _shift(covered_start, -1)))
+            cursor = _shift(covered_end, 1)
+            if cursor > end_date:
+                return missing
+        missing.append((cursor, end_date))
+        return missing
+
+    def read(
+        self,
+        ts_code: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """读取缓存的日线数据
+
+        Args:
+            ts_code (str): 股票代码
+            start_date (Optional[str]): 开始日期，格式：YYYYMMDD
+            end_date (Optional[str]): 结束日期，格式：YYYYMMDD
+            columns (Optional[List[str]]): 需要读取的列，默认全部
+
+        Returns:
+            pd.DataFrame: 按trade_date降序排列的日线数据（与Tushare返回顺序一致）
+        """
+        path = self._data_path(ts_code)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+
+        filters = []
+        if start_date is not None:
+            filters.append(('trade_date', '>=', start_date))
+        if end_date is not None:
+            filters.append(('trade_date', '<=', end_date))
+        if columns is not None and 'trade_date' not in columns:
+            columns = ['trade_date'] + list(columns)
+
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+        return df.sort_values('trade_date', ascending=False).reset_index(drop=True)
+
+    def write(self, ts_code: str, df: pd.DataFrame, start_date: str, end_date: str):
+        """合并新数据并标记区间为已缓存
+
+        Args:
+            ts_code (str): 股票代码
+            df (pd.DataFrame): 新获取的日线数据
+            start_date (str): 本次请求的开始日期，格式：YYYYMMDD
+            end_date (str): 本次请求的结束日期，格式：YYYYMMDD
+        """
+        if df is not None and not df.empty:
+            path = self._data_path(ts_code)
+            if os.path.exists(path):
+                df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+            df = df.drop_duplicates('trade_date', keep='last').sort_values('trade_date')
+            tmp_path = path + '.tmp'
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+        # 当天收盘前数据可能不完整，只把截止到昨天的区间记为已覆盖
+        yesterday = (datetime.now() - timedelta(days=1)).strftime(DATE_FORMAT)
+        end_date = min(end_date, yesterday)
+        if start_date > end_date:
+            return
+
+        ranges = _merge_ranges(self.covered_ranges(ts_code) + [(start_date, end_date)])
+        meta_path = self._meta_path(ts_code)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'ranges': ranges}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def read_many(
+        self,
+        ts_codes: List[str],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """批量读取多只股票的缓存数据
+
+        Args:
+            ts_codes (List[str]): 股票代码列表
+            start_date (Optional[str]): 开始日期，格式：YYYYMMDD
+            end_date (Optional[str]): 结束日期，格式：YYYYMMDD
+            columns (Optional[List[str]]): 需要读取的列，默认全部
+
+        Returns:
+            pd.DataFrame: 包含ts_code列的长表，按ts_code、trade_date排序
+        """
+        if columns is not None and 'ts_code' not in columns:
+            columns = ['ts_code'] + list(columns)
+
+        frames = []
+        for ts_code in ts_codes:
+            df = self.read(ts_code, start_date, end_date, columns)
+            if df.empty:
+                continue
+            if 'ts_code' not in df.columns:
+                df['ts_code'] = ts_code
+            frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).sort_values(
+            ['ts_code', 'trade_date'], ignore_index=True
+        )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 源码以 src 为根目录导入（from data.transport import ...）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from dtypes import float_dtype
+from models.lag_features import build_lag_matrix, lag_quantile_dmatrix, resolve_lags
+
+
+@pytest.fixture
+def windows():
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((20, 6, 3)).astype(float_dtype())
+
+
+def test_default_lags_match_flattened_windows(windows):
+    out = build_lag_matrix(windows)
+    np.testing.assert_array_equal(out, windows.reshape(len(windows), -1))
+    assert out.flags.c_contiguous
+    assert out.dtype == float_dtype()
+
+
+def test_selected_lags_follow_given_order(windows):
+    out = build_lag_matrix(windows, lags=[0, 2])
+    np.testing.assert_array_equal(out[:, :3], windows[:, -1, :])
+    np.testing.assert_array_equal(out[:, 3:], windows[:, -3, :])
+
+
+def test_accepts_strided_views():
+    series = np.arange(30, dtype=float_dtype()).reshape(15, 2)
+    views = np.lib.stride_tricks.sliding_window_view(series, 4, axis=0).transpose(0, 2, 1)
+    np.testing.assert_array_equal(build_lag_matrix(views), np.ascontiguousarray(views).reshape(len(views), -1))
+
+
+def test_writes_into_preallocated_output(windows):
+    out = np.empty((len(windows), 2 * windows.shape[2]), dtype=float_dtype())
+    assert build_lag_matrix(windows, lags=[1, 0], out=out) is out
+
+    with pytest.raises(ValueError):
+        build_lag_matrix(windows, lags=[1, 0], out=np.empty((len(windows), 5), dtype=float_dtype()))
+
+
+@pytest.mark.parametrize('lags', [[], [-1], [6], [[0, 1]]])
+def test_rejects_invalid_lags(lags):
+    with pytest.raises(ValueError):
+        resolve_lags(6, lags)
+
+
+def test_rejects_non_window_input():
+    with pytest.raises(ValueError):
+        build_lag_matrix(np.zeros((4, 3)))
+
+
+def test_quantile_dmatrix_is_built_in_chunks(windows):
+    y = np.arange(len(windows), dtype=float_dtype())
+    dtrain = lag_quantile_dmatrix(windows, y, lags=[0, 1], chunk_size=7)
+    assert dtrain.num_row() == len(windows)
+    assert dtrain.num_col() == 2 * windows.shape[2]
+    np.testing.assert_array_equal(dtrain.get_label(), y)
+
+    dval = lag_quantile_dmatrix(windows[:5], y[:5], lags=[0, 1], ref=dtrain)
+    assert dval.num_row() == 5
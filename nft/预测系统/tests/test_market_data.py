@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from market_data import OHLCV_COLUMNS, merge_sources, normalize_akshare, fetch_concurrently
+
+
+def frame(dates, close, **columns):
+    data = {'trade_date': dates, 'open': close, 'high': close, 'low': close, 'close': close, 'vol': close}
+    data.update(columns)
+    return pd.DataFrame(data)[OHLCV_COLUMNS]
+
+
+def test_merge_prefers_earlier_sources():
+    primary = frame(['20240102', '20240103'], [10.0, 11.0])
+    fallback = frame(['20240102', '20240103'], [99.0, 99.0])
+    merged = merge_sources([primary, fallback])
+    assert list(merged['close']) == [10.0, 11.0]
+
+
+def test_merge_fills_missing_dates_and_fields():
+    primary = frame(['20240103', '20240105'], [11.0, 13.0], vol=[np.nan, 300.0])
+    fallback = frame(['20240102', '20240103', '20240104'], [10.0, 99.0, 12.0], vol=[100.0, 200.0, 250.0])
+    merged = merge_sources([primary, fallback])
+
+    assert list(merged.columns) == OHLCV_COLUMNS
+    assert list(merged['trade_date']) == ['20240102', '20240103', '20240104', '20240105']
+    assert list(merged['close']) == [10.0, 11.0, 12.0, 13.0]
+    assert list(merged['vol']) == [100.0, 200.0, 250.0, 300.0]
+
+
+def test_merge_keeps_last_duplicate_date():
+    df = frame(['20240102', '20240102'], [10.0, 10.5])
+    merged = merge_sources([df])
+    assert list(merged['close']) == [10.5]
+
+
+def test_merge_empty():
+    merged = merge_sources([])
+    assert merged.empty
+    assert list(merged.columns) == OHLCV_COLUMNS
+
+
+def test_normalize_akshare_matches_tushare_layout():
+    raw = pd.DataFrame({
+        '日期': ['2024-01-02'], '开盘': [1.0], '收盘': [2.0], '最高': [3.0], '最低': [0.5],
+        '成交量': [100.0], '成交额': [1e6]
+    })
+    df = normalize_akshare(raw)
+    assert list(df.columns) == OHLCV_COLUMNS
+    assert df['trade_date'].iloc[0] == '20240102'
+
+
+def test_fetch_concurrently_isolates_failures():
+    def broken():
+        raise ConnectionError('down')
+
+    frames, errors = fetch_concurrently({
+        'tushare': lambda: frame(['20240102'], [10.0]),
+        'akshare': broken,
+        'empty': lambda: frame([], [])
+    })
+    assert list(frames) == ['tushare']
+    assert isinstance(errors['akshare'], ConnectionError)
+    assert isinstance(errors['empty'], ValueError)